@@ -1,44 +1,102 @@
 from email.mime import message
-from reasoning import interpret_high_level_intent
+import os
+import intent_classifier
+from reasoning import interpret_high_level_intent, route_message
 from handlers import calendar_handler, script_handler, server_handler
-from openai import OpenAI
+from services import llm, usage
+from services.state_store import state
+from services.chat_scheduler import protect
+from services.conversation import memory
+from services.command_cache import cache as command_cache
+from services.metrics import span
 
-client = OpenAI()
+# "combined" extracts intent and handler payload in one LLM call, "two_step" classifies first
+ROUTER_MODE = os.getenv("ROUTER_MODE", "combined")
+
+# Intents used in metric and usage labels; whatever else the LLM returns counts as "other"
+KNOWN_INTENTS = frozenset({"script", "calendar", "server_command", "general_chat"})
+
+
+def intent_label(intent) -> str:
+    if not intent:
+        return "general_chat"
+    return intent if intent in KNOWN_INTENTS else "other"
 
 async def handle_message(update, context):
+    with span("message"):
+        await _handle_message(update, context)
+
+async def _handle_message(update, context):
     user_text = update.message.text
+    # Attributes LLM token usage for this message to the user (and the intent, once known)
+    usage.set_user(update.effective_user.id)
+    chat_id = update.effective_chat.id
+    memory.add_user(chat_id, user_text)
+
+    # One lookup for every pending confirmation; the shared store lets any worker pick it up
+    with span("state.lookup"):
+        pending = state.keys(update.effective_user.id)
+    if pending:
+        # Confirmed actions run to completion; a later "no" can't cancel them halfway
+        protect()
+        usage.set_intent("confirmation")
 
     # Check if user is confirming a pending script
-    if context.user_data.get("pending_script"):
-        await script_handler.confirm_script_execution(update, context, user_text)
+    if "pending_script" in pending:
+        with span("confirm.script"):
+            await script_handler.confirm_script_execution(update, context, user_text)
         return
 
-    if context.user_data.get("pending_server_command"):
-        await server_handler.confirm_server_command(update, context, user_text)
+    if "pending_server_command" in pending:
+        with span("confirm.server_command"):
+            await server_handler.confirm_server_command(update, context, user_text)
         return
 
-    if context.user_data.get("pending_calendar_action"):
-        await calendar_handler.confirm_calendar_action(update, context, user_text)
+    if "pending_calendar_action" in pending:
+        with span("confirm.calendar"):
+            await calendar_handler.confirm_calendar_action(update, context, user_text)
         return
         
-    interpretation = interpret_high_level_intent(user_text)
+    # Confident local classification skips the routing call; handlers extract their own details
+    with span("intent.classify"):
+        fast_intent = intent_classifier.fast_path(user_text)
+        # A request whose command was confirmed before goes straight to the server handler
+        if not fast_intent and command_cache.lookup(user_text, record=False):
+            fast_intent = "server_command"
+        # "agenda for today" is answered from the calendar store; no routing call needed
+        if not fast_intent and calendar_handler.is_agenda_question(user_text):
+            fast_intent = "calendar"
+    if fast_intent:
+        interpretation = {"intent": fast_intent}
+    elif ROUTER_MODE == "combined":
+        interpretation = await route_message(user_text, script_handler.candidate_scripts(user_text), memory.history(chat_id))
+    else:
+        interpretation = await interpret_high_level_intent(user_text, memory.history(chat_id))
     intent = interpretation.get("intent")
+    label = intent_label(intent)
+    usage.set_intent(label)
+    if not fast_intent:
+        intent_classifier.record_fallback(label)
+    # Handlers fall back to their own extraction call when no payload came back
+    payload = interpretation.get(intent) or None
 
-    if intent == "calendar":
-        await calendar_handler.handle_calendar_action(update, context, user_text)
-    elif intent == "script":
-        await script_handler.handle_script_action(update, context, user_text)
-    elif intent == "server_command":
-        await server_handler.handle_server_command(update, context, user_text)
-    else:
-        # Fallback to general GPT conversation
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant."},
-                {"role": "user", "content": user_text}
-            ],
-            temperature=0.7
-        )
-        reply = response.choices[0].message.content.strip()
-        await update.message.reply_text(reply)
+    with span(f"handler.{label}"):
+        if intent == "calendar":
+            await calendar_handler.handle_calendar_action(update, context, user_text, payload)
+        elif intent == "script":
+            await script_handler.handle_script_action(update, context, user_text, payload)
+        elif intent == "server_command":
+            await server_handler.handle_server_command(update, context, user_text, payload)
+        else:
+            # Fallback to general GPT conversation
+            messages = [{"role": "system", "content": "You are a helpful assistant."}]
+            history = memory.history(chat_id)
+            if history:
+                messages.append({"role": "system", "content": f"Conversation so far:\n\n{history}"})
+            messages.append({"role": "user", "content": user_text})
+            reply = await llm.chat(
+                messages,
+                temperature=0.7,
+                name="general_chat"
+            )
+            await update.message.reply_text(reply)
@@ -1,65 +1,128 @@
 # generate_script_summaries.py
 import os
 import json
-from openai import OpenAI
+import asyncio
+import hashlib
 from dotenv import load_dotenv
+from services import llm
+from services.prompts import Prompt
 load_dotenv()
-client = OpenAI()
 
 SCRIPTS_DIR = "scripts"
 OUTPUT_FILE = "data/script_summaries.json"
 
-def summarize_script(script_name, script_content):
-    prompt = f"""
+# Concurrent summary requests when several scripts changed
+MAX_WORKERS = int(os.getenv("SUMMARY_WORKERS", "4"))
+
+# Bookkeeping fields that stay out of prompts
+INTERNAL_FIELDS = ("sha256", "mtime")
+
+async def summarize_script(script_name, script_content):
+    prompt = Prompt("summarize_script")
+    prompt.add(f"""
 You are an AI assistant that summarizes scripts for documentation.
 
 Script filename: {script_name}
 
 Script contents:
 \"\"\"
-{script_content}
+""")
+    # Long scripts keep their beginning: imports, usage text and argument parsing
+    prompt.add(script_content, priority=20, trim="head", name="script_contents")
+    prompt.add("""
 \"\"\"
 
 Generate a JSON object describing this script.
 
 Respond ONLY with JSON in this format:
 
-{{
+{
   "description": "<short summary of what the script does>",
   "requires_arguments": <true or false>,
   "example_usage": "<example command line usage>"
-}}
-"""
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": "You output structured JSON only."},
-            {"role": "user", "content": prompt}
-        ],
-        temperature=0
-    )
-    return json.loads(response.choices[0].message.content.strip())
+}
+""")
+    return await llm.chat_json(prompt)
 
-def generate_summaries():
-    summaries = []
+def is_script(filename):
+    return filename.endswith(".py") or filename.endswith(".sh")
 
-    for filename in os.listdir(SCRIPTS_DIR):
-        if filename.endswith(".py") or filename.endswith(".sh"):
-            path = os.path.join(SCRIPTS_DIR, filename)
-            with open(path, "r", encoding="utf-8") as f:
-                content = f.read()
-
-            # Call GPT to summarize
-            summary = summarize_script(filename, content)
-            summary["name"] = filename
-            summaries.append(summary)
+def load_summaries():
+    if not os.path.exists(OUTPUT_FILE):
+        return []
+    with open(OUTPUT_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
 
+def save_summaries(summaries):
     os.makedirs(os.path.dirname(OUTPUT_FILE), exist_ok=True)
-
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
+    tmp_path = OUTPUT_FILE + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
         json.dump(summaries, f, indent=2)
+    os.replace(tmp_path, OUTPUT_FILE)
+
+def read_script(filename):
+    path = os.path.join(SCRIPTS_DIR, filename)
+    mtime = os.stat(path).st_mtime
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read()
+    return content, hashlib.sha256(content.encode("utf-8")).hexdigest(), mtime
+
+def is_current(summary, filename):
+    """
+    True when the stored summary still matches the file: same mtime, or same content hash.
+    Refreshes the stored mtime when only the timestamp moved.
+    """
+    if not summary:
+        return False
+    path = os.path.join(SCRIPTS_DIR, filename)
+    if summary.get("mtime") == os.stat(path).st_mtime:
+        return True
+    _, sha256, mtime = read_script(filename)
+    if summary.get("sha256") == sha256:
+        summary["mtime"] = mtime
+        return True
+    return False
+
+async def summarize_file(filename):
+    content, sha256, mtime = read_script(filename)
+    summary = await summarize_script(filename, content)
+    summary["name"] = filename
+    summary["sha256"] = sha256
+    summary["mtime"] = mtime
+    return summary
+
+async def _generate_summaries():
+    existing = {s["name"]: s for s in load_summaries()}
+    filenames = sorted(f for f in os.listdir(SCRIPTS_DIR) if is_script(f))
 
-    print(f"✅ Generated {len(summaries)} script summaries in {OUTPUT_FILE}")
+    stale = [f for f in filenames if not is_current(existing.get(f), f)]
+    removed = set(existing) - set(filenames)
+
+    # Only new or changed scripts go to GPT, a few at a time
+    semaphore = asyncio.Semaphore(MAX_WORKERS)
+
+    async def worker(filename):
+        async with semaphore:
+            try:
+                return await summarize_file(filename)
+            except Exception as e:
+                print(f"⚠️ Could not summarize {filename}: {e}")
+                return existing.get(filename)
+
+    for summary in await asyncio.gather(*(worker(f) for f in stale)):
+        if summary:
+            existing[summary["name"]] = summary
+
+    summaries = [existing[f] for f in filenames if f in existing]
+    save_summaries(summaries)
+
+    print(f"✅ Script summaries: {len(stale)} regenerated, {len(removed)} pruned, {len(summaries)} total in {OUTPUT_FILE}")
+
+    # The bot runs its own event loop; don't keep a client bound to this one
+    await llm.close_client()
+
+def generate_summaries():
+    asyncio.run(_generate_summaries())
 
 if __name__ == "__main__":
     generate_summaries()
@@ -1,6 +1,15 @@
 from datetime import datetime, timedelta
+import asyncio
 import json
-from services.calendar import service
+import re
+from services.calendar import get_calendar_service
+from services.calendar_sync import store
+from services.calendar_retrieval import select_candidates
+from services.calendar_batch import batch_delete, batch_insert
+from services.state_store import state
+from services.metrics import span
+from services.conversation import memory
+from services import temporal
 from reasoning import interpret_calendar_details
 import os 
 import pytz
@@ -8,41 +17,77 @@ import dateparser
 
 LOCAL_TZ = pytz.timezone(os.getenv("TIMEZONE", "UTC"))
 
-def fetch_and_save_events():
-    now = datetime.utcnow().isoformat() + 'Z'
-    one_year_later = (datetime.utcnow() + timedelta(days=365)).isoformat() + 'Z'
-
-    events_result = service.events().list(
-        calendarId='primary',
-        timeMin=now,
-        timeMax=one_year_later,
-        maxResults=500,
-        singleEvents=True,
-        orderBy='startTime'
-    ).execute()
-
-    events = events_result.get('items', [])
-
-    with open('data/current_calendar_cache.json', 'w') as f:
-        json.dump(events, f, indent=2)
-
-    return events
-
-async def handle_calendar_action(update, context, user_message):
-    events = fetch_and_save_events()
-    details = interpret_calendar_details(user_message, events)
+# Longest list shown in a bulk confirmation or report
+MAX_LISTED = 30
+
+# "What do I have ...?"-style questions the handler can answer without the LLM
+LIST_QUERY = re.compile(
+    r"^\s*(what|what's|whats|show|list|anything|any events|do i have|am i (free|busy)|how busy|agenda)\b", re.I
+)
+CHANGE_WORDS = re.compile(
+    r"\b(create|add|book|delete|remove|cancel|move|reschedule|set up|block|clear)\b|(?<!my )(?<!the )\bschedule\b", re.I
+)
+
+# Says the list question is about the user's own plans, not the weather or the news
+AGENDA_WORDS = re.compile(
+    r"\b(schedule|agenda|calendar|events?|meetings?|appointments?|plans|planned|happening|booked"
+    r"|do i have|have i got|am i (free|busy)|how busy)\b",
+    re.I
+)
+
+def list_query_range(user_message):
+    """
+    The local date range of a plain list question, or None if it isn't one or the
+    dates need the LLM to work out.
+    """
+    if not LIST_QUERY.search(user_message) or CHANGE_WORDS.search(user_message):
+        return None
+    return temporal.resolve(user_message)
+
+def is_agenda_question(user_message):
+    """
+    Whether the message is a list question about the calendar that list_query_range
+    can answer, so it can skip the router entirely.
+    """
+    return bool(AGENDA_WORDS.search(user_message)) and list_query_range(user_message) is not None
+
+def delete_remote(event_id):
+    # Runs in a worker thread: the API call and the store write both block
+    with span("calendar.api.delete"):
+        get_calendar_service().events().delete(calendarId='primary', eventId=event_id).execute()
+    store.remove(event_id)
+
+def insert_remote(body):
+    with span("calendar.api.insert"):
+        created_event = get_calendar_service().events().insert(calendarId='primary', body=body).execute()
+    store.add(created_event)
+
+async def handle_calendar_action(update, context, user_message, details=None):
+    # Incremental sync into the local store; a no-op if it synced moments ago
+    with span("calendar.sync"):
+        await asyncio.to_thread(store.sync)
+    # Parsed locally, a list question is answered from the store with no further LLM call,
+    # even when the router already sent a payload
+    window = list_query_range(user_message)
+    if window:
+        await list_range(update, *window)
+        return
+    if details is None:
+        with span("calendar.retrieve"):
+            candidates = select_candidates(user_message, store)
+        details = await interpret_calendar_details(user_message, candidates, memory.history(update.effective_chat.id))
     action = details.get("action")
 
     if action == "create_event":
         # Save to pending and ask confirmation
-        context.user_data["pending_calendar_action"] = {"type": "create", "details": details}
+        state.put(update.effective_user.id, "pending_calendar_action", {"type": "create", "details": details})
         await update.message.reply_text(
             f"📅 I am about to create event '{details.get('title')}' on {details.get('date')} at {details.get('time')} "
             f"for {details.get('duration_minutes') or 60} minutes.\n\nReply 'yes' to confirm or 'no' to cancel."
         )
     elif action == "delete_event":
         # Save to pending and ask confirmation
-        context.user_data["pending_calendar_action"] = {"type": "delete", "details": details}
+        state.put(update.effective_user.id, "pending_calendar_action", {"type": "delete", "details": details})
         if details.get("event_id"):
             desc = f"(ID {details.get('event_id')})"
         else:
@@ -50,8 +95,12 @@ async def handle_calendar_action(update, context, user_message):
         await update.message.reply_text(
             f"🗑️ I am about to delete the event {desc}.\n\nReply 'yes' to confirm or 'no' to cancel."
         )
+    elif action == "bulk_delete":
+        await propose_bulk_delete(update, context, details)
+    elif action == "bulk_create":
+        await propose_bulk_create(update, context, details)
     elif action == "list_events":
-        await list_events(update, events, details)
+        await list_events(update, details)
     else:
         await update.message.reply_text("Sorry, I couldn't figure out what you wanted to do.")
 
@@ -59,85 +108,66 @@ async def confirm_calendar_action(update, context, user_message):
     user_message = user_message.strip().lower()
 
     if user_message in ["no", "cancel", "never mind", "nevermind", "stop"]:
-        context.user_data.pop("pending_calendar_action", None)
+        state.discard(update.effective_user.id, "pending_calendar_action")
         await update.message.reply_text("❌ Okay, I’ve cancelled the calendar action.")
         return
 
-    pending = context.user_data.pop("pending_calendar_action", None)
+    pending = state.take(update.effective_user.id, "pending_calendar_action")
     if not pending:
         await update.message.reply_text("No calendar action pending confirmation.")
         return
 
     action_type = pending["type"]
-    details = pending["details"]
+    details = pending.get("details")
 
     if action_type == "create":
         await create_event(update, details)
     elif action_type == "delete":
-        # Fetch fresh events so deletes don't miss new entries
-        events = fetch_and_save_events()
-        await delete_event(update, details, events)
+        # Pull changes since the last sync so deletes don't miss new entries
+        with span("calendar.sync"):
+            await asyncio.to_thread(store.sync, True)
+        await delete_event(update, context, details)
+    elif action_type == "bulk_delete":
+        await run_bulk_delete(update, pending["events"])
+    elif action_type == "bulk_create":
+        await run_bulk_create(update, pending["events"])
     else:
         await update.message.reply_text("❌ Unknown action type.")
 
-async def delete_event(update, details, events):
+async def delete_event(update, context, details):
     event_id = details.get("event_id")
     title = details.get("title", "").lower()
     target_date = details.get("date")
 
     if event_id:
         try:
-            service.events().delete(
-                calendarId='primary',
-                eventId=event_id
-            ).execute()
+            await asyncio.to_thread(delete_remote, event_id)
             await update.message.reply_text("🗑️ Event deleted successfully.")
         except Exception as e:
             await update.message.reply_text(f"Error deleting event: {e}")
         return
 
-    # Fuzzy match
-    matching = []
-    for e in events:
-        event_title = e["summary"].lower()
-        start_dt = e["start"].get("dateTime", e["start"].get("date"))
-        event_date = start_dt[:10]
-        if title in event_title and event_date == target_date:
-            matching.append(e)
+    # Fuzzy match on title within the target date
+    matching = store.search(title, date_str=target_date) if target_date else []
 
     if len(matching) == 0:
         await update.message.reply_text("❌ Could not find any event matching that title and date.")
     elif len(matching) == 1:
         try:
-            service.events().delete(
-                calendarId='primary',
-                eventId=matching[0]['id']
-            ).execute()
+            await asyncio.to_thread(delete_remote, matching[0]['id'])
             await update.message.reply_text(f"🗑️ Deleted event '{matching[0]['summary']}' on {target_date}.")
         except Exception as e:
             await update.message.reply_text(f"Error deleting event: {e}")
     else:
-        message = "⚠️ Found multiple matching events:\n\n"
-        for e in matching:
-            message += f"- {e['summary']} at {e['start'].get('dateTime', e['start'].get('date'))}\n"
-        message += "\nPlease be more specific."
-        await update.message.reply_text(message)
-
-async def create_event(update, details):
-    title = details.get("title")
-    date = details.get("date")
-    time = details.get("time")
-    duration = details.get("duration_minutes")
-
-    if not (title and date and time):
-        await update.message.reply_text("Missing details to create the event.")
-        return
-
-    if not duration:
-        duration = 60
-    else:
-        duration = int(duration)
-
+        # Offer to delete them all in one batch rather than asking the user to narrow it down
+        await ask_bulk_delete(update, context, matching, "⚠️ Found multiple matching events")
+
+def build_event(title, date, time, duration=None):
+    """
+    Google event body for a local date and time, plus the parsed local start.
+    Raises ValueError if the date/time can't be parsed.
+    """
+    duration = int(duration) if duration else 60
     datetime_str = f"{date} {time}"
 
     parsed = dateparser.parse(
@@ -150,8 +180,7 @@ async def create_event(update, details):
     )
 
     if not parsed:
-        await update.message.reply_text(f"Could not parse date/time: {datetime_str}")
-        return
+        raise ValueError(f"Could not parse date/time: {datetime_str}")
 
     now = datetime.now(tz=parsed.tzinfo)
     if parsed < now:
@@ -166,38 +195,153 @@ async def create_event(update, details):
         'start': {'dateTime': start_iso, 'timeZone': 'UTC'},
         'end': {'dateTime': end_iso, 'timeZone': 'UTC'}
     }
+    return event, parsed
+
+async def create_event(update, details):
+    title = details.get("title")
+    date = details.get("date")
+    time = details.get("time")
+    duration = details.get("duration_minutes")
+
+    if not (title and date and time):
+        await update.message.reply_text("Missing details to create the event.")
+        return
+
+    try:
+        event, parsed = build_event(title, date, time, duration)
+    except ValueError as e:
+        await update.message.reply_text(str(e))
+        return
 
     print("DEBUG Event payload:", json.dumps(event, indent=2))
 
     try:
-        created_event = service.events().insert(
-            calendarId='primary',
-            body=event
-        ).execute()
+        await asyncio.to_thread(insert_remote, event)
         await update.message.reply_text(
             f"✅ Event '{title}' created for {parsed.strftime('%Y-%m-%d %H:%M %Z')}."
         )
     except Exception as e:
         await update.message.reply_text(f"Error creating event: {e}")
 
-async def list_events(update, events, details):
-    filter_date = details.get("date")
+def describe_events(events):
+    lines = [f"- {e.get('summary')} at {e['start'].get('dateTime', e['start'].get('date'))}" for e in events[:MAX_LISTED]]
+    if len(events) > MAX_LISTED:
+        lines.append(f"...and {len(events) - MAX_LISTED} more")
+    return "\n".join(lines)
+
+def local_day(date_str):
+    return LOCAL_TZ.localize(datetime.strptime(date_str, "%Y-%m-%d"))
+
+async def ask_bulk_delete(update, context, events, heading):
+    state.put(update.effective_user.id, "pending_calendar_action", {
+        "type": "bulk_delete",
+        "events": [{"id": e["id"], "summary": e.get("summary"), "start": e["start"]} for e in events]
+    })
+    await update.message.reply_text(
+        f"{heading}:\n\n{describe_events(events)}\n\n"
+        f"Reply 'yes' to delete all {len(events)} or 'no' to cancel."
+    )
 
-    if filter_date:
-        matching = []
-        for e in events:
-            start_dt = e["start"].get("dateTime", e["start"].get("date"))
-            if start_dt.startswith(filter_date):
-                matching.append(e)
+async def propose_bulk_delete(update, context, details):
+    title = details.get("title") or ""
+    start_date = details.get("start_date") or details.get("date")
+    end_date = details.get("end_date") or start_date
+    if not start_date:
+        await update.message.reply_text("Please tell me which dates to delete events from.")
+        return
+
+    try:
+        start = local_day(start_date)
+        end = local_day(end_date) + timedelta(days=1)
+    except ValueError:
+        await update.message.reply_text(f"Could not understand the date range {start_date} to {end_date}.")
+        return
+
+    matching = store.search(title, start=start, end=end)
+    if not matching:
+        await update.message.reply_text(f"❌ No events matching '{title}' between {start_date} and {end_date}.")
+        return
+    await ask_bulk_delete(update, context, matching, f"🗑️ I am about to delete {len(matching)} events")
+
+async def propose_bulk_create(update, context, details):
+    title = details.get("title")
+    dates = details.get("dates") or []
+    time = details.get("time")
+    duration = details.get("duration_minutes")
+
+    if not (title and dates and time):
+        await update.message.reply_text("Missing details to create the events.")
+        return
+
+    bodies = []
+    for date in dates:
+        try:
+            event, _ = build_event(title, date, time, duration)
+        except ValueError as e:
+            await update.message.reply_text(str(e))
+            return
+        bodies.append(event)
+
+    state.put(update.effective_user.id, "pending_calendar_action", {"type": "bulk_create", "events": bodies})
+    await update.message.reply_text(
+        f"📅 I am about to create {len(bodies)} events:\n\n{describe_events(bodies)}\n\n"
+        f"Reply 'yes' to confirm or 'no' to cancel."
+    )
+
+def batch_report(verb, events, results):
+    failures = [(e, error) for e, (_, error) in zip(events, results) if error]
+    message = f"{'✅' if not failures else '⚠️'} {verb} {len(events) - len(failures)} of {len(events)} events."
+    if failures:
+        message += "\n\nFailed:\n"
+        for e, error in failures[:MAX_LISTED]:
+            start = e['start'].get('dateTime', e['start'].get('date'))
+            message += f"- {e.get('summary')} at {start}: {error}\n"
+    return message
+
+async def run_bulk_delete(update, events):
+    # One batch round trip per 50 events instead of one request each
+    with span("calendar.api.batch_delete"):
+        results = await asyncio.to_thread(batch_delete, [e["id"] for e in events])
+    # One store write for the whole batch, off the event loop
+    deleted = [e["id"] for e, (_, error) in zip(events, results) if not error]
+    await asyncio.to_thread(store.update, removed_ids=deleted)
+    await update.message.reply_text(batch_report("Deleted", events, results))
+
+async def run_bulk_create(update, bodies):
+    with span("calendar.api.batch_insert"):
+        results = await asyncio.to_thread(batch_insert, bodies)
+    created = [event for event, error in results if event and not error]
+    await asyncio.to_thread(store.update, added=created)
+    await update.message.reply_text(batch_report("Created", bodies, results))
+
+async def list_range(update, start_date, end_date):
+    # Local-day bounds, so events late in the evening land on the right day
+    matching = store.between(*temporal.local_bounds(start_date, end_date))
+    if start_date == end_date:
+        if not matching:
+            await update.message.reply_text(f"✅ You have nothing scheduled on {start_date}. Enjoy your free day!")
+            return
+        heading = f"📅 Events on {start_date}"
+    else:
         if not matching:
-            await update.message.reply_text(f"✅ You have nothing scheduled on {filter_date}. Enjoy your free day!")
+            await update.message.reply_text(f"✅ You have nothing scheduled from {start_date} to {end_date}.")
             return
+        heading = f"📅 Events from {start_date} to {end_date}"
+    await update.message.reply_text(f"{heading}:\n\n{describe_events(matching)}")
 
-        message = f"📅 Events on {filter_date}:\n\n"
-        for e in matching:
-            message += f"- {e['summary']} at {start_dt}\n"
-        await update.message.reply_text(message)
+async def list_events(update, details):
+    filter_date = details.get("date")
+
+    if filter_date:
+        try:
+            day = datetime.strptime(filter_date, "%Y-%m-%d").date()
+        except ValueError:
+            await update.message.reply_text(f"Could not understand the date {filter_date}.")
+            return
+        await list_range(update, day, day)
     else:
+        # Only an undated list needs every upcoming event
+        events = await asyncio.to_thread(store.upcoming)
         if not events:
             await update.message.reply_text("You have no upcoming events.")
             return
@@ -0,0 +1,54 @@
+# job_handler.py
+from services.jobs import manager
+
+
+async def start_background_job(update, context, name, command, shell=False):
+    job = manager.submit(name, command, context.bot, update.effective_chat.id, shell=shell)
+    await update.message.reply_text(
+        f"🧵 Started background job {job.id} for {name}.\n\n"
+        f"Use /status {job.id}, /tail {job.id} or /cancel {job.id}. I'll message you when it finishes."
+    )
+
+
+async def _job_from_args(update, context):
+    if not context.args:
+        await update.message.reply_text("Please include a job ID, e.g. /status a1b2c3")
+        return None
+    job = manager.get(context.args[0], update.effective_chat.id)
+    if not job:
+        await update.message.reply_text(f"❌ No job with ID {context.args[0]}.")
+    return job
+
+
+async def jobs_command(update, context):
+    jobs = manager.for_chat(update.effective_chat.id)
+    if not jobs:
+        await update.message.reply_text("No background jobs.")
+        return
+    message = "🧵 Background jobs:\n\n"
+    for job in reversed(jobs):
+        message += f"- {job.describe()}\n"
+    await update.message.reply_text(message)
+
+
+async def status_command(update, context):
+    job = await _job_from_args(update, context)
+    if job:
+        await update.message.reply_text(f"🧵 {job.describe()}")
+
+
+async def tail_command(update, context):
+    job = await _job_from_args(update, context)
+    if job:
+        output = job.spool.tail() or "(No output yet)"
+        await update.message.reply_text(f"🧵 {job.describe()}\n\n{output}"[:4096])
+
+
+async def cancel_command(update, context):
+    job = await _job_from_args(update, context)
+    if not job:
+        return
+    if manager.cancel(job):
+        await update.message.reply_text(f"🛑 Cancelling job {job.id}.")
+    else:
+        await update.message.reply_text(f"Job {job.id} already finished ({job.status}).")
@@ -0,0 +1,34 @@
+# output_handler.py
+import asyncio
+from services.output_spool import store
+
+
+async def more_command(update, context):
+    """
+    /more <id> [page] pages through a command's full output; without a page it continues
+    from the last one shown.
+    """
+    if not context.args:
+        await update.message.reply_text("Please include an output ID, e.g. /more a1b2c3")
+        return
+    output = store.get(context.args[0], update.effective_chat.id)
+    if not output:
+        await update.message.reply_text(f"❌ No output with ID {context.args[0]} (it may have been cleaned up).")
+        return
+
+    pages = await output.page_count()
+    if len(context.args) > 1:
+        if not context.args[1].isdigit():
+            await update.message.reply_text("The page must be a number, e.g. /more a1b2c3 2")
+            return
+        number = int(context.args[1])
+    else:
+        number = output.cursor + 1
+    if not 1 <= number <= pages:
+        await update.message.reply_text(f"Output {output.id} has {pages} pages.")
+        return
+
+    output.cursor = number
+    footer = f"\n\n/more {output.id} for page {number + 1}." if number < pages else ""
+    text = (await asyncio.to_thread(output.page, number)).rstrip("\n") or "(No output)"
+    await update.message.reply_text(f"📄 Output {output.id}, page {number}/{pages}:\n\n{text}{footer}"[:4096])
@@ -1,29 +1,66 @@
 
 # script_handler.py
-import subprocess
-import json
 from reasoning import interpret_script_details
+from services.script_catalog import catalog
+from services.script_index import name_query_keyword, is_list_query
+from services.executor import run_with_live_output, finish
+from services.jobs import BACKGROUND_REPLIES
+from services.state_store import state
+from services.metrics import span
+from services.conversation import memory
+from handlers.job_handler import start_background_job
+
+def load_script_summaries():
+    # In-memory catalog kept current by the scripts/ watcher
+    return catalog.summaries()
+
+def candidate_scripts(user_message):
+    # Only the closest few scripts go into prompts
+    return catalog.search(user_message)
+
+def format_script_list(scripts):
+    return "\n".join(f"- {s['name']}: {s.get('description', '')}" for s in scripts)
+
+async def answer_catalog_query(update, user_message):
+    """
+    Answers "which scripts..." questions straight from the catalog. Returns False if it isn't one.
+    """
+    keyword = name_query_keyword(user_message)
+    if keyword:
+        matches = catalog.names_containing(keyword)
+        if matches:
+            await update.message.reply_text(f"📜 Scripts with '{keyword}' in the name:\n\n{format_script_list(matches)}")
+        else:
+            await update.message.reply_text(f"No scripts have '{keyword}' in the name.")
+        return True
+    if is_list_query(user_message):
+        await update.message.reply_text(f"📜 Available scripts:\n\n{format_script_list(load_script_summaries())}")
+        return True
+    return False
+
+async def handle_script_action(update, context, user_message, details=None):
+    if await answer_catalog_query(update, user_message):
+        return
 
-async def handle_script_action(update, context, user_message):
-    # Load script summaries
-    with open('data/script_summaries.json') as f:
-        script_summaries = json.load(f)
-
-    # Get detailed script action
-    details = interpret_script_details(user_message, script_summaries)
+    # Get detailed script action, unless the router already extracted it
+    if details is None:
+        with span("script.retrieve"):
+            candidates = candidate_scripts(user_message)
+        details = await interpret_script_details(user_message, candidates, memory.history(update.effective_chat.id))
 
     script_name = details.get("script_name")
     execution_method = details.get("execution_method")
     arguments = details.get("arguments", [])
 
-    # Save to context so we can confirm before executing
-    context.user_data["pending_script"] = details
+    # Save pending so any worker can confirm before executing
+    state.put(update.effective_user.id, "pending_script", details)
 
     arg_str = " ".join(arguments) if arguments else "(no arguments)"
 
     # Ask for confirmation
     await update.message.reply_text(
-        f"Run script '{script_name}' with method '{execution_method}' and arguments {arg_str}? Reply 'yes' to confirm or 'no' to cancel."
+        f"Run script '{script_name}' with method '{execution_method}' and arguments {arg_str}? "
+        f"Reply 'yes' to confirm, 'bg' to run it as a background job, or 'no' to cancel."
     )
 
 async def confirm_script_execution(update, context, user_message):
@@ -31,11 +68,12 @@ async def confirm_script_execution(update, context, user_message):
     print(user_message)
     # Handle "no" or cancellation
     if user_message in ["no", "cancel", "never mind", "nevermind", "stop"]:
-        context.user_data.pop("pending_script", None)
+        state.discard(update.effective_user.id, "pending_script")
         await update.message.reply_text("❌ Okay, I’ve cancelled the script.")
         return
 
-    details = context.user_data.get("pending_script")
+    # Take the pending script before running so a message sent mid-run can't start it twice
+    details = state.take(update.effective_user.id, "pending_script")
     if not details:
         await update.message.reply_text("No script pending execution.")
         return
@@ -46,39 +84,36 @@ async def confirm_script_execution(update, context, user_message):
 
     script_path = f"scripts/{script_name}"
 
-    try:
-        if execution_method == "bash":
-            result = subprocess.run(
-                ["bash", script_path] + arguments,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                timeout=120
-            )
-        elif execution_method == "python":
-            result = subprocess.run(
-                ["python", script_path] + arguments,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                timeout=120
-            )
-        else:
-            await update.message.reply_text(f"Unknown execution method: {execution_method}")
-            return
-
-        output = result.stdout or "(No output)"
-        error = result.stderr
+    if execution_method == "bash":
+        command = ["bash", script_path] + arguments
+    elif execution_method == "python":
+        command = ["python", script_path] + arguments
+    else:
+        await update.message.reply_text(f"Unknown execution method: {execution_method}")
+        return
 
-        if result.returncode == 0:
-            await update.message.reply_text(f"✅ Script completed successfully:\n\n{output[:4000]}")
-        else:
-            await update.message.reply_text(f"⚠️ Script returned errors:\n\n{error}")
+    if user_message in BACKGROUND_REPLIES:
+        await start_background_job(update, context, script_name, command)
+        return
 
+    try:
+        with span("script.run"):
+            result, message = await run_with_live_output(update, f"Running {script_name}...", command, timeout=120)
     except Exception as e:
         await update.message.reply_text(f"Error running script: {e}")
+        return
 
-    # Clear the pending script
-    context.user_data["pending_script"] = None
-
-
+    output = result.stdout.text or "(No output)"
+    error = result.stderr.text
+
+    if result.timed_out:
+        await finish(
+            message,
+            "⏱️ Script timed out after 120 seconds (reply 'bg' next time to run it as a background job):\n\n",
+            result.combined.text,
+            result=result
+        )
+    elif result.returncode == 0:
+        await finish(message, "✅ Script completed successfully:\n\n", output, result=result)
+    else:
+        await finish(message, "⚠️ Script returned errors:\n\n", error, result=result)
@@ -1,19 +1,15 @@
-import subprocess
-from openai import OpenAI
-import json
-
-client = OpenAI()
-
-# List of dangerous commands
-BLACKLIST = [
-    "rm ",
-    "shutdown",
-    "reboot",
-    "mkfs",
-    ":(){",  # fork bomb
-]
-
-def interpret_server_command(message: str) -> dict:
+from services import llm
+from services.executor import run_with_live_output, finish
+from services.jobs import BACKGROUND_REPLIES
+from services.state_store import state
+from services.metrics import span
+from services.prompts import Prompt
+from services.conversation import memory
+from services.command_cache import cache as command_cache
+from services.command_policy import policy
+from handlers.job_handler import start_background_job
+
+async def interpret_server_command(message: str, history: str = "") -> dict:
     """
     Asks GPT to generate the command and a short explanation.
     """
@@ -46,47 +42,52 @@ Output:
 If you are unsure, leave the command blank.
 """
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": "You output structured JSON only."},
-            {"role": "user", "content": f"{prompt}\n\nUser: {message}"}
-        ],
-        temperature=0
+    return await llm.chat_json(
+        Prompt("interpret_server_command").add(prompt).add_history(history).add(f"\n\nUser: {message}")
     )
-    return json.loads(response.choices[0].message.content.strip())
 
-def analyze_command_error(command: str, stderr: str) -> str:
+async def analyze_command_error(command: str, stderr: str) -> str:
     """
     Asks GPT to explain the error output in plain language.
     """
-    prompt = f"""
+    prompt = Prompt("analyze_command_error")
+    prompt.add(f"""
 You are a Linux troubleshooting assistant.
 
 Here is the command:
 {command}
 
 Here is the error output:
-{stderr}
+""")
+    # The end of stderr usually holds the actual error
+    prompt.add(stderr, priority=20, trim="tail", name="stderr")
+    prompt.add("""
 
 Explain clearly what the error means and suggest how to fix it.
-"""
+""")
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
+    return await llm.chat(
+        [
             {"role": "system", "content": "You provide plain text explanations."},
-            {"role": "user", "content": prompt}
+            {"role": "user", "content": prompt.render()}
         ],
-        temperature=0
+        temperature=0,
+        name=prompt.name
     )
-    return response.choices[0].message.content.strip()
 
-async def handle_server_command(update, context, user_message):
+async def handle_server_command(update, context, user_message, interpretation=None):
     """
     Handles new commands (not confirmations).
     """
-    interpretation = interpret_server_command(user_message)
+    cached = None
+    if interpretation is None:
+        # Requests already confirmed once are served from the command cache
+        cached = command_cache.lookup(user_message)
+        if cached:
+            interpretation = {"command": cached[0], "notes": f"The command you confirmed for \"{cached[1]}\"."}
+        else:
+            with span("reasoning.interpret_server_command"):
+                interpretation = await interpret_server_command(user_message, memory.history(update.effective_chat.id))
     command = interpretation.get("command")
     notes = interpretation.get("notes")
 
@@ -94,17 +95,24 @@ async def handle_server_command(update, context, user_message):
         await update.message.reply_text("Sorry, I couldn't figure out what command to run.")
         return
 
-    for forbidden in BLACKLIST:
-        if forbidden in command:
-            await update.message.reply_text(
-                f"❌ The command was blocked because it contains a forbidden pattern: {forbidden}"
-            )
-            return
+    with span("server.policy"):
+        verdict = policy.check(command)
+    if not verdict.allowed:
+        if cached:
+            # Refused under the current rules, so it shouldn't keep coming back
+            command_cache.invalidate(key=cached[2])
+        await update.message.reply_text(f"❌ The command was blocked because {verdict.reason}.")
+        return
 
-    # Save to context for confirmation
-    context.user_data["pending_server_command"] = {"command": command}
+    # Save pending for confirmation
+    state.put(
+        update.effective_user.id,
+        "pending_server_command",
+        {"command": command, "phrase": user_message, "cache_key": cached[2] if cached else None}
+    )
     await update.message.reply_text(
-        f"🛠️ I will run this command:\n\n`{command}`\n\nNotes: {notes}\n\nReply 'yes' to confirm or 'no' to cancel."
+        f"🛠️ I will run this command:\n\n`{command}`\n\nNotes: {notes}\n\n"
+        f"Reply 'yes' to confirm, 'bg' to run it as a background job, or 'no' to cancel."
     )
 
 async def confirm_server_command(update, context, user_message):
@@ -114,35 +122,75 @@ async def confirm_server_command(update, context, user_message):
     user_message = user_message.strip().lower()
 
     if user_message in ["no", "cancel", "never mind", "nevermind", "stop"]:
-        context.user_data.pop("pending_server_command", None)
+        state.discard(update.effective_user.id, "pending_server_command")
         await update.message.reply_text("❌ Okay, I’ve cancelled the command.")
         return
 
-    pending = context.user_data.pop("pending_server_command", None)
+    pending = state.take(update.effective_user.id, "pending_server_command")
     if not pending:
         await update.message.reply_text("No command is pending confirmation.")
         return
 
     command = pending["command"]
+    # A cached command that fails is dropped; one that succeeds is cached (see below)
+    cache_key = pending.get("cache_key")
+
+    if user_message in BACKGROUND_REPLIES:
+        await start_background_job(update, context, command, command, shell=True)
+        return
 
     try:
-        result = subprocess.run(
-            command,
-            shell=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            timeout=20
+        with span("server.run"):
+            result, message = await run_with_live_output(update, f"Running `{command}`...", command, shell=True, timeout=20)
+    except Exception as e:
+        command_cache.invalidate(key=cache_key)
+        await update.message.reply_text(f"Error running command: {e}")
+        return
+
+    if result.returncode != 0 or result.timed_out:
+        command_cache.invalidate(key=cache_key)
+    elif pending.get("phrase"):
+        # Confirmed and it worked, so the same request can skip the LLM next time
+        command_cache.store(pending["phrase"], command)
+
+    if result.timed_out:
+        await finish(
+            message,
+            "⏱️ Command timed out after 20 seconds (reply 'bg' next time to run it as a background job):\n\n",
+            result.combined.text,
+            result=result
+        )
+    elif result.returncode == 0:
+        output = result.stdout.text or "(No output)"
+        await finish(message, "✅ Command output:\n\n", output, result=result)
+    else:
+        with span("reasoning.analyze_command_error"):
+            error_summary = await analyze_command_error(command, result.stderr.text)
+        await finish(
+            message,
+            "⚠️ The command returned an error:\n\n",
+            result.stderr.text,
+            f"\n\n🔍 {error_summary}",
+            result=result
         )
 
-        if result.returncode == 0:
-            output = result.stdout or "(No output)"
-            await update.message.reply_text(f"✅ Command output:\n\n{output[:4000]}")
-        else:
-            error_summary = analyze_command_error(command, result.stderr)
-            await update.message.reply_text(
-                f"⚠️ The command returned an error:\n\n{result.stderr}\n\n🔍 {error_summary}"
-            )
 
-    except Exception as e:
-        await update.message.reply_text(f"Error running command: {e}")
+async def forget_command(update, context):
+    """
+    /forget <request> drops a cached command; /forget alone lists what is cached.
+    """
+    if not context.args:
+        entries = command_cache.entries()
+        if not entries:
+            await update.message.reply_text("No remembered commands.")
+            return
+        message = "🧠 Remembered commands (use /forget <request> to drop one):\n\n"
+        for phrase, command, hits in entries[:30]:
+            message += f"- \"{phrase}\" → `{command}` ({hits} reuses)\n"
+        await update.message.reply_text(message[:4096])
+        return
+    phrase = " ".join(context.args)
+    if command_cache.invalidate(phrase=phrase):
+        await update.message.reply_text(f"🗑️ Forgot the command for \"{phrase}\".")
+    else:
+        await update.message.reply_text(f"❌ No remembered command matches \"{phrase}\".")
@@ -0,0 +1,6 @@
+# stats_handler.py
+from services import metrics
+
+
+async def stats_command(update, context):
+    await update.message.reply_text(metrics.format_stats()[:4096])
@@ -0,0 +1,188 @@
+# intent_classifier.py
+import math
+import os
+import re
+import zlib
+from collections import Counter, defaultdict
+from services import metrics
+
+INTENTS = ["script", "calendar", "server_command", "general_chat"]
+
+# Below this confidence the message goes to the LLM router instead
+FAST_PATH_THRESHOLD = float(os.getenv("FAST_PATH_THRESHOLD", "0.85"))
+
+HASH_BUCKETS = 2 ** 18
+
+# Scales the mean per-feature log-likelihood; naive Bayes is overconfident without it
+SHARPNESS = 8.0
+
+# A few dozen seed examples can't justify skipping the router, so the model alone never
+# reaches the threshold; it still ranks intents for the stats. Only rules fast-path.
+MODEL_MAX_CONFIDENCE = min(0.8, FAST_PATH_THRESHOLD - 0.05)
+
+WEEKDAY = r"(mon|tues|wednes|thurs|fri|satur|sun)day"
+MONTH = r"(jan(uary)?|feb(ruary)?|mar(ch)?|apr(il)?|may|june?|july?|aug(ust)?|sep(t(ember)?)?|oct(ober)?|nov(ember)?|dec(ember)?)\.? \d{1,2}"
+
+# Words that pin a message to a day or time; calendar rules need one
+WHEN = (
+    rf"\b(today|tomorrow|tonight|this (morning|afternoon|evening|week|weekend|month)"
+    rf"|next (week|weekend|month|{WEEKDAY})|{WEEKDAY}|{MONTH}|the \d{{1,2}}(st|nd|rd|th)"
+    rf"|\d{{1,2}}(:\d{{2}})? ?(am|pm)|at \d{{1,2}}(:\d{{2}})?|noon)\b"
+)
+
+# High-precision patterns; a match decides the intent on its own
+RULES = [
+    ("script", re.compile(r"\b(run|execute|start|launch)\b.*\b[\w.-]+\.(py|sh)\b", re.I), 0.97),
+    ("script", re.compile(r"\b(list|show|what)\b.*\bscripts?\b", re.I), 0.9),
+    ("calendar", re.compile(rf"\bwhat (do|have) i (got |have )?(on |planned )?(on )?{WHEN}", re.I), 0.95),
+    ("calendar", re.compile(rf"\b(am i (free|busy)|anything (on|planned)) (on )?{WHEN}", re.I), 0.93),
+    # Calendar nouns alone are ambiguous ("schedule a cron job", "my calendar app idea"),
+    # so these also need a day or time somewhere in the message
+    ("calendar", re.compile(
+        rf"^(?=.*{WHEN})(?=.*(\b(my|the) calendar\b|\b(on|to|from|in) my (calendar|schedule)\b|\bmeetings? with\b"
+        r"|\b(book|make|schedule|set up|cancel|move|reschedule) (an? |my |the )?(appointment|meeting)s?\b))",
+        re.I | re.S), 0.9),
+    ("server_command", re.compile(r"\b(disk|memory|cpu|ram) (usage|space|load)\b", re.I), 0.95),
+    ("server_command", re.compile(r"\b(uptime|ip addr|my ip|running processes|open ports|free space|systemctl|journalctl)\b", re.I), 0.92),
+    ("general_chat", re.compile(r"^\s*(hi|hello|hey|thanks|thank you|good (morning|evening|night))\W*$", re.I), 0.95),
+]
+
+# Seed corpus for the hashed n-gram model
+SEED_EXAMPLES = {
+    "script": [
+        "run hello.py",
+        "execute the backup script",
+        "run test.sh with argument prod",
+        "start the deploy script",
+        "which scripts can you run",
+        "run the cleanup script again",
+        "launch my python script",
+        "kick off the nightly sync script",
+    ],
+    "calendar": [
+        "what do i have tomorrow",
+        "what's on my calendar today",
+        "create a meeting tomorrow at 10am",
+        "delete the dentist appointment on friday",
+        "schedule lunch with sam next tuesday at noon",
+        "cancel my standup on monday",
+        "am i free on july 5th",
+        "add an event called project kickoff",
+        "remove the gym session this evening",
+        "what events do i have next week",
+    ],
+    "server_command": [
+        "show disk usage",
+        "how much memory is free",
+        "show my ip",
+        "list running processes",
+        "check cpu load",
+        "what is the uptime of the server",
+        "show open ports",
+        "restart nginx",
+        "tail the syslog",
+        "how much space is left on the drive",
+    ],
+    "general_chat": [
+        "hello",
+        "how are you",
+        "tell me a joke",
+        "what is the capital of france",
+        "explain how dns works",
+        "thanks for the help",
+        "write a haiku about servers",
+        "who won the world cup",
+    ],
+}
+
+_hits = Counter()
+_fallbacks = Counter()
+
+
+def _features(text: str) -> list:
+    words = re.findall(r"[a-z0-9_.]+", text.lower())
+    grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    padded = f" {' '.join(words)} "
+    grams += [padded[i:i + 3] for i in range(len(padded) - 2)]
+    return [zlib.crc32(g.encode()) % HASH_BUCKETS for g in grams]
+
+
+def _train(examples: dict) -> tuple:
+    counts = {intent: defaultdict(int) for intent in INTENTS}
+    totals = Counter()
+    for intent, texts in examples.items():
+        for text in texts:
+            for bucket in _features(text):
+                counts[intent][bucket] += 1
+                totals[intent] += 1
+    return counts, totals
+
+
+_counts, _totals = _train(SEED_EXAMPLES)
+
+
+def _model_scores(text: str) -> dict:
+    """
+    Multinomial naive Bayes over hashed n-grams, normalized to probabilities.
+    """
+    buckets = _features(text)
+    if not buckets:
+        return {intent: 1 / len(INTENTS) for intent in INTENTS}
+    log_scores = {}
+    for intent in INTENTS:
+        denom = _totals[intent] + HASH_BUCKETS
+        counts = _counts[intent]
+        log_likelihood = sum(math.log((counts.get(b, 0) + 1) / denom) for b in buckets)
+        log_scores[intent] = log_likelihood / len(buckets) * SHARPNESS
+    top = max(log_scores.values())
+    exp_scores = {intent: math.exp(score - top) for intent, score in log_scores.items()}
+    norm = sum(exp_scores.values())
+    return {intent: score / norm for intent, score in exp_scores.items()}
+
+
+def classify(text: str) -> tuple:
+    """
+    Returns (intent, confidence) without any network call.
+    """
+    for intent, pattern, confidence in RULES:
+        if pattern.search(text):
+            return intent, confidence
+    scores = _model_scores(text)
+    intent = max(scores, key=scores.get)
+    return intent, min(scores[intent], MODEL_MAX_CONFIDENCE)
+
+
+def fast_path(text: str):
+    """
+    Returns the intent when the local classifier is confident enough, otherwise None.
+    """
+    intent, confidence = classify(text)
+    if confidence >= FAST_PATH_THRESHOLD:
+        _hits[intent] += 1
+        return intent
+    return None
+
+
+def record_fallback(intent: str):
+    """
+    Records the intent the LLM picked for a message the fast path passed on.
+    """
+    _fallbacks[intent or "unknown"] += 1
+
+
+def stats() -> dict:
+    """
+    Per-intent fast-path hit rates, for tuning rules and the threshold.
+    """
+    report = {}
+    for intent in sorted(set(_hits) | set(_fallbacks)):
+        total = _hits[intent] + _fallbacks[intent]
+        report[intent] = {
+            "fast_path": _hits[intent],
+            "llm": _fallbacks[intent],
+            "hit_rate": _hits[intent] / total if total else 0.0,
+        }
+    return report
+
+
+metrics.register("intent_classifier", stats)
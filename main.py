@@ -25,7 +25,8 @@ from pathlib import Path
     
     
     
-from telegram.ext import ApplicationBuilder, MessageHandler, filters
+from telegram.ext import ApplicationBuilder, CommandHandler, ExtBot, MessageHandler, filters
+from telegram.request import HTTPXRequest
 from pathlib import Path
 from dotenv import load_dotenv
 import os
@@ -36,15 +37,93 @@ load_dotenv(dotenv_path=env_path)
 
 BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 
+# "polling" runs one process; "webhook" serves Telegram over HTTP with several workers
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+
 from generate_script_summaries import generate_summaries
 from general import handle_message
+from handlers import job_handler, output_handler, server_handler, stats_handler
+from services.script_catalog import catalog
+from services.chat_scheduler import ChatScheduler
+from services import metrics
+from services.conversation import memory
+from services import calendar
+from services.state_store import state
 
-def main():
+# Serializes each chat's messages while letting different chats run side by side
+scheduler = ChatScheduler(handle_message)
+metrics.register("scheduler", scheduler.stats)
+
+class TimedRequest(HTTPXRequest):
+    # Times every Bot API call (sendMessage, editMessageText, ...) as a telegram.<method> stage
+    async def do_request(self, url, method, *args, **kwargs):
+        with metrics.span(f"telegram.{url.rsplit('/', 1)[-1]}"):
+            return await super().do_request(url, method, *args, **kwargs)
+
+class ConversationBot(ExtBot):
+    # Records what the bot says in each chat, so later prompts can see the conversation
+    async def send_message(self, chat_id, text, *args, **kwargs):
+        message = await super().send_message(chat_id, text, *args, **kwargs)
+        memory.add_reply(chat_id, text, message.message_id)
+        return message
+
+    async def edit_message_text(self, text, chat_id=None, message_id=None, *args, **kwargs):
+        result = await super().edit_message_text(text, chat_id, message_id, *args, **kwargs)
+        if chat_id is not None:
+            # Live output edits replace the same turn instead of adding one per edit
+            memory.add_reply(chat_id, text, message_id)
+        return result
+
+async def on_startup(app):
+    metrics.start_exporter()
+    # Drop confirmations that expired while the bot was down
+    state.purge_expired()
+    # Pick up scripts added or edited while the bot is running. Only one webhook worker
+    # re-summarizes them; the others reload the summaries it saves
+    catalog.start(watch_scripts=os.getenv("WEBHOOK_WORKER_INDEX", "0") == "0")
+    # Build the Calendar client off the event loop so the first calendar message doesn't wait
+    asyncio.get_running_loop().run_in_executor(None, calendar.warm_up)
+
+async def on_shutdown(app):
+    catalog.stop()
+    metrics.stop_exporter()
+
+def build_application():
     # Create application (new v20 API)
-    app = ApplicationBuilder().token(BOT_TOKEN).build()
+    # Updates are dispatched concurrently; the scheduler keeps each chat's messages in order
+    app = (
+        ApplicationBuilder().concurrent_updates(True)
+        .bot(ConversationBot(BOT_TOKEN, request=TimedRequest(connection_pool_size=256)))
+        .post_init(on_startup).post_shutdown(on_shutdown).build()
+    )
 
     # Add message handler
-    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
+    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, scheduler.submit))
+
+    # Background job commands
+    app.add_handler(CommandHandler("jobs", job_handler.jobs_command))
+    app.add_handler(CommandHandler("status", job_handler.status_command))
+    app.add_handler(CommandHandler("tail", job_handler.tail_command))
+    app.add_handler(CommandHandler("cancel", job_handler.cancel_command))
+
+    # Paging through long command output
+    app.add_handler(CommandHandler("more", output_handler.more_command))
+
+    # Per-stage latency breakdown
+    app.add_handler(CommandHandler("stats", stats_handler.stats_command))
+
+    # Commands remembered from earlier confirmations
+    app.add_handler(CommandHandler("forget", server_handler.forget_command))
+
+    return app
+
+def main():
+    if BOT_MODE == "webhook":
+        import webhook
+        webhook.serve()
+        return
+
+    app = build_application()
 
     # Start polling
     print("✅ Bot started. Listening for messages...")
@@ -1,18 +1,19 @@
 # reasoning.py
-from openai import OpenAI
 import json
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
 import os
 import pytz
+from services import llm
+from services.metrics import span
+from services.prompts import Prompt
 LOCAL_TZ = pytz.timezone(os.getenv("TIMEZONE", "UTC"))
 
 load_dotenv()
-client = OpenAI()
 
 
-def interpret_high_level_intent(message: str) -> dict:
-    prompt = f"""
+async def interpret_high_level_intent(message: str, history: str = "") -> dict:
+    prompt = Prompt("interpret_high_level_intent").add("""
 You are an AI assistant that classifies user messages into high-level intents.
 
 Possible intents:
@@ -25,64 +26,71 @@ Also, suggest any context you think will be needed.
 
 Respond ONLY in this JSON format:
 
-{{
+{
   "intent": "<one of: script, calendar, server_command, general_chat>",
   "context_needed": [<list of context items, e.g., script_summaries, calendar_events>],
   "notes": "<short explanation>"
-}}
-
+}
+""")
+    prompt.add_history(history)
+    prompt.add(f"""
 User message:
 \"\"\"
 {message}
 \"\"\"
-"""
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": "You output structured JSON only."},
-            {"role": "user", "content": prompt}
-        ],
-        temperature=0
-    )
-    return json.loads(response.choices[0].message.content.strip())
-
-def interpret_calendar_details(message: str, calendar_events: list) -> dict:
+""")
+    with span("reasoning.interpret_high_level_intent"):
+        return await llm.chat_json(prompt)
+
+async def interpret_calendar_details(message: str, calendar_events: list, history: str = "") -> dict:
     now_local = datetime.now(LOCAL_TZ)
     today_str = now_local.strftime("%Y-%m-%d")
-    prompt = f"""
+    prompt = Prompt("interpret_calendar_details")
+    prompt.add("""
 You are an AI assistant that determines the exact calendar action the user wants to perform.
-
+""")
+    prompt.add_history(history)
+    prompt.add(f"""
 Here is the user's message:
 \"\"\"
 {message}
 \"\"\"
 
-Here are all upcoming calendar events in JSON:
-{json.dumps(calendar_events, indent=2)}
+Here are the upcoming calendar events most likely relevant to the message, as JSON (id, summary, start, end):
+""")
+    # The least relevant events (listed last) go first when over budget
+    prompt.add_items("calendar_events", calendar_events, priority=20)
+    prompt.add(f"""
 
 Determine the action:
 
 - If the user wants to know what events they have on a specific date (e.g., "today," "tomorrow," "July 5th"), set "action" to "list_events" and ALWAYS include "date" in YYYY-MM-DD format. However, it the date is ambiguous (e.g., "next Friday"), always use the next occurrence of that day in the future. Keep in mind todays date time is TODAY'S DATE (local timezone): {today_str}, use only this as a reference to calculate dates.
 - If they want to create an event, set "action" to "create_event" and fill in as many details as possible.
 - If they want to delete an event, set "action" to "delete_event" and include "event_id" if you can identify it by title or date. If you cannot confidently determine the event_id, leave it blank and instead fill out the "title" and "date" fields exactly matching the event to delete.
+- If they want to delete every event matching a title over a period (e.g., "delete all standups next week"), set "action" to "bulk_delete" with "title" and the inclusive "start_date" and "end_date".
+- If they want the same event on several days (e.g., "block 9-10 every weekday this month"), set "action" to "bulk_create" with "title", "time", "duration_minutes" and every day listed in "dates".
 - If you're not sure, pick the closest action and include notes explaining any uncertainty.
 
 Respond ONLY in this exact JSON format:
 
 {{
-  "action": "<create_event | delete_event | list_events>",
+  "action": "<create_event | delete_event | list_events | bulk_delete | bulk_create>",
   "title": "<event title if applicable>",
   "date": "<YYYY-MM-DD if applicable>",
   "time": "<HH:MM if applicable>",
   "duration_minutes": "<integer if applicable>",
   "event_id": "<Google Calendar event ID if applicable>",
+  "start_date": "<YYYY-MM-DD for bulk_delete>",
+  "end_date": "<YYYY-MM-DD for bulk_delete>",
+  "dates": ["<YYYY-MM-DD for each bulk_create event>"],
   "notes": "<explanation or clarification if needed>"
 }}
-
+""")
+    prompt.add("""
 Examples:
 
 If the user says "What do I have tomorrow?", you might respond:
-{{
+{
   "action": "list_events",
   "title": "",
   "date": "2024-07-04",
@@ -90,10 +98,10 @@ If the user says "What do I have tomorrow?", you might respond:
   "duration_minutes": "",
   "event_id": "",
   "notes": "User asked for tomorrow's events."
-}}
+}
 
 If the user says "Create a meeting called Project Kickoff tomorrow at 10 AM for 60 minutes", you might respond:
-{{
+{
   "action": "create_event",
   "title": "Project Kickoff",
   "date": "2024-07-04",
@@ -101,27 +109,23 @@ If the user says "Create a meeting called Project Kickoff tomorrow at 10 AM for
   "duration_minutes": "60",
   "event_id": "",
   "notes": ""
-}}
-"""
-
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": "You output structured JSON only."},
-            {"role": "user", "content": prompt}
-        ],
-        temperature=0
-    )
-    return json.loads(response.choices[0].message.content.strip())
-
-def interpret_script_details(message: str, script_summaries: list) -> dict:
-    import json
-    prompt = f"""
+}
+""", priority=10, name="examples")
+
+    with span("reasoning.interpret_calendar_details"):
+        return await llm.chat_json(prompt)
+
+async def interpret_script_details(message: str, script_summaries: list, history: str = "") -> dict:
+    prompt = Prompt("interpret_script_details")
+    prompt.add("""
 You are an AI assistant that determines which script to run based on the user's message.
 
 Here are available scripts:
-{json.dumps(script_summaries, indent=2)}
-
+""")
+    prompt.add_items("scripts", script_summaries, priority=20, render=lambda items: json.dumps(items, indent=2))
+    prompt.add("\n")
+    prompt.add_history(history)
+    prompt.add(f"""
 User message:
 \"\"\"
 {message}
@@ -137,13 +141,73 @@ Respond ONLY in this JSON format:
   "arguments": ["arg1", "arg2"],
   "notes": "<short explanation>"
 }}
-"""
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": "You output structured JSON only."},
-            {"role": "user", "content": prompt}
-        ],
-        temperature=0
-    )
-    return json.loads(response.choices[0].message.content.strip())
+""")
+    with span("reasoning.interpret_script_details"):
+        return await llm.chat_json(prompt)
+
+async def route_message(message: str, script_summaries: list, history: str = "") -> dict:
+    """
+    Classifies the intent and extracts the handler payload in a single completion.
+    """
+    now_local = datetime.now(LOCAL_TZ)
+    today_str = now_local.strftime("%Y-%m-%d")
+    prompt = Prompt("route_message")
+    prompt.add("""
+You are an AI assistant that routes user messages and extracts everything the matching handler needs.
+
+Possible intents:
+- script: The user wants to run, list, or manage scripts on their server.
+- calendar: The user wants to create, delete, or manage calendar events.
+- server_command: The user wants to execute a Linux shell command and get the results.
+- general_chat: General questions, conversation, or anything else.
+
+Here are available scripts:
+""")
+    prompt.add_items("scripts", script_summaries, priority=20, render=lambda items: json.dumps(items, indent=2))
+    prompt.add(f"""
+
+TODAY'S DATE (local timezone) is {today_str}, use only this as a reference to calculate dates. If a date is ambiguous (e.g., "next Friday"), use the next occurrence of that day in the future.
+
+Fill in ONLY the payload matching the intent and set the others to null:
+- calendar: "action" is "list_events" (ALWAYS include "date" in YYYY-MM-DD when the user names a day), "create_event" (fill in as many details as possible), "delete_event" (fill "title" and "date" exactly matching the event to delete), "bulk_delete" (every event matching "title" from "start_date" to "end_date" inclusive) or "bulk_create" (the same event on every day listed in "dates").
+- script: the best matching script, how it should be executed (python or bash), and any arguments to pass.
+- server_command: a safe shell command for the request, or a blank command if you are unsure.
+""")
+    prompt.add_history(history)
+    prompt.add(f"""
+User message:
+\"\"\"
+{message}
+\"\"\"
+
+Respond ONLY in this JSON format:
+
+{{
+  "intent": "<one of: script, calendar, server_command, general_chat>",
+  "calendar": {{
+    "action": "<create_event | delete_event | list_events | bulk_delete | bulk_create>",
+    "title": "<event title if applicable>",
+    "date": "<YYYY-MM-DD if applicable>",
+    "time": "<HH:MM if applicable>",
+    "duration_minutes": "<integer if applicable>",
+    "event_id": "",
+    "start_date": "<YYYY-MM-DD for bulk_delete>",
+    "end_date": "<YYYY-MM-DD for bulk_delete>",
+    "dates": ["<YYYY-MM-DD for each bulk_create event>"],
+    "notes": "<explanation or clarification if needed>"
+  }},
+  "script": {{
+    "script_name": "<script filename>",
+    "execution_method": "<python | bash>",
+    "arguments": ["arg1", "arg2"],
+    "notes": "<short explanation>"
+  }},
+  "server_command": {{
+    "command": "<the shell command>",
+    "notes": "<short explanation of what this does>"
+  }},
+  "notes": "<short explanation>"
+}}
+""")
+    with span("reasoning.route_message"):
+        return await llm.chat_json(prompt)
@@ -19,10 +19,12 @@
 #     return build('calendar', 'v3', credentials=creds)
 
 # services/calendar.py
+import logging
 import os
 import pickle
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
+import threading
+import time
+from datetime import datetime
 from dotenv import load_dotenv
 from pathlib import Path
 
@@ -33,22 +35,118 @@ SCOPES = ['https://www.googleapis.com/auth/calendar']
 
 TOKEN_PATH = Path(__file__).resolve().parent.parent / 'token.pickle'
 
-print("✅ Calendar service will look for token here:", TOKEN_PATH)
+# Refresh the access token this many seconds before it expires
+REFRESH_MARGIN_SECONDS = int(os.getenv("CALENDAR_TOKEN_REFRESH_MARGIN_SECONDS", "300"))
 
-def get_calendar_service():
+logger = logging.getLogger(__name__)
+
+# httplib2 isn't thread-safe, so every thread (to_thread workers, the sync thread) gets its own client
+_local = threading.local()
+_override = None
+_creds = None
+_lock = threading.Lock()
+# Held while the token is refreshed, so two refreshes never race each other
+_refresh_lock = threading.Lock()
+_refresher = None
+
+
+def _save_credentials(creds):
+    tmp_path = TOKEN_PATH.with_suffix('.pickle.tmp')
+    with open(tmp_path, 'wb') as token:
+        pickle.dump(creds, token)
+    os.replace(tmp_path, TOKEN_PATH)
+
+
+def _refresh(creds):
+    from google.auth.transport.requests import Request
+
+    with _refresh_lock:
+        creds.refresh(Request())
+        _save_credentials(creds)
+
+
+def _load_credentials():
     creds = None
     if TOKEN_PATH.exists():
-        print("✅ Found token.pickle at", TOKEN_PATH)
         with open(TOKEN_PATH, 'rb') as token:
             creds = pickle.load(token)
     else:
-        print("❌ token.pickle not found at", TOKEN_PATH)
+        logger.error("token.pickle not found at %s", TOKEN_PATH)
     if not creds or not creds.valid:
         if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
+            _refresh(creds)
         else:
             raise Exception("No valid credentials. You must authenticate and generate token.pickle.")
-    return build('calendar', 'v3', credentials=creds)
+    return creds
+
+
+def _refresh_loop(creds):
+    """
+    Keeps the access token fresh so no request has to wait on a refresh.
+    """
+    while True:
+        if creds.expiry:
+            wait = (creds.expiry - datetime.utcnow()).total_seconds() - REFRESH_MARGIN_SECONDS
+        else:
+            wait = 3000
+        time.sleep(max(wait, 30))
+        try:
+            _refresh(creds)
+        except Exception:
+            logger.warning("Calendar token refresh failed, retrying soon", exc_info=True)
+            time.sleep(60)
+
+
+def _credentials():
+    """
+    The credentials every thread's client shares, loaded once; also starts the refresher.
+    """
+    global _creds, _refresher
+    if _creds is not None:
+        return _creds
+    with _lock:
+        if _creds is None:
+            creds = _load_credentials()
+            if creds.refresh_token:
+                _refresher = threading.Thread(target=_refresh_loop, args=(creds,), daemon=True)
+                _refresher.start()
+            _creds = creds
+    return _creds
+
+
+def get_calendar_service():
+    """
+    Returns this thread's Calendar client, building it on first use.
+
+    Uses the discovery document bundled with google-api-python-client instead of
+    fetching it. All clients share one set of credentials, refreshed in the background
+    before they expire.
+    """
+    if _override is not None:
+        return _override
+    service = getattr(_local, "service", None)
+    if service is None:
+        from googleapiclient.discovery import build
+
+        service = build('calendar', 'v3', credentials=_credentials(), static_discovery=True, cache_discovery=False)
+        _local.service = service
+    return service
+
+
+def set_calendar_service(service):
+    """
+    Replaces the client in every thread, e.g. with a local stand-in for benchmarks.
+    """
+    global _override
+    _override = service
 
-service = get_calendar_service()
 
+def warm_up():
+    """
+    Loads the credentials and builds a client ahead of the first calendar message;
+    failures are only logged.
+    """
+    try:
+        get_calendar_service()
+    except Exception:
+        logger.warning("Calendar client not ready", exc_info=True)
@@ -0,0 +1,45 @@
+# services/calendar_batch.py
+from services.calendar import get_calendar_service
+
+# Google recommends at most 50 calls per batch request
+BATCH_LIMIT = 50
+
+
+def execute_batch(build_requests, count):
+    """
+    Runs `count` Calendar calls through the batch endpoint, BATCH_LIMIT per round trip.
+
+    build_requests(service, index) returns the unexecuted request for item `index`.
+    Returns one (response, error) pair per item, in order.
+    """
+    service = get_calendar_service()
+    results = [(None, None)] * count
+
+    def callback(request_id, response, exception):
+        results[int(request_id)] = (response, exception)
+
+    for chunk_start in range(0, count, BATCH_LIMIT):
+        batch = service.new_batch_http_request(callback=callback)
+        for index in range(chunk_start, min(chunk_start + BATCH_LIMIT, count)):
+            batch.add(build_requests(service, index), request_id=str(index))
+        try:
+            batch.execute()
+        except Exception as e:
+            # The whole round trip failed; mark every item in this chunk
+            for index in range(chunk_start, min(chunk_start + BATCH_LIMIT, count)):
+                results[index] = (None, e)
+    return results
+
+
+def batch_delete(event_ids, calendar_id='primary'):
+    return execute_batch(
+        lambda service, i: service.events().delete(calendarId=calendar_id, eventId=event_ids[i]),
+        len(event_ids)
+    )
+
+
+def batch_insert(bodies, calendar_id='primary'):
+    return execute_batch(
+        lambda service, i: service.events().insert(calendarId=calendar_id, body=bodies[i]),
+        len(bodies)
+    )
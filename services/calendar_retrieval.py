@@ -0,0 +1,129 @@
+# services/calendar_retrieval.py
+import json
+import os
+from datetime import datetime, timedelta
+import pytz
+from dateparser.search import search_dates
+from services import metrics, temporal
+from services.prompts import count_tokens
+
+LOCAL_TZ = pytz.timezone(os.getenv("TIMEZONE", "UTC"))
+
+# Rough cap on the event section of the calendar prompt
+TOKEN_BUDGET = int(os.getenv("CALENDAR_PROMPT_TOKEN_BUDGET", "1500"))
+
+# Window used when the message names no date
+DEFAULT_WINDOW_DAYS = 14
+
+# What the old prompt sent: the first 500 raw events
+LEGACY_EVENT_LIMIT = 500
+
+# Words that say what to do rather than which event
+STOPWORDS = frozenset("""
+a an the my me i on at in for of to and or with is are was do have what whats delete remove cancel
+create add schedule book event events meeting calendar today tomorrow next this week please called
+""".split())
+
+PROMPT_METRICS = {"calls": 0, "tokens_before": 0, "tokens_after": 0, "last": None}
+
+# Size of the legacy prompt, worked out once per sync: ((last_sync, stored events), tokens)
+_legacy_estimate = (None, 0)
+metrics.register("calendar_prompt", lambda: {k: v for k, v in PROMPT_METRICS.items() if k != "last"})
+
+
+def compact(event) -> dict:
+    """
+    The fields the model needs to pick or describe an event.
+    """
+    start = event["start"].get("dateTime", event["start"].get("date"))
+    end = (event.get("end") or {}).get("dateTime", (event.get("end") or {}).get("date"))
+    return {"id": event["id"], "summary": event.get("summary", ""), "start": start, "end": end}
+
+
+def date_window(message: str):
+    """
+    Local-day range covering every date mentioned in the message, or None.
+    """
+    # Common phrasings ("tomorrow", "next week", "July 5th") resolve locally
+    resolved = temporal.resolve(message)
+    if resolved:
+        return temporal.local_bounds(*resolved)
+
+    now_local = datetime.now(LOCAL_TZ)
+    found = search_dates(
+        message,
+        settings={
+            "TIMEZONE": str(LOCAL_TZ),
+            "RETURN_AS_TIMEZONE_AWARE": True,
+            "PREFER_DATES_FROM": "future",
+            "RELATIVE_BASE": now_local.replace(tzinfo=None),
+        }
+    )
+    if not found:
+        return None
+    days = sorted(dt.astimezone(LOCAL_TZ).date() for _, dt in found)
+    start = LOCAL_TZ.localize(datetime.combine(days[0], datetime.min.time()))
+    end = LOCAL_TZ.localize(datetime.combine(days[-1] + timedelta(days=1), datetime.min.time()))
+    return start, end
+
+
+def select_candidates(message: str, store, budget: int = TOKEN_BUDGET) -> list:
+    """
+    Narrows the calendar to the events likely relevant to the message.
+
+    Title matches inside the mentioned date window come first, then title matches
+    elsewhere, then the rest of the window in time order. Events are added as
+    compact projections until the token budget runs out.
+    """
+    window = date_window(message)
+    if window:
+        in_window = store.between(*window)
+    else:
+        now = datetime.now(LOCAL_TZ)
+        in_window = store.between(now, now + timedelta(days=DEFAULT_WINDOW_DAYS))
+    window_ids = {e["id"] for e in in_window}
+
+    title_hits = store.rank_by_title(message, stopwords=STOPWORDS)
+    ordered = (
+        [e for e in title_hits if e["id"] in window_ids]
+        + [e for e in title_hits if e["id"] not in window_ids]
+        + in_window
+    )
+
+    candidates = []
+    seen = set()
+    used = 2
+    for event in ordered:
+        if event["id"] in seen:
+            continue
+        item = compact(event)
+        cost = count_tokens(json.dumps(item))
+        if used + cost > budget:
+            break
+        candidates.append(item)
+        seen.add(event["id"])
+        used += cost
+
+    record_prompt_size(legacy_tokens(store), candidates)
+    return candidates
+
+
+def legacy_tokens(store) -> int:
+    """
+    What the old prompt's event section would have cost. Listing and serializing hundreds
+    of events is slow, so it's only redone after the store syncs or gains or loses an event.
+    """
+    global _legacy_estimate
+    key = (store.last_sync, len(store.events))
+    if _legacy_estimate[0] != key:
+        upcoming = store.upcoming()[:LEGACY_EVENT_LIMIT]
+        _legacy_estimate = (key, count_tokens(json.dumps(upcoming, indent=2)))
+    return _legacy_estimate[1]
+
+
+def record_prompt_size(before: int, candidates: list):
+    after = count_tokens(json.dumps(candidates))
+    PROMPT_METRICS["calls"] += 1
+    PROMPT_METRICS["tokens_before"] += before
+    PROMPT_METRICS["tokens_after"] += after
+    PROMPT_METRICS["last"] = {"events": len(candidates), "tokens_before": before, "tokens_after": after}
@@ -0,0 +1,184 @@
+# services/calendar_sync.py
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from services.calendar import get_calendar_service
+from services.event_index import EventIndex
+from services.metrics import span
+
+STORE_FILE = os.getenv("CALENDAR_STORE_PATH", 'data/current_calendar_cache.json')
+
+# Handlers see events up to this far ahead
+WINDOW_DAYS = 365
+
+# Skip the API entirely if the store was synced this recently
+MIN_SYNC_INTERVAL = float(os.getenv("CALENDAR_SYNC_INTERVAL_SECONDS", "30"))
+
+
+def event_end(event) -> datetime:
+    end = event.get("end") or event["start"]
+    if end.get("dateTime"):
+        return datetime.fromisoformat(end["dateTime"].replace("Z", "+00:00"))
+    return datetime.fromisoformat(end["date"]).replace(tzinfo=timezone.utc)
+
+
+class EventStore:
+    """
+    Local copy of a calendar kept current with Google's incremental sync tokens.
+    """
+
+    def __init__(self, path=STORE_FILE, calendar_id='primary'):
+        self.path = path
+        self.calendar_id = calendar_id
+        self.index = EventIndex()
+        self.sync_token = None
+        self.last_sync = 0.0
+        # _lock guards the in-memory data; _sync_lock serializes API round trips so
+        # readers never wait on the network
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._load()
+
+    @property
+    def events(self) -> dict:
+        return self.index.events
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path) as f:
+            data = json.load(f)
+        # Older caches are a bare event list without a sync token
+        if isinstance(data, list):
+            data = {"events": data}
+        self.index = EventIndex(data.get("events", []))
+        self.sync_token = data.get("sync_token")
+
+    def _save(self):
+        with span("calendar.cache_write"):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({"sync_token": self.sync_token, "events": list(self.events.values())}, f)
+            os.replace(tmp_path, self.path)
+
+    def apply(self, items):
+        """
+        Applies changed events from the API; cancelled ones are removed.
+        """
+        changed = False
+        for item in items:
+            if item.get("status") == "cancelled":
+                changed |= self.index.remove(item["id"]) is not None
+            else:
+                self.index.add(item)
+                changed = True
+        return changed
+
+    def remove(self, event_id):
+        with self._lock:
+            if self.index.remove(event_id) is not None:
+                self._save()
+
+    def add(self, event):
+        with self._lock:
+            self.apply([event])
+            self._save()
+
+    def update(self, added=(), removed_ids=()):
+        """
+        Records the outcome of a batch of creates and deletes with a single save.
+        """
+        items = list(added) + [{"id": event_id, "status": "cancelled"} for event_id in removed_ids]
+        with self._lock:
+            if self.apply(items):
+                self._save()
+
+    def _list_pages(self, **params):
+        items = []
+        page_token = None
+        while True:
+            result = get_calendar_service().events().list(
+                calendarId=self.calendar_id,
+                singleEvents=True,
+                maxResults=2500,
+                pageToken=page_token,
+                **params
+            ).execute()
+            items.extend(result.get('items', []))
+            page_token = result.get('nextPageToken')
+            if not page_token:
+                return items, result.get('nextSyncToken')
+
+    def _full_sync(self):
+        now = datetime.utcnow()
+        # Bounded like the window handlers see; recurring events without an end would
+        # otherwise expand forever with singleEvents=True
+        items, sync_token = self._list_pages(
+            timeMin=now.isoformat() + 'Z',
+            timeMax=(now + timedelta(days=WINDOW_DAYS)).isoformat() + 'Z'
+        )
+        index = EventIndex(item for item in items if item.get("status") != "cancelled")
+        with self._lock:
+            self.index = index
+            self.sync_token = sync_token
+            self._save()
+
+    def _incremental_sync(self):
+        from googleapiclient.errors import HttpError
+
+        try:
+            items, next_token = self._list_pages(syncToken=self.sync_token)
+        except HttpError as e:
+            # 410 Gone: the token expired and only a full resync can recover
+            if e.resp.status == 410:
+                print("⚠️ Calendar sync token expired, running a full resync")
+                return self._full_sync()
+            raise
+        with self._lock:
+            self.sync_token = next_token
+            # An unchanged store keeps its older (still valid) token on disk
+            if self.apply(items):
+                self._save()
+
+    def sync(self, force=False):
+        with self._sync_lock:
+            if not force and time.time() - self.last_sync < MIN_SYNC_INTERVAL:
+                return
+            if self.sync_token:
+                self._incremental_sync()
+            else:
+                self._full_sync()
+            self.last_sync = time.time()
+
+    def upcoming(self) -> list:
+        """
+        Events not yet over that start before the end of the window, in start order.
+        """
+        now = datetime.now(timezone.utc)
+        window_end = now + timedelta(days=WINDOW_DAYS)
+        with self._lock:
+            events = [e for e in self.index.between(now - timedelta(days=WINDOW_DAYS), window_end)
+                      if event_end(e) >= now]
+        return events
+
+    def between(self, start, end) -> list:
+        with self._lock:
+            return self.index.between(start, end)
+
+    def rank_by_title(self, text: str, stopwords=frozenset()) -> list:
+        with self._lock:
+            return self.index.rank_by_title(text, stopwords=stopwords)
+
+    def on_date(self, date_str: str) -> list:
+        with self._lock:
+            return self.index.on_date(date_str)
+
+    def search(self, title: str, date_str: str = None, start=None, end=None) -> list:
+        with self._lock:
+            return self.index.search(title, date_str=date_str, start=start, end=end)
+
+
+store = EventStore()
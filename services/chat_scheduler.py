@@ -0,0 +1,148 @@
+# services/chat_scheduler.py
+import asyncio
+import contextvars
+import logging
+import os
+import time
+from collections import deque
+from services import metrics
+
+# Chats whose updates are being handled at the same time
+MAX_CONCURRENT_CHATS = int(os.getenv("MAX_CONCURRENT_CHATS", "8"))
+
+# Replies that abandon whatever the bot is still working out for this chat
+CANCEL_WORDS = ["no", "cancel", "never mind", "nevermind", "stop"]
+
+# Recent queue-wait samples kept for stats
+WAIT_SAMPLES = 1000
+
+logger = logging.getLogger(__name__)
+
+_current = contextvars.ContextVar("chat_scheduler_entry", default=None)
+
+
+def protect():
+    """
+    Marks the running update as no longer cancellable, e.g. once it starts executing a
+    confirmed action. Call from inside a handler run by the scheduler.
+    """
+    entry = _current.get()
+    if entry is not None:
+        entry.cancellable = False
+
+
+class _Entry:
+    def __init__(self, update, context):
+        self.update = update
+        self.context = context
+        self.enqueued = time.monotonic()
+        self.future = asyncio.get_running_loop().create_future()
+        self.task = None
+        self.cancellable = True
+
+
+class ChatScheduler:
+    """
+    Runs updates one at a time per chat and different chats concurrently up to a limit.
+
+    A cancel word that arrives while the chat's previous message is still being
+    interpreted cancels it (and anything queued behind it) instead of waiting its turn.
+    """
+
+    def __init__(self, handler, max_concurrent=MAX_CONCURRENT_CHATS):
+        self.handler = handler
+        self.max_concurrent = max_concurrent
+        self._queues = {}
+        self._running = {}
+        self._semaphore = None
+        self.wait_samples = deque(maxlen=WAIT_SAMPLES)
+        self.cancelled = 0
+
+    async def submit(self, update, context):
+        """
+        Handler entry point; returns once this update has been handled or cancelled.
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        chat_id = update.effective_chat.id
+        text = (update.message.text or "").strip().lower() if update.message else ""
+
+        if text in CANCEL_WORDS and self._supersede(chat_id):
+            await update.message.reply_text("❌ Okay, I’ve stopped working on that.")
+            return
+
+        entry = _Entry(update, context)
+        self._queues.setdefault(chat_id, deque()).append(entry)
+        if chat_id not in self._running:
+            self._running[chat_id] = None
+            asyncio.create_task(self._drain(chat_id))
+        await entry.future
+
+    def _supersede(self, chat_id) -> bool:
+        """
+        Cancels the chat's in-flight interpretation and drops its queued messages.
+        Returns False if there was nothing cancellable.
+        """
+        running = self._running.get(chat_id)
+        queued = self._queues.get(chat_id) or deque()
+        if not queued and not (running and running.cancellable):
+            return False
+        if running and running.cancellable and running.task:
+            running.task.cancel()
+        while queued:
+            entry = queued.popleft()
+            if not entry.future.done():
+                entry.future.set_result(None)
+        self.cancelled += 1
+        return True
+
+    async def _drain(self, chat_id):
+        queued = self._queues[chat_id]
+        try:
+            while queued:
+                entry = queued.popleft()
+                async with self._semaphore:
+                    waited = time.monotonic() - entry.enqueued
+                    self.wait_samples.append(waited)
+                    metrics.observe("queue.wait", waited)
+                    self._running[chat_id] = entry
+                    token = _current.set(entry)
+                    try:
+                        entry.task = asyncio.create_task(self.handler(entry.update, entry.context))
+                    finally:
+                        _current.reset(token)
+                    try:
+                        await entry.task
+                    except asyncio.CancelledError:
+                        if not entry.task.cancelled():
+                            raise
+                    except Exception:
+                        logger.exception("Error handling update for chat %s", chat_id)
+                    finally:
+                        self._running[chat_id] = None
+                        if not entry.future.done():
+                            entry.future.set_result(None)
+        finally:
+            self._running.pop(chat_id, None)
+            if not queued:
+                self._queues.pop(chat_id, None)
+
+    def stats(self) -> dict:
+        """
+        Queue wait percentiles in milliseconds over recent updates.
+        """
+        samples = sorted(self.wait_samples)
+        if not samples:
+            return {"count": 0, "cancelled": self.cancelled}
+
+        def pct(p):
+            return round(samples[min(len(samples) - 1, int(p * len(samples)))] * 1000, 2)
+
+        return {
+            "count": len(samples),
+            "p50_ms": pct(0.5),
+            "p95_ms": pct(0.95),
+            "max_ms": round(samples[-1] * 1000, 2),
+            "queued": sum(len(q) for q in self._queues.values()),
+            "cancelled": self.cancelled,
+        }
@@ -0,0 +1,230 @@
+# services/command_cache.py
+import os
+import re
+import sqlite3
+import threading
+import time
+from services import metrics
+
+COMMAND_CACHE_PATH = os.getenv("COMMAND_CACHE_PATH", "data/command_cache.sqlite3")
+
+# Least recently used entries beyond this are evicted
+MAX_ENTRIES = int(os.getenv("COMMAND_CACHE_MAX_ENTRIES", "500"))
+
+# Entries unused for this long are dropped
+COMMAND_CACHE_TTL_SECONDS = int(os.getenv("COMMAND_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+
+# Share of words two normalized phrases need in common (Jaccard) for a fuzzy hit
+FUZZY_THRESHOLD = float(os.getenv("COMMAND_CACHE_FUZZY_THRESHOLD", "0.75"))
+
+STOPWORDS = frozenset("""
+a an the my me please can could would you i to for of on in is are what whats how much many
+tell give let us run just quickly now again current currently s
+""".split())
+
+SYNONYMS = {
+    "display": "show", "print": "show", "list": "show", "get": "show", "check": "show", "see": "show",
+    "view": "show", "space": "usage", "utilization": "usage", "utilisation": "usage",
+    "mem": "memory", "ram": "memory", "processes": "process", "procs": "process",
+    "ip": "ip", "address": "ip", "addresses": "ip",
+}
+
+# Numbers, paths, hostnames and similar values become template slots
+SLOT = re.compile(r"^(\d+[kmg]?|[\w.-]*[/.][\w./-]+|\w+[-_]\w[\w-]*)$")
+
+
+def _argument(value: str) -> re.Pattern:
+    # The value as a whole shell word, so "5" doesn't match inside "-h5" or "/var/5x"
+    return re.compile(r"(?<![\w./-])" + re.escape(value) + r"(?![\w./-])")
+
+
+def _stem(word: str) -> str:
+    word = SYNONYMS.get(word, word)
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        word = word[:-1]
+    return SYNONYMS.get(word, word)
+
+
+def normalize(phrase: str, command: str = None):
+    """
+    Canonical template key and slot values for a phrase.
+
+    Values that look like arguments (numbers, paths, hostnames) become <1>, <2>, ...
+    When `command` is given, only values that also appear in it become slots, and the
+    command is returned with the same placeholders.
+    """
+    words = re.findall(r"[\w./-]+", phrase.lower())
+    key, slots = [], []
+    template = command
+    for word in words:
+        word = word.strip(".")
+        if not word:
+            continue
+        if SLOT.match(word) and (command is None or _argument(word).search(template)):
+            slots.append(word)
+            key.append(f"<{len(slots)}>")
+            if template is not None:
+                template = _argument(word).sub(f"<{len(slots)}>", template, count=1)
+            continue
+        if word in STOPWORDS:
+            continue
+        word = _stem(word)
+        # "show"/"list"/"what is" all just ask to see something
+        if word != "show" and (not key or key[-1] != word):
+            key.append(word)
+    return " ".join(key), slots, template
+
+
+def similarity(key: str, other: str) -> float:
+    """
+    How alike two template keys are: 0 unless they start with the same word (the
+    action, since "show" is dropped), otherwise the Jaccard overlap of their words.
+    """
+    words, other_words = key.split(), other.split()
+    if words[0] != other_words[0]:
+        return 0.0
+    words, other_words = set(words), set(other_words)
+    return len(words & other_words) / len(words | other_words)
+
+
+def fill(template: str, slots: list) -> str:
+    for i, value in enumerate(slots, 1):
+        template = template.replace(f"<{i}>", value)
+    return template
+
+
+class CommandCache:
+    """
+    Confirmed (phrase -> command) templates shared by every worker through SQLite.
+
+    Lookups hit an in-memory copy of the table, reloaded when another process writes.
+    """
+
+    def __init__(self, path=COMMAND_CACHE_PATH, max_entries=MAX_ENTRIES, ttl=COMMAND_CACHE_TTL_SECONDS):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._conn = None
+        self._lock = threading.Lock()
+        self._entries = None
+        self._version = None
+        self.counters = {"hits": 0, "fuzzy_hits": 0, "misses": 0, "stored": 0, "invalidated": 0, "evictions": 0}
+
+    def _db(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=5)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS commands ("
+                " key TEXT PRIMARY KEY, phrase TEXT NOT NULL, command TEXT NOT NULL,"
+                " hits INTEGER NOT NULL DEFAULT 0, created REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+        return self._conn
+
+    def _load(self):
+        # data_version changes whenever another connection commits
+        db = self._db()
+        version = db.execute("PRAGMA data_version").fetchone()[0]
+        if self._entries is None or version != self._version:
+            rows = db.execute(
+                "SELECT key, phrase, command FROM commands WHERE last_used > ?", (time.time() - self.ttl,)
+            ).fetchall()
+            self._entries = {key: (phrase, command) for key, phrase, command in rows}
+            self._version = version
+        return self._entries
+
+    def lookup(self, phrase: str, record: bool = True):
+        """
+        The cached command for the phrase as (command, matched phrase, key), or None.
+        record=False only peeks: no counters, no LRU bump.
+        """
+        key, slots, _ = normalize(phrase)
+        if not key:
+            return None
+        with self._lock:
+            entries = self._load()
+            entry = entries.get(key)
+            fuzzy = False
+            if entry is None:
+                # Closest key with the same action and slots; reordered or extra words still
+                # hit, but "start nginx" never gets the command for "restart nginx"
+                score, close = max(
+                    ((similarity(key, k), k) for k in entries if k.count("<") == len(slots)),
+                    default=(0.0, None)
+                )
+                if score >= FUZZY_THRESHOLD:
+                    key, entry, fuzzy = close, entries[close], True
+            if not record:
+                return (fill(entry[1], slots), entry[0], key) if entry else None
+            if entry is None:
+                self.counters["misses"] += 1
+                return None
+            self.counters["fuzzy_hits" if fuzzy else "hits"] += 1
+            self._db().execute(
+                "UPDATE commands SET hits = hits + 1, last_used = ? WHERE key = ?", (time.time(), key)
+            )
+        return fill(entry[1], slots), entry[0], key
+
+    def store(self, phrase: str, command: str):
+        """
+        Remembers a confirmed command for the phrase (and phrases shaped like it).
+        Returns the entry's key, or None if the phrase has no usable words.
+        """
+        key, _, template = normalize(phrase, command)
+        if not key:
+            return None
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            db.execute(
+                "INSERT INTO commands (key, phrase, command, created, last_used) VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT(key) DO UPDATE SET phrase = excluded.phrase, command = excluded.command,"
+                " last_used = excluded.last_used",
+                (key, phrase, template, now, now)
+            )
+            self.counters["stored"] += 1
+            self._evict(now)
+            self._entries = None
+        return key
+
+    def _evict(self, now):
+        db = self._db()
+        removed = db.execute("DELETE FROM commands WHERE last_used <= ?", (now - self.ttl,)).rowcount
+        removed += db.execute(
+            "DELETE FROM commands WHERE key NOT IN (SELECT key FROM commands ORDER BY last_used DESC LIMIT ?)",
+            (self.max_entries,)
+        ).rowcount
+        self.counters["evictions"] += removed
+
+    def invalidate(self, phrase: str = None, key: str = None) -> int:
+        """
+        Drops the entry for a phrase (exact or fuzzy match) or a known key. Returns how many went.
+        """
+        if key is None and phrase is not None:
+            found = self.lookup(phrase)
+            key = found[2] if found else None
+        if key is None:
+            return 0
+        with self._lock:
+            removed = self._db().execute("DELETE FROM commands WHERE key = ?", (key,)).rowcount
+            self.counters["invalidated"] += removed
+            self._entries = None
+        return removed
+
+    def entries(self) -> list:
+        with self._lock:
+            return self._db().execute(
+                "SELECT phrase, command, hits FROM commands ORDER BY last_used DESC"
+            ).fetchall()
+
+    def stats(self) -> dict:
+        lookups = self.counters["hits"] + self.counters["fuzzy_hits"] + self.counters["misses"]
+        hits = lookups - self.counters["misses"]
+        return dict(self.counters, hit_rate=hits / lookups if lookups else 0.0)
+
+
+cache = CommandCache()
+metrics.register("command_cache", cache.stats)
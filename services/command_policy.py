@@ -0,0 +1,762 @@
+# services/command_policy.py
+import fnmatch
+import os
+import posixpath
+import re
+from collections import namedtuple
+
+# Rules are (action, kind, pattern, reason). Kinds:
+#   binary      "rm", "mkfs*"         the program, whatever path, quoting or wrapper it was run through
+#   flag        "chmod -R"            the program with this option ("*" for any program)
+#   subcommand  "systemctl reboot"    the program's first non-option argument
+#   path        "/boot", "/dev/sd*"   a write target: redirections and files given to MUTATING_BINARIES
+#   regex       r":\(\)\s*\{"         anywhere in the raw command
+# "allow" carves exceptions out of binary and path denials; the most specific rule wins.
+DEFAULT_RULES = [
+    ("deny", "binary", "rm", "deletes files"),
+    ("deny", "binary", "shred", "destroys files"),
+    ("deny", "binary", "shutdown", "powers off the server"),
+    ("deny", "binary", "reboot", "reboots the server"),
+    ("deny", "binary", "halt", "powers off the server"),
+    ("deny", "binary", "poweroff", "powers off the server"),
+    ("deny", "binary", "mkfs*", "formats a filesystem"),
+    ("deny", "binary", "mkswap", "formats a device"),
+    ("deny", "binary", "wipefs", "erases filesystem signatures"),
+    ("deny", "binary", "fdisk", "repartitions a disk"),
+    ("deny", "binary", "sfdisk", "repartitions a disk"),
+    ("deny", "binary", "parted", "repartitions a disk"),
+    ("deny", "binary", "dd", "writes raw devices"),
+    ("deny", "binary", "userdel", "deletes users"),
+    ("deny", "binary", "passwd", "changes passwords"),
+    ("deny", "binary", "visudo", "changes sudo rights"),
+    ("deny", "subcommand", "systemctl reboot", "reboots the server"),
+    ("deny", "subcommand", "systemctl poweroff", "powers off the server"),
+    ("deny", "subcommand", "systemctl halt", "powers off the server"),
+    ("deny", "subcommand", "systemctl kexec", "reboots the server"),
+    ("deny", "subcommand", "init 0", "powers off the server"),
+    ("deny", "subcommand", "init 6", "reboots the server"),
+    ("deny", "subcommand", "telinit 0", "powers off the server"),
+    ("deny", "subcommand", "telinit 6", "reboots the server"),
+    ("deny", "flag", "find -delete", "deletes files"),
+    ("deny", "flag", "chmod -R", "recursive permission change"),
+    ("deny", "flag", "chown -R", "recursive ownership change"),
+    ("deny", "flag", "chgrp -R", "recursive ownership change"),
+    ("deny", "flag", "crontab -r", "deletes the crontab"),
+    ("deny", "flag", "git --force", "rewrites remote history"),
+    ("deny", "flag", "git -f", "forces a destructive git operation"),
+    ("deny", "flag", "python -c", "runs inline code the policy can't inspect"),
+    ("deny", "flag", "perl -e", "runs inline code the policy can't inspect"),
+    ("deny", "flag", "perl -E", "runs inline code the policy can't inspect"),
+    ("deny", "flag", "ruby -e", "runs inline code the policy can't inspect"),
+    ("deny", "flag", "node -e", "runs inline code the policy can't inspect"),
+    ("deny", "flag", "node --eval", "runs inline code the policy can't inspect"),
+    ("deny", "flag", "node -p", "runs inline code the policy can't inspect"),
+    ("deny", "flag", "node --print", "runs inline code the policy can't inspect"),
+    ("deny", "flag", "php -r", "runs inline code the policy can't inspect"),
+    ("deny", "flag", "* --no-preserve-root", "operates on /"),
+    ("deny", "flag", "kill -9", "force-kills processes"),
+    ("deny", "flag", "kill -KILL", "force-kills processes"),
+    ("deny", "flag", "killall -9", "force-kills processes"),
+    ("deny", "flag", "pkill -9", "force-kills processes"),
+    ("deny", "path", "/boot", "boot files"),
+    ("deny", "path", "/etc", "system configuration"),
+    ("deny", "path", "/bin", "system binaries"),
+    ("deny", "path", "/sbin", "system binaries"),
+    ("deny", "path", "/usr", "system files"),
+    ("deny", "path", "/lib", "system libraries"),
+    ("deny", "path", "/dev/sd*", "a raw disk"),
+    ("deny", "path", "/dev/nvme*", "a raw disk"),
+    ("deny", "path", "/dev/vd*", "a raw disk"),
+    ("deny", "path", "/dev/mmcblk*", "a raw disk"),
+    ("deny", "path", "/proc/sysrq-trigger", "kernel control"),
+    ("deny", "path", "~/.ssh", "SSH keys"),
+    ("allow", "path", "/dev/null", "discards output"),
+    ("deny", "regex", r":\s*\(\s*\)\s*\{", "fork bomb"),
+    ("deny", "regex", r"/dev/(tcp|udp)/", "opens a network socket from the shell"),
+]
+
+# Extra rules, one per line: "<action> <kind> <pattern>  # reason"
+COMMAND_POLICY_FILE = os.getenv("COMMAND_POLICY_FILE", "")
+
+# Programs whose file arguments are write targets for path rules
+MUTATING_BINARIES = frozenset("mv tee truncate chmod chown chgrp touch mkdir rmdir unlink sed".split())
+
+# Programs that only write their last argument (the destination)
+COPYING_BINARIES = frozenset("cp install rsync ln".split())
+
+# Options whose value is a file or directory the program writes into
+WRITE_FLAGS = {
+    "curl": {"-o", "--output", "--output-dir"},
+    "wget": {"-O", "--output-document", "-P", "--directory-prefix", "-o", "--output-file", "-a", "--append-output"},
+    "tar": {"-C", "--directory"},
+    "unzip": {"-d"},
+}
+
+# Programs that run code read from stdin when given no script
+INTERPRETERS = frozenset("sh bash dash zsh ksh ash fish busybox python perl ruby node php".split())
+
+# python3, python3.11, perl5.36, ... are matched as their base name
+VERSIONED_INTERPRETER = re.compile(r"(python|perl|ruby|node|php)[\d.]*")
+
+SHELLS = frozenset("sh bash dash zsh ksh ash fish".split())
+
+# Programs that run another command: options that take a value, and leading positionals to skip
+WRAPPERS = {
+    "sudo": ({"-u", "-g", "-h", "-p", "-C", "-U", "-r", "-t", "-D", "--user", "--group"}, 0),
+    "doas": ({"-u", "-C"}, 0),
+    "env": ({"-u", "-C", "-S", "--unset", "--chdir"}, 0),
+    "nohup": (set(), 0),
+    "nice": ({"-n", "--adjustment"}, 0),
+    "ionice": ({"-c", "-n", "-p", "--class", "--classdata"}, 0),
+    "timeout": ({"-s", "-k", "--signal", "--kill-after"}, 1),
+    "stdbuf": ({"-i", "-o", "-e"}, 0),
+    "time": ({"-f", "-o", "--format", "--output"}, 0),
+    "command": (set(), 0),
+    "builtin": (set(), 0),
+    "exec": ({"-a"}, 0),
+    "xargs": ({"-a", "-d", "-E", "-I", "-L", "-n", "-P", "-s", "--arg-file", "--delimiter",
+               "--max-args", "--max-procs", "--replace"}, 0),
+    "watch": ({"-n", "-d", "--interval"}, 0),
+    "chroot": (set(), 1),
+    "busybox": (set(), 0),
+    "unbuffer": (set(), 0),
+    "setsid": (set(), 0),
+    "flock": ({"-w", "-E", "--timeout"}, 1),
+}
+
+# Words in command position that aren't programs
+KEYWORDS = frozenset("if then else elif fi do done while until for case esac in function select ! { } [[ ]]".split())
+
+# Longest first
+OPERATORS = ("&&", "||", ";;", "|&", "|", "&", ";", "\n")
+
+REDIRECT = re.compile(r"(\d*|&)(>>|>\||>&|<<<|<<-|<<|<>|<&|>|<)")
+FD_REDIRECT = re.compile(r"\d+[<>]")
+ASSIGNMENT = re.compile(r"[A-Za-z_]\w*\+?=")
+PARAMETER = re.compile(r"\$([A-Za-z_]\w*|[0-9@*#?$!-]|'[^']*'|)")
+# Stands in for a <(...) argument
+PROCESS_SUBSTITUTION = "<(...)"
+
+# The working directory after a cd the policy can't follow
+UNKNOWN_DIR = object()
+
+RULE_LINE = re.compile(r"\s*(allow|deny)\s+(\w+)\s+(.+?)(?:\s+#\s*(.*?))?\s*$")
+
+Verdict = namedtuple("Verdict", "allowed rule reason")
+ALLOWED = Verdict(True, None, None)
+
+Rule = namedtuple("Rule", "action kind pattern reason")
+
+# A program as it will actually run; `dynamic` when it's only known at run time
+Command = namedtuple("Command", "program args dynamic stdin writes")
+
+
+class PolicyError(ValueError):
+    """
+    The command can't be parsed reliably (unbalanced quotes, unterminated substitution, ...).
+    """
+
+
+class Segment:
+    """
+    One simple command after quote removal: its words, which of them hold expansions,
+    the files it redirects output to, and whether stdin is fed to it.
+    """
+
+    def __init__(self):
+        self.words = []
+        self.dynamic = []
+        self.writes = []
+        self.stdin = False
+
+    def __repr__(self):
+        return f"Segment({self.words!r}, writes={self.writes!r}, stdin={self.stdin})"
+
+
+class _Parser:
+    """
+    A single left-to-right scan of a shell command into simple commands. Substitutions
+    ($(...), backticks, <(...)) and subshells become segments of their own.
+    """
+
+    def __init__(self, text, i=0, until=None, depth=0):
+        if depth > 20:
+            raise PolicyError("nested too deeply")
+        self.text = text
+        self.i = i
+        self.until = until
+        self.depth = depth
+        self.segments = []
+        self.heredocs = []
+
+    def parse(self) -> list:
+        text = self.text
+        segment = Segment()
+        while True:
+            self._skip_blanks()
+            if self.i >= len(text):
+                if self.until is not None:
+                    raise PolicyError(f"missing {self.until!r}")
+                break
+            c = text[self.i]
+            if self.until is not None and text.startswith(self.until, self.i):
+                self.i += len(self.until)
+                break
+            if c == ")":
+                raise PolicyError("unexpected ')'")
+            if c == "#" and (self.i == 0 or text[self.i - 1] in " \t\n;&|("):
+                while self.i < len(text) and text[self.i] != "\n":
+                    self.i += 1
+                continue
+            if c in "<>" or text.startswith("&>", self.i) or (c.isdigit() and FD_REDIRECT.match(text, self.i)):
+                self._redirect(segment)
+                continue
+            operator = next((op for op in OPERATORS if text.startswith(op, self.i)), None)
+            if operator:
+                self.i += len(operator)
+                self._close(segment)
+                segment = Segment()
+                segment.stdin = operator in ("|", "|&")
+                if operator == "\n":
+                    self._skip_heredocs()
+                continue
+            if c == "(" and not segment.words:
+                self.i += 1
+                if text.startswith("(", self.i):
+                    # (( arithmetic ))
+                    self._skip_until("))")
+                else:
+                    self._nested(")")
+                continue
+            word, dynamic = self._word()
+            if word in ("[", "[["):
+                # test, not a glob
+                dynamic = False
+            if not segment.words and not dynamic and (word in KEYWORDS or ASSIGNMENT.match(word)):
+                # `if`, `do`, `FOO=bar cmd`, ...
+                continue
+            segment.words.append(word)
+            segment.dynamic.append(dynamic)
+        self._close(segment)
+        return self.segments
+
+    def _close(self, segment):
+        if segment.words or segment.writes:
+            self.segments.append(segment)
+
+    def _skip_blanks(self):
+        text = self.text
+        while self.i < len(text):
+            if text[self.i] in " \t\r":
+                self.i += 1
+            elif text.startswith("\\\n", self.i):
+                self.i += 2
+            else:
+                break
+
+    def _skip_until(self, end):
+        found = self.text.find(end, self.i)
+        if found < 0:
+            raise PolicyError(f"missing {end!r}")
+        self.i = found + len(end)
+
+    def _skip_heredocs(self):
+        for delimiter in self.heredocs:
+            match = re.compile(r"^[ \t]*" + re.escape(delimiter) + r"[ \t]*$", re.M).search(self.text, self.i)
+            # An unterminated here-document runs to the end, like in bash
+            self.i = match.end() if match else len(self.text)
+        self.heredocs = []
+
+    def _nested(self, until):
+        parser = _Parser(self.text, self.i, until, self.depth + 1)
+        self.segments.extend(parser.parse())
+        self.i = parser.i
+
+    def _redirect(self, segment):
+        match = REDIRECT.match(self.text, self.i)
+        operator = match.group(2)
+        self.i = match.end()
+        if operator in (">", "<") and self.text.startswith("(", self.i):
+            # Process substitution >(...) / <(...)
+            self.i += 1
+            self._nested(")")
+            segment.words.append(PROCESS_SUBSTITUTION)
+            segment.dynamic.append(True)
+            return
+        self._skip_blanks()
+        target, _ = self._word()
+        if operator in ("<<", "<<-"):
+            self.heredocs.append(target)
+        if operator in ("<", "<<", "<<-", "<<<", "<>"):
+            segment.stdin = True
+        if operator in (">", ">>", ">|", "<>") or (operator == ">&" and not target.isdigit() and target != "-"):
+            segment.writes.append(target)
+
+    def _word(self):
+        """
+        The next word with quotes and escapes removed, and whether any of it is only
+        known at run time ($VAR, $(...), globs). Expansions are kept as written.
+        """
+        text = self.text
+        chars, dynamic = [], False
+        while self.i < len(text):
+            c = text[self.i]
+            if c in " \t\r\n;&|<>)" or (self.until is not None and text.startswith(self.until, self.i)):
+                break
+            if c == "\\":
+                if text.startswith("\\\n", self.i):
+                    self.i += 2
+                    continue
+                chars.append(text[self.i + 1:self.i + 2])
+                self.i += 2
+            elif c == "'":
+                end = text.find("'", self.i + 1)
+                if end < 0:
+                    raise PolicyError("unbalanced single quote")
+                chars.append(text[self.i + 1:end])
+                self.i = end + 1
+            elif c == '"':
+                self.i += 1
+                while True:
+                    if self.i >= len(text):
+                        raise PolicyError("unbalanced double quote")
+                    c = text[self.i]
+                    if c == '"':
+                        self.i += 1
+                        break
+                    if c == "\\" and text[self.i + 1:self.i + 2] in ('"', "\\", "$", "`", "\n"):
+                        chars.append(text[self.i + 1])
+                        self.i += 2
+                    elif c in "$`":
+                        chars.append(self._expansion())
+                        dynamic = True
+                    else:
+                        chars.append(c)
+                        self.i += 1
+            elif c in "$`":
+                chars.append(self._expansion())
+                dynamic = True
+            elif c == "(":
+                # An array assignment or function definition; scan the inside as a subshell
+                self.i += 1
+                self._nested(")")
+                dynamic = True
+            else:
+                if c in "*?[":
+                    dynamic = True
+                chars.append(c)
+                self.i += 1
+        return "".join(chars), dynamic
+
+    def _expansion(self) -> str:
+        text, start = self.text, self.i
+        if text[self.i] == "`":
+            self.i += 1
+            self._nested("`")
+        elif text.startswith("$((", self.i):
+            self.i += 3
+            self._skip_until("))")
+        elif text.startswith("$(", self.i):
+            self.i += 2
+            self._nested(")")
+        elif text.startswith("${", self.i):
+            self.i += 2
+            self._skip_until("}")
+        else:
+            self.i = PARAMETER.match(text, self.i).end()
+        return text[start:self.i]
+
+
+def parse(command: str) -> list:
+    """
+    The simple commands in a shell command line, nested ones included.
+    """
+    return _Parser(command).parse()
+
+
+def _flags(args) -> set:
+    """
+    Options as given plus combined short options split up: "-rf" gives {"-rf", "-r", "-f"}.
+    """
+    flags = set()
+    for arg in args:
+        if arg == "--":
+            break
+        if arg.startswith("--"):
+            flags.add(arg.split("=", 1)[0])
+        elif arg.startswith("-") and len(arg) > 1:
+            flags.add(arg)
+            if not arg[1:].isdigit():
+                flags.update("-" + c for c in arg[1:])
+    return flags
+
+
+def _positionals(args) -> list:
+    return [a for a in args if not a.startswith("-") or a == "-"]
+
+
+def _unwrap(segment) -> list:
+    """
+    What a segment really runs, looking through sudo/env/xargs/..., `sh -c`, `eval`
+    and `find -exec`: a Command per program, outermost first.
+    """
+    words, dynamic = segment.words, segment.dynamic
+    writes = segment.writes
+    found = []
+    while words:
+        program = posixpath.basename(words[0]) or words[0]
+        versioned = VERSIONED_INTERPRETER.fullmatch(program)
+        if versioned:
+            program = versioned.group(1)
+        args = words[1:]
+        if program in WRAPPERS and not dynamic[0]:
+            takes_value, positional = WRAPPERS[program]
+            i = 1
+            while i < len(words):
+                word = words[i]
+                if word == "--":
+                    i += 1
+                    break
+                if word.startswith("-") and len(word) > 1:
+                    i += 2 if word in takes_value else 1
+                elif program == "env" and "=" in word:
+                    i += 1
+                elif positional:
+                    positional -= 1
+                    i += 1
+                else:
+                    break
+            found.append(Command(program, args, False, segment.stdin, writes))
+            words, dynamic, writes = words[i:], dynamic[i:], []
+            continue
+
+        found.append(Command(program, args, dynamic[0], segment.stdin, writes))
+        if program in SHELLS and "-c" in _flags(args):
+            script = next((i for i, a in enumerate(args) if not a.startswith("-")), None)
+            if script is not None:
+                if dynamic[script + 1]:
+                    found.append(Command(program, args, True, False, []))
+                for inner in parse(args[script]):
+                    found.extend(_unwrap(inner))
+        elif program == "eval":
+            if any(dynamic[1:]):
+                found.append(Command(program, args, True, False, []))
+            for inner in parse(" ".join(args)):
+                found.extend(_unwrap(inner))
+        elif program == "find":
+            for i, arg in enumerate(args):
+                if arg in ("-exec", "-execdir", "-ok", "-okdir"):
+                    end = next((j for j in range(i + 1, len(args)) if args[j] in (";", "+")), len(args))
+                    inner = Segment()
+                    inner.words = args[i + 1:end]
+                    inner.dynamic = dynamic[i + 2:end + 1]
+                    found.extend(_unwrap(inner))
+        break
+    if not found and writes:
+        # A bare redirection ("> file") creates or truncates the file without a program
+        found.append(Command("", [], False, segment.stdin, writes))
+    return found
+
+
+def _flag_values(args, names) -> list:
+    """
+    The values given to any of the options `names`: "-o x", "-ox", "-sSo x", "--output=x".
+    """
+    values = []
+    for i, arg in enumerate(args):
+        if arg == "--":
+            break
+        if arg.startswith("--"):
+            name, eq, value = arg.partition("=")
+            if name in names:
+                values.append(value if eq else (args[i + 1] if i + 1 < len(args) else ""))
+        elif arg.startswith("-") and len(arg) > 1:
+            # Short options cluster; the first one that takes a value swallows the rest
+            for j, c in enumerate(arg[1:], 1):
+                if "-" + c in names:
+                    values.append(arg[j + 1:] or (args[i + 1] if i + 1 < len(args) else ""))
+                    break
+    # "-" is stdout
+    return [v for v in values if v and v != "-"]
+
+
+def _normalize_path(path: str) -> str:
+    for prefix in ("${HOME}", "$HOME", os.path.expanduser("~")):
+        if path == prefix or path.startswith(prefix + "/"):
+            path = "~" + path[len(prefix):]
+            break
+    if path.startswith(("/", "~")):
+        path = posixpath.normpath(path)
+        # normpath keeps a leading "//" (POSIX leaves its meaning open); Linux treats it as "/"
+        if path.startswith("//"):
+            path = "/" + path.lstrip("/")
+    return path
+
+
+class CommandPolicy:
+    """
+    Allow/deny rules compiled once into lookup tables, so checking a command is one parse
+    plus lookups proportional to the command's length, not to the number of rules.
+    """
+
+    def __init__(self, rules):
+        self.rules = [Rule(*rule) for rule in rules]
+        self.binaries = {}
+        self.flags = {}
+        self.subcommands = {}
+        binary_globs, path_rules, patterns = [], [], []
+        for rule in self.rules:
+            if rule.action not in ("allow", "deny"):
+                raise ValueError(f"Unknown action in {rule}")
+            if rule.action == "allow" and rule.kind not in ("binary", "path"):
+                raise ValueError(f"Only binary and path rules can allow: {rule}")
+            if rule.kind == "binary":
+                if any(c in rule.pattern for c in "*?["):
+                    binary_globs.append(rule)
+                else:
+                    self.binaries[rule.pattern] = rule
+            elif rule.kind in ("flag", "subcommand"):
+                program, value = rule.pattern.split(None, 1)
+                table = self.flags if rule.kind == "flag" else self.subcommands
+                table.setdefault(program, {})[value] = rule
+            elif rule.kind == "path":
+                path_rules.append(rule)
+            elif rule.kind == "regex":
+                patterns.append(rule)
+            else:
+                raise ValueError(f"Unknown rule kind in {rule}")
+
+        # Globs by their literal start; a program name is looked up by each of its prefixes
+        self._globs = {}
+        self._unprefixed_globs = []
+        for rule in binary_globs:
+            prefix = re.match(r"[^*?\[]*", rule.pattern).group(0)
+            if prefix:
+                self._globs.setdefault(prefix, []).append(rule)
+            else:
+                self._unprefixed_globs.append(rule)
+
+        # "/etc" covers /etc and everything under it; "/dev/sd*" anything starting with /dev/sd
+        self._dirs = {}
+        self._path_prefixes = {}
+        for rule in path_rules:
+            if rule.pattern.endswith("*"):
+                self._path_prefixes[rule.pattern[:-1]] = rule
+            else:
+                self._dirs[_normalize_path(rule.pattern).rstrip("/") or "/"] = rule
+        self._longest_path = max(map(len, list(self._dirs) + list(self._path_prefixes)), default=0)
+
+        # Regexes are indexed by a trigram of a literal every match must contain, so only
+        # the few whose trigram occurs in the command are run; the rest share one regex
+        self._patterns = patterns
+        self._compiled = [re.compile(r.pattern) for r in patterns]
+        self._trigrams = {}
+        unindexed = []
+        for i, (rule, compiled) in enumerate(zip(patterns, self._compiled)):
+            literal = _required_literal(rule.pattern, compiled)
+            if len(literal) >= 3:
+                self._trigrams.setdefault(literal[:3], []).append(i)
+            else:
+                unindexed.append(i)
+        self._unindexed = unindexed
+        self._regex = _combine([patterns[i].pattern for i in unindexed])
+
+    def _binary_rule(self, program):
+        rule = self.binaries.get(program)
+        if rule is not None:
+            return rule
+        if self._globs:
+            # Longest prefix first, so the most specific glob wins
+            for end in range(len(program), 0, -1):
+                for rule in self._globs.get(program[:end], ()):
+                    if fnmatch.fnmatchcase(program, rule.pattern):
+                        return rule
+        return next((r for r in self._unprefixed_globs if fnmatch.fnmatchcase(program, r.pattern)), None)
+
+    def _path_rule(self, path):
+        path = _normalize_path(path)
+        # Longest prefix first, so the most specific rule wins
+        for end in range(min(len(path), self._longest_path), 0, -1):
+            prefix = path[:end]
+            rule = self._path_prefixes.get(prefix)
+            if rule is None and (end == len(path) or path[end] == "/"):
+                rule = self._dirs.get(prefix)
+            if rule is not None:
+                return rule
+        return self._dirs.get("/") if path.startswith("/") else None
+
+    def _pattern_rule(self, command):
+        candidates = set()
+        if self._trigrams:
+            trigrams = self._trigrams
+            for i in range(len(command) - 2):
+                hits = trigrams.get(command[i:i + 3])
+                if hits:
+                    candidates.update(hits)
+        for i in sorted(candidates):
+            match = self._compiled[i].search(command)
+            if match:
+                return self._patterns[i], match
+        if self._regex is not None:
+            match = self._regex.search(command)
+            if match:
+                return self._patterns[self._unindexed[int(match.lastgroup[1:])]], match
+        return None, None
+
+    def check(self, command: str) -> Verdict:
+        """
+        Whether the command may run, and if not, the rule that blocks it and why.
+        """
+        rule, match = self._pattern_rule(command)
+        if rule:
+            return _deny(rule, f"it contains {match.group(0)!r}")
+        try:
+            commands = [c for segment in parse(command) for c in _unwrap(segment)]
+        except PolicyError as e:
+            return Verdict(False, None, f"it could not be parsed safely ({e})")
+
+        # Where relative write targets land: None is the bot's own directory, UNKNOWN_DIR
+        # a `cd` that can't be resolved statically
+        cwd = None
+        for program, args, dynamic, stdin, writes in commands:
+            if program in ("cd", "pushd", "popd"):
+                cwd = _change_dir(cwd, program, _positionals(args))
+                continue
+            if dynamic:
+                return Verdict(False, None, "what it runs is only known at run time")
+            rule = self._binary_rule(program)
+            if rule and rule.action == "deny":
+                return _deny(rule, f"it runs {program}")
+
+            if program in INTERPRETERS and "-c" not in args:
+                script = next((a for a in _positionals(args) if a != "-"), None)
+                if (stdin and script is None) or script == PROCESS_SUBSTITUTION:
+                    return Verdict(False, None, f"it feeds input to {program}, which would run whatever it reads")
+
+            flags = _flags(args)
+            for table in (self.flags.get(program), self.flags.get("*")):
+                if table:
+                    hit = next((table[f] for f in flags if f in table), None)
+                    if hit:
+                        return _deny(hit, f"it runs {hit.pattern}")
+            table = self.subcommands.get(program)
+            if table:
+                positionals = _positionals(args)
+                if positionals and positionals[0] in table:
+                    return _deny(table[positionals[0]], f"it runs {program} {positionals[0]}")
+
+            targets = list(writes)
+            if program in MUTATING_BINARIES and (program != "sed" or "-i" in flags or "--in-place" in flags):
+                targets += _positionals(args)
+            elif program in COPYING_BINARIES:
+                targets += _positionals(args)[-1:]
+            if program in WRITE_FLAGS:
+                targets += _flag_values(args, WRITE_FLAGS[program])
+            for target in targets:
+                resolved = _resolve(cwd, target)
+                if resolved is UNKNOWN_DIR:
+                    return Verdict(False, None, f"it writes to {target} after a cd that can't be resolved")
+                rule = self._path_rule(resolved)
+                if rule and rule.action == "deny":
+                    return _deny(rule, f"it writes to {resolved}")
+        return ALLOWED
+
+
+def _change_dir(cwd, program, positionals):
+    """
+    The directory after cd/pushd/popd, or UNKNOWN_DIR when it depends on run-time state.
+    """
+    if program == "popd":
+        return UNKNOWN_DIR
+    target = positionals[0] if positionals else "~"
+    if target == "-" or "$" in target or "`" in target:
+        return UNKNOWN_DIR
+    target = _normalize_path(target)
+    if target.startswith(("/", "~")):
+        return target
+    if cwd is None or cwd is UNKNOWN_DIR:
+        return UNKNOWN_DIR
+    return posixpath.normpath(posixpath.join(cwd, target))
+
+
+def _resolve(cwd, target):
+    if cwd is None or _normalize_path(target).startswith(("/", "~")):
+        return target
+    if cwd is UNKNOWN_DIR:
+        return UNKNOWN_DIR
+    return posixpath.join(cwd, target)
+
+
+def _combine(alternatives):
+    """
+    One regex for many: each alternative is a named group r<index>, so match.lastgroup
+    says which rule matched.
+    """
+    if not alternatives:
+        return None
+    return re.compile("|".join(f"(?P<r{i}>{alt})" for i, alt in enumerate(alternatives)))
+
+
+def _required_literal(pattern, compiled) -> str:
+    """
+    The longest run of plain characters at the top level of a regex, which every match
+    contains. Empty for case-insensitive patterns and top-level alternations.
+    """
+    if compiled.flags & re.IGNORECASE:
+        return ""
+    runs, run, depth, i = [], "", 0, 0
+    while i < len(pattern):
+        c, literal = pattern[i], None
+        if c == "\\":
+            escaped = pattern[i + 1:i + 2]
+            # \b, \s, \d, \1, ... are classes or assertions, not characters
+            if escaped and not escaped.isalnum():
+                literal = escaped
+            i += 2
+        elif c == "[":
+            i += 1
+            i += pattern[i:i + 1] == "^"
+            i += pattern[i:i + 1] == "]"
+            while i < len(pattern) and pattern[i] != "]":
+                i += 2 if pattern[i] == "\\" else 1
+            i += 1
+        elif c == "{":
+            i = pattern.find("}", i) + 1 or len(pattern)
+        elif c == "|" and depth == 0:
+            return ""
+        else:
+            depth += (c == "(") - (c == ")")
+            if c not in "()|.^$*+?":
+                literal = c
+            i += 1
+        if literal is None or depth > 0:
+            runs.append(run)
+            run = ""
+        elif pattern[i:i + 1] in ("*", "?", "{"):
+            # Optional (or counted) character; the run can't go through it
+            runs.append(run)
+            run = ""
+        else:
+            run += literal
+    runs.append(run)
+    return max(runs, key=len)
+
+
+def _deny(rule, detail) -> Verdict:
+    return Verdict(False, rule, f"{detail}: {rule.reason}" if rule.reason else detail)
+
+
+def load_rules(path: str) -> list:
+    rules = []
+    with open(path) as f:
+        for line in f:
+            if not line.strip() or line.lstrip().startswith("#"):
+                continue
+            match = RULE_LINE.match(line)
+            if not match:
+                raise ValueError(f"Bad rule in {path}: {line.strip()}")
+            rules.append(match.groups(""))
+    return rules
+
+
+policy = CommandPolicy(DEFAULT_RULES + (load_rules(COMMAND_POLICY_FILE) if COMMAND_POLICY_FILE else []))
@@ -0,0 +1,182 @@
+# services/conversation.py
+import asyncio
+import contextvars
+import itertools
+import os
+import time
+from collections import OrderedDict, deque
+from services import llm
+from services.prompts import Prompt, count_tokens
+
+# Most history injected into one prompt: the rolling summary plus as many recent turns as fit
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "800"))
+
+# Verbatim turns kept per chat before the oldest are folded into the summary
+RECENT_TOKENS = int(os.getenv("HISTORY_RECENT_TOKENS", "600"))
+
+# Cap on the rolling summary
+SUMMARY_TOKENS = int(os.getenv("HISTORY_SUMMARY_TOKENS", "200"))
+
+# Long bot output (command results, event lists) is cut to this many characters per turn
+TURN_MAX_CHARS = 600
+
+# Chats remembered per process; the least recently active are forgotten first
+MAX_CHATS = int(os.getenv("HISTORY_MAX_CHATS", "1000"))
+
+# The user turn being handled; history() stops before it
+_current_turn = contextvars.ContextVar("conversation_turn", default=None)
+
+
+class Turn:
+    def __init__(self, seq, role, text, message_id=None):
+        self.seq = seq
+        self.role = role
+        self.text = text if len(text) <= TURN_MAX_CHARS else text[:TURN_MAX_CHARS] + "..."
+        self.message_id = message_id
+        self.tokens = count_tokens(self.text)
+
+    def render(self) -> str:
+        return f"{'User' if self.role == 'user' else 'Assistant'}: {self.text}"
+
+
+class Conversation:
+    def __init__(self):
+        self.turns = deque()
+        self.summary = ""
+        # Turns handed to the summarizer; still shown until the new summary lands
+        self.compacting = []
+        self.task = None
+        self.updated = time.time()
+
+    def recent_tokens(self) -> int:
+        return sum(t.tokens for t in self.turns)
+
+
+class ConversationMemory:
+    """
+    Per-chat history: recent turns verbatim plus a rolling summary of older ones,
+    compacted by the LLM in the background.
+
+    Webhook workers are chosen by chat, so each chat's history lives in one process.
+    """
+
+    def __init__(self, max_chats=MAX_CHATS):
+        self.max_chats = max_chats
+        self._chats = OrderedDict()
+        self._seq = itertools.count(1)
+
+    def _chat(self, chat_id) -> Conversation:
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            chat = self._chats[chat_id] = Conversation()
+            while len(self._chats) > self.max_chats:
+                self._chats.popitem(last=False)
+        self._chats.move_to_end(chat_id)
+        return chat
+
+    def add_user(self, chat_id, text):
+        """
+        Records the incoming message; history() called while handling it leaves it out.
+        """
+        turn = Turn(next(self._seq), "user", text)
+        _current_turn.set(turn.seq)
+        self._append(chat_id, turn)
+
+    def add_reply(self, chat_id, text, message_id=None):
+        """
+        Records a bot message. Edits of the same message (live output) replace its turn.
+        """
+        chat = self._chat(chat_id)
+        if message_id is not None:
+            for turn in reversed(chat.turns):
+                if turn.message_id == message_id:
+                    turn.text = Turn(0, "assistant", text).text
+                    turn.tokens = count_tokens(turn.text)
+                    self._maybe_compact(chat)
+                    return
+        self._append(chat_id, Turn(next(self._seq), "assistant", text, message_id))
+
+    def _append(self, chat_id, turn):
+        chat = self._chat(chat_id)
+        chat.turns.append(turn)
+        chat.updated = time.time()
+        self._maybe_compact(chat)
+
+    def _maybe_compact(self, chat):
+        if chat.recent_tokens() <= RECENT_TOKENS or chat.task is not None:
+            return
+        # Fold the oldest turns until half the recent allowance is left
+        while chat.turns and chat.recent_tokens() > RECENT_TOKENS // 2:
+            chat.compacting.append(chat.turns.popleft())
+        try:
+            chat.task = asyncio.get_running_loop().create_task(self._compact(chat))
+        except RuntimeError:
+            # No event loop (e.g. a script); compact on the next message instead
+            chat.turns.extendleft(reversed(chat.compacting))
+            chat.compacting = []
+
+    async def _compact(self, chat):
+        turns = list(chat.compacting)
+        prompt = Prompt("summarize_conversation")
+        prompt.add(f"""
+Update the running summary of a conversation between a user and their server/calendar assistant bot.
+Keep facts a follow-up might refer to: scripts and commands run (and whether they worked), events
+created or deleted, names, dates, and open questions. Drop small talk. Use at most {SUMMARY_TOKENS * 3 // 4} words.
+
+Current summary:
+""")
+        prompt.add(chat.summary or "(none)", priority=20, trim="tail", name="summary")
+        prompt.add("\n\nNew messages:\n")
+        prompt.add("\n".join(t.render() for t in turns), priority=30, trim="tail", name="turns")
+        prompt.add("\n\nRespond with the updated summary only.")
+        try:
+            summary = await llm.chat(
+                [
+                    {"role": "system", "content": "You write concise conversation summaries."},
+                    {"role": "user", "content": prompt.render()}
+                ],
+                temperature=0,
+                cache=False,
+                name=prompt.name
+            )
+            if count_tokens(summary) > SUMMARY_TOKENS:
+                summary = summary[:SUMMARY_TOKENS * 4]
+            chat.summary = summary
+            chat.compacting = chat.compacting[len(turns):]
+        except Exception as e:
+            print(f"⚠️ Conversation summary failed, keeping the turns for next time: {e}")
+        finally:
+            chat.task = None
+
+    def history(self, chat_id, budget=HISTORY_TOKEN_BUDGET) -> str:
+        """
+        The conversation before the message being handled, within `budget` tokens.
+        Empty for a new chat.
+        """
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            return ""
+        current = _current_turn.get()
+        turns = [t for t in list(chat.compacting) + list(chat.turns) if current is None or t.seq < current]
+
+        lines = []
+        used = count_tokens(chat.summary) if chat.summary else 0
+        for turn in reversed(turns):
+            if used + turn.tokens > budget:
+                break
+            lines.append(turn.render())
+            used += turn.tokens
+        lines.reverse()
+
+        parts = []
+        if chat.summary:
+            parts.append(f"Summary of earlier conversation: {chat.summary}")
+        if lines:
+            parts.append("Recent messages:\n" + "\n".join(lines))
+        return "\n\n".join(parts)
+
+    def forget(self, chat_id):
+        self._chats.pop(chat_id, None)
+
+
+memory = ConversationMemory()
@@ -0,0 +1,144 @@
+# services/event_index.py
+import re
+from bisect import bisect_left, insort
+from collections import defaultdict
+from datetime import datetime, timezone
+
+
+def event_start(event) -> datetime:
+    """
+    Start of an event as an aware datetime; all-day events start at midnight UTC.
+    """
+    start = event["start"].get("dateTime")
+    if start:
+        return datetime.fromisoformat(start.replace("Z", "+00:00"))
+    return datetime.fromisoformat(event["start"]["date"]).replace(tzinfo=timezone.utc)
+
+
+def _date_key(event) -> str:
+    # Same day the handlers have always matched on: the date part of the start as Google returns it
+    return event["start"].get("dateTime", event["start"].get("date"))[:10]
+
+
+def tokenize(text: str) -> set:
+    return set(re.findall(r"\w+", (text or "").lower()))
+
+
+class EventIndex:
+    """
+    In-memory indexes over calendar events.
+
+    - a sorted (start timestamp, id) list for range queries via bisect
+    - a start date -> ids map for single-day lookups
+    - an inverted token index over event summaries for title lookups
+    """
+
+    def __init__(self, events=()):
+        self.events = {}
+        self._start_ts = {}
+        self._starts = []
+        self._by_date = defaultdict(set)
+        self._by_token = defaultdict(set)
+        for event in events:
+            self.add(event, keep_sorted=False)
+        self._starts.sort()
+
+    def __len__(self):
+        return len(self.events)
+
+    def add(self, event, keep_sorted=True):
+        event_id = event["id"]
+        if event_id in self.events:
+            self.remove(event_id)
+        self.events[event_id] = event
+        key = (event_start(event).timestamp(), event_id)
+        self._start_ts[event_id] = key[0]
+        if keep_sorted:
+            insort(self._starts, key)
+        else:
+            self._starts.append(key)
+        self._by_date[_date_key(event)].add(event_id)
+        for token in tokenize(event.get("summary")):
+            self._by_token[token].add(event_id)
+
+    def remove(self, event_id):
+        event = self.events.pop(event_id, None)
+        if event is None:
+            return None
+        key = (self._start_ts.pop(event_id), event_id)
+        pos = bisect_left(self._starts, key)
+        if pos < len(self._starts) and self._starts[pos] == key:
+            del self._starts[pos]
+        self._discard(self._by_date, _date_key(event), event_id)
+        for token in tokenize(event.get("summary")):
+            self._discard(self._by_token, token, event_id)
+        return event
+
+    @staticmethod
+    def _discard(index, key, event_id):
+        ids = index.get(key)
+        if ids is not None:
+            ids.discard(event_id)
+            if not ids:
+                del index[key]
+
+    def _sorted(self, ids) -> list:
+        return [self.events[i] for i in sorted(ids, key=lambda i: (self._start_ts[i], i))]
+
+    def between(self, start: datetime, end: datetime) -> list:
+        """
+        Events starting in [start, end), in start order.
+        """
+        lo = bisect_left(self._starts, (start.timestamp(), ""))
+        hi = bisect_left(self._starts, (end.timestamp(), ""))
+        return [self.events[event_id] for _, event_id in self._starts[lo:hi]]
+
+    def on_date(self, date_str: str) -> list:
+        """
+        Events starting on a YYYY-MM-DD date, in start order.
+        """
+        return self._sorted(self._by_date.get(date_str, ()))
+
+    def rank_by_title(self, text: str, ids=None, stopwords=frozenset()) -> list:
+        """
+        Events sharing summary tokens with the text, most shared tokens first.
+        """
+        overlap = defaultdict(int)
+        for token in tokenize(text) - stopwords:
+            for event_id in self._by_token.get(token, ()):
+                if ids is None or event_id in ids:
+                    overlap[event_id] += 1
+        ranked = sorted(overlap, key=lambda i: (-overlap[i], self._start_ts[i], i))
+        return [self.events[i] for i in ranked]
+
+    def search(self, title: str, date_str: str = None, start: datetime = None, end: datetime = None) -> list:
+        """
+        Events whose summary matches the title, optionally limited to a date or range.
+
+        Whole-word matches come from the token index; if none match, the title is
+        treated as a substring (the old fuzzy behaviour) over the date-filtered events.
+        """
+        if date_str:
+            scope = self._by_date.get(date_str, set())
+        elif start and end:
+            scope = {e["id"] for e in self.between(start, end)}
+        else:
+            scope = None
+
+        tokens = sorted(tokenize(title), key=lambda t: len(self._by_token.get(t, ())))
+        if tokens:
+            postings = [self._by_token.get(t, set()) for t in tokens]
+            # Walk whichever side is smaller: the date scope or the rarest token's postings
+            if scope is not None and len(scope) < len(postings[0]):
+                ids = {i for i in scope if all(i in p for p in postings)}
+            else:
+                ids = {i for i in postings[0] if all(i in p for p in postings[1:])}
+                if scope is not None:
+                    ids &= scope
+            if ids:
+                return self._sorted(ids)
+
+        if scope is None:
+            return []
+        needle = (title or "").lower()
+        return self._sorted(i for i in scope if needle in self.events[i].get("summary", "").lower())
@@ -0,0 +1,193 @@
+# services/executor.py
+import asyncio
+import codecs
+import logging
+import os
+from services import output_spool
+
+# How often the live Telegram message is edited while a process runs
+EDIT_INTERVAL = float(os.getenv("OUTPUT_EDIT_INTERVAL_SECONDS", "1.5"))
+
+# Telegram caps messages at 4096 characters; leave room for the header
+TAIL_CHARS = 3500
+MESSAGE_LIMIT = 4096
+
+READ_CHUNK = 4096
+
+logger = logging.getLogger(__name__)
+
+
+class StreamTail:
+    """
+    Decodes a byte stream incrementally and keeps only its last `limit` characters.
+    """
+
+    def __init__(self, limit=TAIL_CHARS):
+        self.limit = limit
+        self.raw = ""
+        self.total_bytes = 0
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    def feed(self, data: bytes) -> str:
+        chunk = self._decoder.decode(data)
+        self.total_bytes += len(data)
+        self.raw = (self.raw + chunk)[-self.limit:]
+        return chunk
+
+    @property
+    def text(self) -> str:
+        """
+        The tail without terminal escape sequences, from the first whole line once the
+        start of the stream has been dropped.
+        """
+        if self.total_bytes > len(self.raw):
+            return output_spool.clean(output_spool.from_line_start(self.raw))
+        return output_spool.clean(self.raw)
+
+
+class ProcessResult:
+    def __init__(self, output=None):
+        self.stdout = StreamTail()
+        self.stderr = StreamTail()
+        # stdout and stderr interleaved as they arrive, for the live view
+        self.combined = StreamTail()
+        # The whole interleaved output, spooled to disk for /more
+        self.output = output
+        self.returncode = None
+        self.timed_out = False
+
+
+async def _pump(stream, tail, result, on_chunk):
+    while True:
+        data = await stream.read(READ_CHUNK)
+        if not data:
+            return
+        chunk = tail.feed(data)
+        result.combined.feed(data)
+        if result.output:
+            result.output.write(data)
+        if on_chunk:
+            on_chunk(chunk)
+
+
+async def run_process(command, shell=False, timeout=120, result=None, on_chunk=None) -> ProcessResult:
+    """
+    Runs a command on an asyncio subprocess, streaming stdout/stderr into `result`.
+
+    `command` is an argv list, or a string when shell=True. The process is killed
+    when the timeout expires (timeout=None waits forever) or the caller is cancelled.
+    """
+    result = result or ProcessResult()
+    if shell:
+        proc = await asyncio.create_subprocess_shell(
+            command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+        )
+    else:
+        proc = await asyncio.create_subprocess_exec(
+            *command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+        )
+
+    try:
+        await asyncio.wait_for(
+            asyncio.gather(
+                _pump(proc.stdout, result.stdout, result, on_chunk),
+                _pump(proc.stderr, result.stderr, result, on_chunk),
+                proc.wait()
+            ),
+            timeout
+        )
+    except asyncio.TimeoutError:
+        result.timed_out = True
+        _kill(proc)
+        await proc.wait()
+    except asyncio.CancelledError:
+        _kill(proc)
+        await proc.wait()
+        raise
+    finally:
+        if result.output:
+            result.output.close()
+
+    result.returncode = proc.returncode
+    return result
+
+
+def _log_edit_failure(what, error):
+    # Telegram rejects an edit that doesn't change the text; that's expected, not a problem
+    if "message is not modified" in str(error).lower():
+        logger.debug("%s: %s", what, error)
+    else:
+        logger.warning("%s: %s", what, error)
+
+
+def _kill(proc):
+    try:
+        proc.kill()
+    except ProcessLookupError:
+        pass
+
+
+async def run_with_live_output(update, header, command, shell=False, timeout=120):
+    """
+    Runs a command while editing one Telegram message with the rolling output tail.
+
+    Returns (result, message) so the caller can put the final status in the same message.
+    """
+    message = await update.message.reply_text(f"⏳ {header}")
+    result = ProcessResult(output=output_spool.store.create(update.effective_chat.id))
+
+    async def refresh():
+        last_text = None
+        while True:
+            await asyncio.sleep(EDIT_INTERVAL)
+            text = f"⏳ {header}\n\n{result.combined.text}".strip()
+            if text != last_text:
+                try:
+                    await message.edit_text(text)
+                except Exception as e:
+                    _log_edit_failure("Live output edit failed", e)
+                last_text = text
+
+    refresher = asyncio.create_task(refresh())
+    try:
+        await run_process(command, shell=shell, timeout=timeout, result=result)
+    finally:
+        refresher.cancel()
+    return result, message
+
+
+async def finish(message, header, output="", note="", result=None):
+    """
+    Replaces the live message with the final status: the header, as much of the end of
+    `output` as fits, then the note. When the run's full output is longer than that, says
+    how to page through it with /more, and sends it as a compressed file when it's large.
+    """
+    spool = result.output if result else None
+    footer = ""
+    if spool and spool.total > output_spool.PAGE_BYTES:
+        footer = (
+            f"\n\n📄 Full output: {output_spool.size_label(spool.total)} in {await spool.page_count()} pages. "
+            f"/more {spool.id} shows it from the start."
+        )
+    room = MESSAGE_LIMIT - len(header) - len(note) - len(footer)
+    if len(output) > room:
+        output = "…" + output[-(room - 1):] if room > 1 else ""
+    text = f"{header}{output}{note}{footer}"[:MESSAGE_LIMIT]
+    try:
+        await message.edit_text(text)
+    except Exception as e:
+        _log_edit_failure("Final output edit failed", e)
+        await message.reply_text(text)
+
+    if spool and spool.total > output_spool.OUTPUT_ATTACH_BYTES:
+        try:
+            path = await asyncio.to_thread(spool.compress)
+            with open(path, "rb") as f:
+                await message.reply_document(
+                    document=f,
+                    filename=f"output-{spool.id}.txt.gz",
+                    caption=f"📄 Full output ({output_spool.size_label(spool.total)})"
+                )
+        except Exception:
+            logger.exception("Sending output %s as a file failed", spool.id)
+            await message.reply_text(f"⚠️ Couldn't attach the full output; /more {spool.id} pages through it instead.")
@@ -0,0 +1,195 @@
+# services/jobs.py
+import asyncio
+import logging
+import os
+import secrets
+import time
+from collections import OrderedDict
+from services.executor import run_process
+from services.output_spool import clean
+
+JOBS_DIR = "data/jobs"
+
+MAX_CONCURRENT_JOBS = int(os.getenv("MAX_CONCURRENT_JOBS", "3"))
+
+# Per-job on-disk output cap; older output is overwritten
+SPOOL_MAX_BYTES = int(os.getenv("JOB_SPOOL_MAX_BYTES", str(1024 * 1024)))
+
+# 0 means background jobs run until they finish or are cancelled
+JOB_TIMEOUT = float(os.getenv("JOB_TIMEOUT_SECONDS", "0")) or None
+
+# Finished jobs kept for /jobs and /tail before their spools are deleted
+KEEP_FINISHED = 50
+
+# Confirmation replies that start a background job instead of a foreground run
+BACKGROUND_REPLIES = ["bg", "background", "yes bg", "run in background"]
+
+logger = logging.getLogger(__name__)
+
+
+class RingSpool:
+    """
+    Fixed-size ring buffer in a file: keeps the most recent max_bytes of output.
+    """
+
+    def __init__(self, path, max_bytes=SPOOL_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.pos = 0
+        self.total = 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._file = open(path, "w+b")
+
+    def write(self, data: bytes):
+        if len(data) > self.max_bytes:
+            self.total += len(data) - self.max_bytes
+            data = data[-self.max_bytes:]
+        while data:
+            n = min(len(data), self.max_bytes - self.pos)
+            self._file.seek(self.pos)
+            self._file.write(data[:n])
+            self.pos = (self.pos + n) % self.max_bytes
+            self.total += n
+            data = data[n:]
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    def tail(self, nbytes=3500) -> str:
+        """
+        The last nbytes of output, oldest first.
+        """
+        size = min(self.total, self.max_bytes)
+        nbytes = min(nbytes, size)
+        if not nbytes:
+            return ""
+        if not self._file.closed:
+            self._file.flush()
+        start = (self.pos - nbytes) % self.max_bytes if self.total >= self.max_bytes else self.pos - nbytes
+        with open(self.path, "rb") as f:
+            f.seek(start)
+            if start + nbytes <= self.max_bytes:
+                data = f.read(nbytes)
+            else:
+                data = f.read(self.max_bytes - start)
+                f.seek(0)
+                data += f.read(nbytes - len(data))
+        return clean(data.decode("utf-8", errors="replace"))
+
+    def delete(self):
+        self.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class Job:
+    def __init__(self, name, command, shell, chat_id):
+        self.id = secrets.token_hex(3)
+        self.name = name
+        self.command = command
+        self.shell = shell
+        self.chat_id = chat_id
+        self.status = "queued"
+        self.returncode = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.spool = RingSpool(os.path.join(JOBS_DIR, f"{self.id}.log"))
+        self.task = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("succeeded", "failed", "cancelled", "timed_out")
+
+    def describe(self) -> str:
+        if self.started and not self.finished:
+            elapsed = f"running {int(time.time() - self.started)}s"
+        elif self.finished and self.started:
+            elapsed = f"took {int(self.finished - self.started)}s"
+        else:
+            elapsed = f"waiting {int(time.time() - self.created)}s"
+        code = f", exit {self.returncode}" if self.returncode is not None else ""
+        return f"[{self.id}] {self.name} — {self.status}{code} ({elapsed})"
+
+
+class JobManager:
+    """
+    Runs confirmed scripts and commands as background jobs with bounded concurrency.
+    """
+
+    def __init__(self, max_concurrent=MAX_CONCURRENT_JOBS):
+        self.max_concurrent = max_concurrent
+        self.jobs = OrderedDict()
+        self._semaphore = None
+
+    def submit(self, name, command, bot, chat_id, shell=False) -> Job:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        job = Job(name, command, shell, chat_id)
+        self.jobs[job.id] = job
+        job.task = asyncio.create_task(self._run(job, bot))
+        self._prune()
+        return job
+
+    async def _run(self, job, bot):
+        try:
+            async with self._semaphore:
+                job.status = "running"
+                job.started = time.time()
+                result = await run_process(
+                    job.command,
+                    shell=job.shell,
+                    timeout=JOB_TIMEOUT,
+                    on_chunk=lambda chunk: job.spool.write(chunk.encode("utf-8"))
+                )
+            job.returncode = result.returncode
+            if result.timed_out:
+                job.status = "timed_out"
+            else:
+                job.status = "succeeded" if result.returncode == 0 else "failed"
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+        except Exception as e:
+            job.spool.write(f"\nError running job: {e}\n".encode("utf-8"))
+            job.status = "failed"
+        finally:
+            job.finished = time.time()
+            job.spool.close()
+
+        icon = "✅" if job.status == "succeeded" else "⚠️"
+        try:
+            await bot.send_message(
+                chat_id=job.chat_id,
+                text=f"{icon} Job {job.describe()}\n\n{job.spool.tail()}"[:4096]
+            )
+        except Exception:
+            logger.exception("Notifying chat %s about job %s failed", job.chat_id, job.id)
+        # Finished jobs pile up between submits otherwise
+        self._prune()
+
+    def get(self, job_id, chat_id):
+        job = self.jobs.get(job_id)
+        if job and job.chat_id == chat_id:
+            return job
+        return None
+
+    def for_chat(self, chat_id) -> list:
+        return [job for job in self.jobs.values() if job.chat_id == chat_id]
+
+    def cancel(self, job) -> bool:
+        if job.done or job.task is None:
+            return False
+        job.task.cancel()
+        return True
+
+    def _prune(self):
+        finished = [job for job in self.jobs.values() if job.done]
+        for job in finished[:-KEEP_FINISHED]:
+            job.spool.delete()
+            del self.jobs[job.id]
+
+
+manager = JobManager()
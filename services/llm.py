@@ -0,0 +1,105 @@
+# services/llm.py
+import json
+from dotenv import load_dotenv
+from openai import AsyncOpenAI
+from services.llm_cache import cache as response_cache, make_key
+from services.metrics import span
+from services.prompts import Prompt, count_tokens
+from services import usage
+
+load_dotenv()
+
+DEFAULT_MODEL = "gpt-4o-mini"
+
+_client = None
+
+
+def get_client():
+    """
+    Returns the shared async OpenAI client, creating it on first use.
+    """
+    global _client
+    if _client is None:
+        _client = AsyncOpenAI()
+    return _client
+
+
+def set_client(client):
+    """
+    Replaces the shared client, e.g. with a local stand-in for benchmarks.
+    """
+    global _client
+    _client = client
+
+
+async def close_client():
+    """
+    Closes the shared client so the next call opens one bound to the running event loop.
+    """
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+async def chat(messages: list, model: str = DEFAULT_MODEL, temperature: float = 0, cache: bool = None,
+               name: str = None, parse=None):
+    """
+    Runs a chat completion without blocking the event loop and returns the reply text,
+    or parse(text) when `parse` is given.
+
+    Deterministic (temperature 0) calls are served from the response cache unless
+    cache=False; cache=True forces caching for other temperatures. Token usage is
+    recorded under `name` (the prompt's name) and the current user and intent. A reply
+    `parse` rejects (raises on) is not cached, so the next call asks again.
+    """
+    estimated = sum(count_tokens(m["content"]) for m in messages)
+    use_cache = temperature == 0 if cache is None else cache
+    key = make_key(model, messages, temperature) if use_cache else None
+    if key:
+        with span("llm.cache_lookup"):
+            cached = response_cache.get(key)
+        if cached is not None:
+            usage.record(name, estimated, cached=True)
+            return parse(cached) if parse else cached
+
+    with span("llm.api"):
+        response = await get_client().chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature
+        )
+    reported = getattr(response, "usage", None)
+    usage.record(
+        name,
+        estimated,
+        prompt_tokens=getattr(reported, "prompt_tokens", 0) or 0,
+        completion_tokens=getattr(reported, "completion_tokens", 0) or 0
+    )
+    content = response.choices[0].message.content.strip()
+    result = parse(content) if parse else content
+    if key:
+        response_cache.set(key, content)
+    return result
+
+
+async def chat_json(prompt, model: str = DEFAULT_MODEL, cache: bool = None) -> dict:
+    """
+    Sends a structured-output prompt (a Prompt, trimmed to its budget, or a plain string)
+    and parses the JSON reply.
+    """
+    name = None
+    if isinstance(prompt, Prompt):
+        name = prompt.name
+        prompt = prompt.render()
+    return await chat(
+        [
+            {"role": "system", "content": "You output structured JSON only."},
+            {"role": "user", "content": prompt}
+        ],
+        model=model,
+        temperature=0,
+        cache=cache,
+        name=name,
+        parse=json.loads
+    )
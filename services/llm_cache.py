@@ -0,0 +1,169 @@
+# services/llm_cache.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from services import metrics
+
+CACHE_PATH = os.getenv("LLM_CACHE_PATH", "data/llm_cache.sqlite3")
+CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+MEMORY_ENTRIES = int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "512"))
+
+# Run size-based eviction every this many writes
+EVICT_EVERY = 50
+
+# Disk hits whose access time is written in one go (also flushed with every write);
+# losing a few on exit only makes those entries look older to eviction
+TOUCH_BATCH = 100
+
+
+def make_key(model: str, messages: list, temperature: float) -> str:
+    """
+    Content address for a completion request.
+    """
+    payload = json.dumps(
+        {"model": model, "messages": messages, "temperature": temperature},
+        sort_keys=True,
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    Two-tier cache for deterministic completions: an in-memory LRU in front of SQLite.
+    """
+
+    def __init__(self, path=CACHE_PATH, ttl=CACHE_TTL_SECONDS, max_bytes=CACHE_MAX_BYTES,
+                 memory_entries=MEMORY_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._writes = 0
+        # key -> last access time not yet written to SQLite
+        self._touched = {}
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+    def _db(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS completions ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+                " created REAL NOT NULL, accessed REAL NOT NULL, size INTEGER NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS completions_accessed ON completions (accessed)")
+        return self._conn
+
+    def _remember(self, key, value, created):
+        self._memory[key] = (value, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and now - entry[1] < self.ttl:
+                self._memory.move_to_end(key)
+                self.counters["memory_hits"] += 1
+                return entry[0]
+            self._memory.pop(key, None)
+
+            db = self._db()
+            row = db.execute("SELECT value, created FROM completions WHERE key = ?", (key,)).fetchone()
+            if row and now - row[1] < self.ttl:
+                # No write per hit on the event loop; access times are saved in batches
+                self._touched[key] = now
+                if len(self._touched) >= TOUCH_BATCH:
+                    self._flush_touched()
+                    db.commit()
+                self._remember(key, row[0], row[1])
+                self.counters["disk_hits"] += 1
+                return row[0]
+            if row:
+                db.execute("DELETE FROM completions WHERE key = ?", (key,))
+                db.commit()
+            self.counters["misses"] += 1
+            return None
+
+    def set(self, key: str, value: str):
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+            db = self._db()
+            db.execute(
+                "INSERT OR REPLACE INTO completions (key, value, created, accessed, size) VALUES (?, ?, ?, ?, ?)",
+                (key, value, now, now, len(value.encode("utf-8")))
+            )
+            self._touched.pop(key, None)
+            self._flush_touched()
+            db.commit()
+            self.counters["writes"] += 1
+            self._writes += 1
+            if self._writes % EVICT_EVERY == 0:
+                self._evict(now)
+
+    def _flush_touched(self):
+        # Part of the caller's transaction; the caller commits
+        if self._touched:
+            self._db().executemany(
+                "UPDATE completions SET accessed = ? WHERE key = ?",
+                [(accessed, key) for key, accessed in self._touched.items()]
+            )
+            self._touched.clear()
+
+    def _evict(self, now):
+        """
+        Drops expired rows, then least recently used rows until under the size cap.
+        """
+        db = self._db()
+        self._flush_touched()
+        removed = db.execute("DELETE FROM completions WHERE created < ?", (now - self.ttl,)).rowcount
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()[0]
+        if total > self.max_bytes:
+            excess = total - self.max_bytes
+            freed = 0
+            victims = []
+            for key, size in db.execute("SELECT key, size FROM completions ORDER BY accessed").fetchall():
+                victims.append((key,))
+                freed += size
+                if freed >= excess:
+                    break
+            db.executemany("DELETE FROM completions WHERE key = ?", victims)
+            removed += len(victims)
+        db.commit()
+        self.counters["evictions"] += removed
+
+    def clear(self):
+        """
+        Drops every cached completion and resets the counters.
+        """
+        with self._lock:
+            self._memory.clear()
+            self._touched.clear()
+            self._db().execute("DELETE FROM completions")
+            self._db().commit()
+            self.counters = dict.fromkeys(self.counters, 0)
+
+    def stats(self) -> dict:
+        lookups = self.counters["memory_hits"] + self.counters["disk_hits"] + self.counters["misses"]
+        hits = lookups - self.counters["misses"]
+        return dict(self.counters, hit_rate=hits / lookups if lookups else 0.0)
+
+
+cache = LLMCache()
+metrics.register("llm_cache", cache.stats)
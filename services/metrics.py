@@ -0,0 +1,195 @@
+# services/metrics.py
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Prometheus endpoint; 0 turns it off
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9464"))
+
+# Recent samples per stage the percentiles are computed over
+WINDOW = int(os.getenv("METRICS_WINDOW", "2048"))
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    """
+    Rolling latency window plus lifetime count and sum.
+    """
+
+    def __init__(self, window=WINDOW):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def quantiles(self) -> dict:
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {q: 0.0 for q in QUANTILES}
+        return {q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] for q in QUANTILES}
+
+
+_histograms = {}
+_collectors = {}
+_lock = threading.Lock()
+
+
+def observe(name, seconds):
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = Histogram()
+        histogram.observe(seconds)
+
+
+@contextmanager
+def span(name):
+    """
+    Times the enclosed block (sync or async code) under the given stage name.
+    Failed blocks are recorded as "<name>.error" so they don't skew the success timings.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        observe(f"{name}.error", time.perf_counter() - start)
+        raise
+    observe(name, time.perf_counter() - start)
+
+
+def reset():
+    """
+    Forgets every recorded timing (collectors stay registered).
+    """
+    with _lock:
+        _histograms.clear()
+
+
+def register(name, collector):
+    """
+    Adds a callable returning a dict of counters (nested one level at most) to the exports.
+    """
+    _collectors[name] = collector
+
+
+def snapshot() -> dict:
+    with _lock:
+        return {
+            name: {"count": h.count, "sum": h.total, "quantiles": h.quantiles()}
+            for name, h in _histograms.items()
+        }
+
+
+def _collect():
+    for name, collector in list(_collectors.items()):
+        try:
+            yield name, collector()
+        except Exception as e:
+            print(f"⚠️ Metrics collector {name} failed: {e}")
+
+
+def _metric_name(*parts) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", "_".join(str(p) for p in parts))
+
+
+def _number(value):
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (int, float)):
+        return value
+    return None
+
+
+def render_prometheus() -> str:
+    lines = ["# TYPE bot_stage_seconds summary"]
+    for name, data in sorted(snapshot().items()):
+        for q, value in data["quantiles"].items():
+            lines.append(f'bot_stage_seconds{{stage="{name}",quantile="{q}"}} {value:.6f}')
+        lines.append(f'bot_stage_seconds_count{{stage="{name}"}} {data["count"]}')
+        lines.append(f'bot_stage_seconds_sum{{stage="{name}"}} {data["sum"]:.6f}')
+
+    for name, values in _collect():
+        for key, value in sorted(values.items()):
+            if isinstance(value, dict):
+                # e.g. per-intent counters: bot_intent_classifier_hit_rate{key="calendar"}
+                for field, inner in sorted(value.items()):
+                    if _number(inner) is not None:
+                        lines.append(f'{_metric_name("bot", name, field)}{{key="{key}"}} {_number(inner)}')
+            elif _number(value) is not None:
+                lines.append(f"{_metric_name('bot', name, key)} {_number(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def format_stats() -> str:
+    """
+    Human-readable breakdown for the /stats command.
+    """
+    data = snapshot()
+    lines = ["📊 Stage timings (ms, p50 / p95 / p99, count):", ""]
+    if not data:
+        lines.append("(nothing recorded yet)")
+    for name, stage in sorted(data.items()):
+        p50, p95, p99 = (stage["quantiles"][q] * 1000 for q in QUANTILES)
+        lines.append(f"- {name}: {p50:.0f} / {p95:.0f} / {p99:.0f} ({stage['count']})")
+
+    for name, values in _collect():
+        lines += ["", f"{name}:"]
+        for key, value in sorted(values.items()):
+            if isinstance(value, dict):
+                value = ", ".join(f"{k}={_short(v)}" for k, v in value.items())
+            lines.append(f"- {key}: {_short(value)}")
+    return "\n".join(lines)
+
+
+def _short(value):
+    return f"{value:.2f}" if isinstance(value, float) else value
+
+
+_server = None
+
+
+def start_exporter(host=METRICS_HOST, port=METRICS_PORT):
+    """
+    Serves /metrics in Prometheus text format from a daemon thread.
+    """
+    global _server
+    if not port or _server is not None:
+        return
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = render_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    try:
+        _server = ThreadingHTTPServer((host, port), MetricsHandler)
+    except OSError as e:
+        print(f"⚠️ Metrics exporter not started on {host}:{port}: {e}")
+        return
+    threading.Thread(target=_server.serve_forever, name="metrics-exporter", daemon=True).start()
+    print(f"✅ Metrics on http://{host}:{port}/metrics")
+
+
+def stop_exporter():
+    global _server
+    if _server is not None:
+        _server.shutdown()
+        _server.server_close()
+        _server = None
@@ -0,0 +1,250 @@
+# services/output_spool.py
+import asyncio
+import gzip
+import os
+import re
+import secrets
+import time
+from collections import OrderedDict
+
+OUTPUT_DIR = "data/output"
+
+# Per-run on-disk cap; past it only the last TAIL_BYTES are kept (in memory)
+OUTPUT_SPOOL_MAX_BYTES = int(os.getenv("OUTPUT_SPOOL_MAX_BYTES", str(8 * 1024 * 1024)))
+
+# Output bigger than this is also sent as a compressed file
+OUTPUT_ATTACH_BYTES = int(os.getenv("OUTPUT_ATTACH_BYTES", str(64 * 1024)))
+
+# Finished outputs kept for /more; older ones (and files left by earlier runs) are deleted
+KEEP_OUTPUTS = int(os.getenv("OUTPUT_KEEP", "100"))
+OUTPUT_RETENTION_SECONDS = int(os.getenv("OUTPUT_RETENTION_SECONDS", str(24 * 3600)))
+
+HEAD_BYTES = 4096
+TAIL_BYTES = 4096
+
+# One /more page; leaves room for the header in a 4096-character message
+PAGE_BYTES = 3500
+
+# CSI (colors, cursor movement), OSC (titles, hyperlinks) and other escape sequences
+ANSI = re.compile(r"\x1b\[[0-?]*[ -/]*[@-~]|\x1b\][^\x07\x1b]*(?:\x07|\x1b\\)?|\x1b[@-Z\\-_]")
+CONTROL = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]")
+
+
+def clean(text: str) -> str:
+    """
+    Terminal output as plain text: escape sequences removed, and a line redrawn with
+    carriage returns (progress bars) reduced to what it finally showed.
+    """
+    text = ANSI.sub("", text)
+    if "\r" in text:
+        text = "\n".join(line.rstrip("\r").rsplit("\r", 1)[-1] for line in text.split("\n"))
+    return CONTROL.sub("", text)
+
+
+def _decode(data: bytes) -> str:
+    return clean(data.decode("utf-8", errors="replace"))
+
+
+def _page_end(data: bytes) -> int:
+    """
+    Where a page read as PAGE_BYTES + 1 bytes should end: after its last full line, or if
+    a line is longer than half a page, at a character boundary. Never 0.
+    """
+    if len(data) <= PAGE_BYTES:
+        return len(data)
+    end = data.rfind(b"\n", 0, PAGE_BYTES) + 1
+    if end < PAGE_BYTES // 2:
+        end = PAGE_BYTES
+        # At most 3 continuation bytes belong to one character; more means binary output
+        while end > PAGE_BYTES - 3 and data[end] & 0xC0 == 0x80:
+            end -= 1
+        if data[end] & 0xC0 == 0x80:
+            end = PAGE_BYTES
+    return end
+
+
+def from_line_start(text: str) -> str:
+    # A tail usually starts mid-line (possibly mid escape sequence); drop that fragment
+    newline = text.find("\n")
+    return text[newline + 1:] if newline >= 0 else text
+
+
+def size_label(nbytes: int) -> str:
+    for unit in ("bytes", "KB", "MB"):
+        if nbytes < 1024 or unit == "MB":
+            return f"{nbytes:.0f} {unit}" if unit == "bytes" else f"{nbytes:.1f} {unit}"
+        nbytes /= 1024
+
+
+class OutputSpool:
+    """
+    A command's output: written to disk up to max_bytes, with the first and last few KB
+    also in memory. Read back in pages by /more.
+    """
+
+    def __init__(self, chat_id, path, max_bytes=OUTPUT_SPOOL_MAX_BYTES):
+        self.id = os.path.basename(path).split(".")[0]
+        self.chat_id = chat_id
+        self.path = path
+        self.max_bytes = max_bytes
+        self.head = b""
+        self.tail = b""
+        self.total = 0
+        self.spooled = 0
+        self.created = time.time()
+        # Last page sent by /more, so a bare /more continues from there
+        self.cursor = 0
+        # Page start offsets, built on first use once the output is complete
+        self._starts = None
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._file = open(path, "wb")
+
+    def write(self, data: bytes):
+        self.total += len(data)
+        if len(self.head) < HEAD_BYTES:
+            self.head += data[:HEAD_BYTES - len(self.head)]
+        self.tail = (self.tail + data)[-TAIL_BYTES:]
+        if not self._file.closed and self.spooled < self.max_bytes:
+            data = data[:self.max_bytes - self.spooled]
+            self._file.write(data)
+            self.spooled += len(data)
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    @property
+    def truncated(self) -> bool:
+        return self.total > self.spooled
+
+    @property
+    def pages(self) -> int:
+        # The in-memory tail is one more page when the middle didn't fit on disk
+        return len(self._page_starts()) + (1 if self.truncated else 0)
+
+    def _page_starts(self) -> list:
+        """
+        Offsets where pages begin. Pages end on line breaks, so they're found in one pass
+        over the spool.
+        """
+        if not self._file.closed:
+            # Still being written
+            self._file.flush()
+            self._starts = None
+        if self._starts is None:
+            if self.spooled > len(self.head):
+                with open(self.path, "rb") as f:
+                    self._starts = self._scan(lambda start: (f.seek(start), f.read(PAGE_BYTES + 1))[1])
+            else:
+                self._starts = self._scan(lambda start: self.head[start:start + PAGE_BYTES + 1])
+        return self._starts
+
+    @staticmethod
+    def _scan(read) -> list:
+        starts = [0]
+        while True:
+            data = read(starts[-1])
+            end = _page_end(data)
+            if end == len(data):
+                return starts
+            if end <= 0:
+                raise RuntimeError(f"Empty page at offset {starts[-1]}")
+            starts.append(starts[-1] + end)
+
+    async def page_count(self) -> int:
+        """
+        `pages` without blocking the event loop; indexing a large spool reads all of it.
+        """
+        return await asyncio.to_thread(lambda: self.pages)
+
+    def page(self, number: int) -> str:
+        """
+        Page `number` (from 1) of the cleaned output.
+        """
+        starts = self._page_starts()
+        if number > len(starts):
+            return self._unspooled()
+        start = starts[number - 1]
+        end = starts[number] if number < len(starts) else self.spooled
+        if end <= len(self.head):
+            return _decode(self.head[start:end])
+        with open(self.path, "rb") as f:
+            f.seek(start)
+            return _decode(f.read(end - start))
+
+    def _unspooled(self) -> str:
+        """
+        The end of the output that went past the disk cap, as far as the tail holds it.
+        """
+        missing = self.total - self.spooled
+        kept = self.tail[-min(len(self.tail), missing):]
+        if missing > len(kept):
+            return f"[... {size_label(missing - len(kept))} not kept ...]\n" + from_line_start(_decode(kept))
+        return _decode(kept)
+
+    def compress(self) -> str:
+        """
+        Writes the cleaned output to a .gz next to the spool and returns its path.
+        """
+        self.close()
+        gz_path = self.path + ".gz"
+        with gzip.open(gz_path, "wt", encoding="utf-8") as out, \
+                open(self.path, encoding="utf-8", errors="replace", newline="\n") as spooled:
+            for line in spooled:
+                out.write(clean(line))
+            if self.truncated:
+                out.write("\n" + self._unspooled())
+        return gz_path
+
+    def delete(self):
+        self.close()
+        for path in (self.path, self.path + ".gz"):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+class OutputStore:
+    """
+    Recent command outputs by ID, for /more. Webhook workers are chosen by chat, so a
+    chat's outputs are in the process that handles its /more.
+    """
+
+    def __init__(self, directory=OUTPUT_DIR, keep=KEEP_OUTPUTS):
+        self.directory = directory
+        self.keep = keep
+        self.outputs = OrderedDict()
+        self._swept = False
+
+    def create(self, chat_id) -> OutputSpool:
+        if not self._swept:
+            self._sweep()
+        output = OutputSpool(chat_id, os.path.join(self.directory, f"{secrets.token_hex(3)}.log"))
+        self.outputs[output.id] = output
+        while len(self.outputs) > self.keep:
+            _, oldest = self.outputs.popitem(last=False)
+            oldest.delete()
+        return output
+
+    def get(self, output_id, chat_id):
+        output = self.outputs.get(output_id)
+        if output and output.chat_id == chat_id:
+            return output
+        return None
+
+    def _sweep(self):
+        # Files from earlier runs of the bot can't be paged any more
+        self._swept = True
+        if not os.path.isdir(self.directory):
+            return
+        cutoff = time.time() - OUTPUT_RETENTION_SECONDS
+        for entry in os.scandir(self.directory):
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except OSError:
+                pass
+
+
+store = OutputStore()
@@ -0,0 +1,152 @@
+# services/prompts.py
+import json
+import logging
+import os
+from services import usage
+
+try:
+    # Exact counts when available; the chars/4 estimate is close enough for budgeting
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Never trimmed: instructions, the user's message, the response format
+REQUIRED = 100
+
+# Token budget per prompt; override one with PROMPT_BUDGET_<NAME>, e.g. PROMPT_BUDGET_ROUTE_MESSAGE=4000
+DEFAULT_BUDGETS = {
+    "interpret_high_level_intent": 1000,
+    "route_message": 3500,
+    "interpret_calendar_details": 3000,
+    "interpret_script_details": 2500,
+    "interpret_server_command": 1000,
+    "analyze_command_error": 2000,
+    "summarize_script": 4000,
+}
+FALLBACK_BUDGET = int(os.getenv("PROMPT_BUDGET_DEFAULT", "4000"))
+
+TRIM_MARKER = "[...trimmed]"
+
+_encoding = None
+
+logger = logging.getLogger(__name__)
+
+
+def count_tokens(text: str) -> int:
+    global _encoding
+    if tiktoken is not None:
+        if _encoding is None:
+            _encoding = tiktoken.get_encoding("o200k_base")
+        return len(_encoding.encode(text, disallowed_special=()))
+    # ~4 characters per token for English and JSON
+    return len(text) // 4 + 1
+
+
+def budget_for(name: str) -> int:
+    override = os.getenv(f"PROMPT_BUDGET_{name.upper()}")
+    if override:
+        return int(override)
+    return DEFAULT_BUDGETS.get(name, FALLBACK_BUDGET)
+
+
+class Section:
+    """
+    A piece of a prompt. Lower priority sections are trimmed first when over budget.
+
+    trim is "drop" (all or nothing), "head" (keep the start), "tail" (keep the end, e.g.
+    stderr) or, for item lists, drops items from the end.
+    """
+
+    def __init__(self, name, text="", priority=REQUIRED, trim="drop", items=None, render=None):
+        self.name = name
+        self.text = text
+        self.priority = priority
+        self.trim = trim
+        self.items = items
+        self.render = render or (lambda items: json.dumps(items))
+        if items is not None:
+            self.text = self.render(items)
+
+    def shrink(self, excess: int) -> bool:
+        """
+        Cuts roughly `excess` tokens. Returns True if the section changed.
+        """
+        if not self.text:
+            return False
+        if self.items:
+            # +1 for the separator between items
+            costs = [count_tokens(json.dumps(item)) + 1 for item in self.items]
+            keep = len(self.items)
+            while keep and excess > 0:
+                keep -= 1
+                excess -= costs[keep]
+            self.items = self.items[:keep]
+            self.text = self.render(self.items)
+            return True
+        if self.trim in ("head", "tail"):
+            keep_chars = max(0, len(self.text) - excess * 4 - len(TRIM_MARKER))
+            if keep_chars == 0:
+                self.text = ""
+            elif self.trim == "head":
+                self.text = self.text[:keep_chars] + TRIM_MARKER
+            else:
+                self.text = TRIM_MARKER + self.text[-keep_chars:]
+            return True
+        self.text = ""
+        return True
+
+
+class Prompt:
+    """
+    Builds a prompt from sections and trims the lowest-priority ones to fit its budget.
+    """
+
+    def __init__(self, name, budget=None):
+        self.name = name
+        self.budget = budget or budget_for(name)
+        self.sections = []
+        self.tokens = 0
+        self.trimmed = []
+
+    def add(self, text, priority=REQUIRED, trim="drop", name=None):
+        self.sections.append(Section(name or f"section{len(self.sections)}", text, priority, trim))
+        return self
+
+    def add_items(self, name, items, priority, render=None):
+        self.sections.append(Section(name, priority=priority, items=list(items), render=render))
+        return self
+
+    def add_history(self, history, priority=15):
+        """
+        Adds the chat's earlier conversation, when there is any. Trimming keeps the newest part.
+        """
+        if history:
+            self.add("\nConversation so far (use it to resolve references like \"it\" or \"the one I just ran\"):\n",
+                     priority=priority, name="history_header")
+            self.add(history + "\n", priority=priority, trim="tail", name="history")
+        return self
+
+    def render(self) -> str:
+        costs = [count_tokens(s.text) for s in self.sections]
+        total = sum(costs)
+        # Lowest priority first; among equals, the later section goes first
+        order = sorted(range(len(self.sections)), key=lambda i: (self.sections[i].priority, -i))
+        for i in order:
+            if total <= self.budget:
+                break
+            section = self.sections[i]
+            if section.priority >= REQUIRED:
+                break
+            # Estimates are approximate, so keep cutting this section until it fits or is empty
+            while total > self.budget and section.shrink(total - self.budget):
+                if section.name not in self.trimmed:
+                    self.trimmed.append(section.name)
+                total -= costs[i]
+                costs[i] = count_tokens(section.text)
+                total += costs[i]
+        self.tokens = total
+        if self.trimmed:
+            usage.record_trim(self.name)
+        if total > self.budget:
+            logger.warning("Prompt %s is ~%d tokens, over its %d budget after trimming", self.name, total, self.budget)
+        return "".join(s.text for s in self.sections)
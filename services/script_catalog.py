@@ -0,0 +1,196 @@
+# services/script_catalog.py
+import asyncio
+import os
+from services.script_index import ScriptIndex
+from generate_script_summaries import (
+    INTERNAL_FIELDS, OUTPUT_FILE, SCRIPTS_DIR, is_script, is_current, load_summaries, save_summaries, summarize_file
+)
+
+try:
+    # watchdog uses inotify on Linux
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    FileSystemEventHandler = object
+    Observer = None
+
+# Wait this long after the last change before re-summarizing, so editor saves and
+# bulk copies turn into one refresh
+DEBOUNCE_SECONDS = float(os.getenv("SCRIPT_WATCH_DEBOUNCE_SECONDS", "1.0"))
+
+# Scripts offered to the LLM when it has to choose one
+TOP_K = int(os.getenv("SCRIPT_TOP_K", "5"))
+
+# Directory scan interval when watchdog isn't installed
+POLL_INTERVAL = float(os.getenv("SCRIPT_WATCH_POLL_SECONDS", "5"))
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except FileNotFoundError:
+        return None
+
+
+class _ChangeHandler(FileSystemEventHandler):
+    def __init__(self, catalog, loop):
+        self.catalog = catalog
+        self.loop = loop
+
+    def on_any_event(self, event):
+        # Called on the observer thread; hand the paths to the event loop
+        for path in (getattr(event, "src_path", None), getattr(event, "dest_path", None)):
+            if path:
+                self.loop.call_soon_threadsafe(self.catalog.notify, os.path.basename(path))
+
+
+class ScriptCatalog:
+    """
+    In-memory script summaries kept current by watching the scripts directory.
+
+    Readers get an immutable snapshot; refreshes build a new one and swap it in.
+    """
+
+    def __init__(self):
+        self._snapshot = None
+        self._pending = set()
+        self._debounce = None
+        self._lock = None
+        self._observer = None
+        self._poller = None
+
+    def _build_snapshot(self, summaries):
+        by_name = {s["name"]: s for s in summaries}
+        prompt_view = tuple(
+            {k: v for k, v in s.items() if k not in INTERNAL_FIELDS} for s in summaries
+        )
+        return by_name, prompt_view, ScriptIndex(prompt_view)
+
+    def _ensure_loaded(self):
+        if self._snapshot is None:
+            self._snapshot = self._build_snapshot(load_summaries())
+
+    def summaries(self) -> list:
+        """
+        Script summaries without bookkeeping fields, ready for prompts.
+        """
+        self._ensure_loaded()
+        return list(self._snapshot[1])
+
+    def search(self, query: str, k: int = TOP_K) -> list:
+        """
+        The k scripts most relevant to the query, from the local index.
+        """
+        self._ensure_loaded()
+        return self._snapshot[2].search(query, k)
+
+    def names_containing(self, keyword: str) -> list:
+        self._ensure_loaded()
+        return self._snapshot[2].names_containing(keyword)
+
+    def get(self, name):
+        self._ensure_loaded()
+        return self._snapshot[0].get(name)
+
+    def start(self, watch_scripts=True):
+        """
+        Starts watching the scripts directory; call from inside the running event loop.
+
+        With watch_scripts=False (every webhook worker but one) the scripts are left to
+        the process that watches them, and this one only reloads the summaries it saves.
+        """
+        self._ensure_loaded()
+        self._lock = asyncio.Lock()
+        loop = asyncio.get_running_loop()
+        if not watch_scripts:
+            self._poller = asyncio.create_task(self._follow())
+        elif Observer is not None:
+            self._observer = Observer()
+            self._observer.schedule(_ChangeHandler(self, loop), SCRIPTS_DIR, recursive=False)
+            self._observer.daemon = True
+            self._observer.start()
+            print(f"👀 Watching {SCRIPTS_DIR}/ for script changes")
+        else:
+            self._poller = asyncio.create_task(self._poll())
+            print(f"👀 watchdog not installed, polling {SCRIPTS_DIR}/ every {POLL_INTERVAL}s")
+
+    def stop(self):
+        if self._observer:
+            self._observer.stop()
+        if self._poller:
+            self._poller.cancel()
+
+    async def _poll(self):
+        seen = {}
+        while True:
+            current = {}
+            for filename in os.listdir(SCRIPTS_DIR):
+                if is_script(filename):
+                    current[filename] = os.stat(os.path.join(SCRIPTS_DIR, filename)).st_mtime
+            if seen:
+                for filename in set(seen) | set(current):
+                    if seen.get(filename) != current.get(filename):
+                        self.notify(filename)
+            seen = current
+            await asyncio.sleep(POLL_INTERVAL)
+
+    async def _follow(self):
+        seen = _mtime(OUTPUT_FILE)
+        while True:
+            await asyncio.sleep(POLL_INTERVAL)
+            current = _mtime(OUTPUT_FILE)
+            if current != seen:
+                seen = current
+                # save_summaries replaces the file in one step, so it's never read half-written
+                summaries = await asyncio.to_thread(load_summaries)
+                self._snapshot = self._build_snapshot(summaries)
+
+    def notify(self, filename):
+        """
+        Records a changed file and restarts the debounce timer.
+        """
+        if not is_script(filename):
+            return
+        self._pending.add(filename)
+        if self._debounce:
+            self._debounce.cancel()
+        loop = asyncio.get_running_loop()
+        self._debounce = loop.call_later(DEBOUNCE_SECONDS, lambda: asyncio.create_task(self._flush()))
+
+    async def _flush(self):
+        async with self._lock:
+            changed, self._pending = self._pending, set()
+            if changed:
+                await self.refresh(changed)
+
+    async def refresh(self, filenames):
+        """
+        Re-summarizes just the given files and swaps in the new catalog.
+        """
+        self._ensure_loaded()
+        by_name = dict(self._snapshot[0])
+        updated = []
+        for filename in sorted(filenames):
+            path = os.path.join(SCRIPTS_DIR, filename)
+            if not os.path.exists(path):
+                if by_name.pop(filename, None):
+                    updated.append(f"-{filename}")
+                continue
+            if is_current(by_name.get(filename), filename):
+                continue
+            try:
+                by_name[filename] = await summarize_file(filename)
+                updated.append(filename)
+            except Exception as e:
+                print(f"⚠️ Could not summarize {filename}: {e}")
+
+        if not updated:
+            return
+        summaries = [by_name[name] for name in sorted(by_name)]
+        await asyncio.to_thread(save_summaries, summaries)
+        # Single reference assignment: readers see the old or the new catalog, never a mix
+        self._snapshot = self._build_snapshot(summaries)
+        print(f"🔄 Script catalog updated: {', '.join(updated)}")
+
+
+catalog = ScriptCatalog()
@@ -0,0 +1,111 @@
+# services/script_index.py
+import math
+import re
+import zlib
+from collections import defaultdict
+
+HASH_BUCKETS = 2 ** 18
+
+# Matches on the script name count this much more than matches in its description
+NAME_WEIGHT = 2.0
+
+# "What scripts have backup in the name?", "list scripts named deploy", "show scripts called 'db'"
+NAME_QUERY = re.compile(
+    r"^\s*(?:list|show|find|what|which|are\s+there|any|do\s+i\s+have)\b.*?\bscripts?\b.*?(?:\b(?:have|has|with|containing|contain|includes?)\s+['\"]?([\w.-]+)['\"]?\s+in\s+(?:the|their|its)\s+names?"
+    r"|\b(?:named|called)\s+['\"]?([\w.-]+)['\"]?)",
+    re.I
+)
+
+# "list scripts", "what scripts do I have", "which scripts can you run"
+LIST_QUERY = re.compile(
+    r"^\s*(?:(?:list|show)(?:\s+me)?(?:\s+all|\s+my|\s+the)?\s+scripts"
+    r"|(?:what|which)\s+scripts\s+(?:do\s+i\s+have|are\s+there|are\s+available|can\s+you\s+run|exist))\W*$",
+    re.I
+)
+
+
+def _words(text: str) -> list:
+    return re.findall(r"[a-z0-9]+", (text or "").lower())
+
+
+def _features(text: str, weight: float = 1.0) -> dict:
+    """
+    Hashed word unigrams, bigrams and character trigrams, so "backups" still lands near "backup".
+    """
+    words = _words(text)
+    grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    for word in words:
+        padded = f"#{word}#"
+        grams += [padded[i:i + 3] for i in range(len(padded) - 2)]
+    features = defaultdict(float)
+    for gram in grams:
+        features[zlib.crc32(gram.encode()) % HASH_BUCKETS] += weight
+    return features
+
+
+def _document(summary: dict) -> dict:
+    features = _features(summary.get("name", ""), NAME_WEIGHT)
+    for field in ("description", "example_usage"):
+        for bucket, value in _features(summary.get(field, "")).items():
+            features[bucket] += value
+    return features
+
+
+def _normalize(vector: dict) -> dict:
+    norm = math.sqrt(sum(v * v for v in vector.values()))
+    return {k: v / norm for k, v in vector.items()} if norm else {}
+
+
+class ScriptIndex:
+    """
+    Offline TF-IDF index over script names, descriptions and example usage.
+
+    Uses a hashing vectorizer, so there is no vocabulary to train and no network call.
+    """
+
+    def __init__(self, summaries):
+        self.summaries = list(summaries)
+        documents = [_document(s) for s in self.summaries]
+        doc_freq = defaultdict(int)
+        for doc in documents:
+            for bucket in doc:
+                doc_freq[bucket] += 1
+        total = len(documents)
+        self._idf = {bucket: math.log((1 + total) / (1 + df)) + 1 for bucket, df in doc_freq.items()}
+        self._vectors = [
+            _normalize({b: (1 + math.log(tf)) * self._idf[b] for b, tf in doc.items()}) for doc in documents
+        ]
+
+    def search(self, query: str, k: int = 5) -> list:
+        """
+        The k scripts most similar to the query, best first.
+        """
+        if len(self.summaries) <= k:
+            return list(self.summaries)
+        query_vec = _normalize({
+            b: (1 + math.log(tf)) * self._idf.get(b, 0) for b, tf in _features(query).items() if tf > 0
+        })
+        scored = []
+        for i, vector in enumerate(self._vectors):
+            score = sum(weight * vector.get(b, 0.0) for b, weight in query_vec.items())
+            scored.append((score, i))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [self.summaries[i] for _, i in scored[:k]]
+
+    def names_containing(self, keyword: str) -> list:
+        keyword = keyword.lower()
+        return [s for s in self.summaries if keyword in s.get("name", "").lower()]
+
+
+def name_query_keyword(message: str):
+    """
+    The keyword from a "scripts with X in the name" question, or None.
+    """
+    match = NAME_QUERY.search(message)
+    if not match:
+        return None
+    return match.group(1) or match.group(2)
+
+
+def is_list_query(message: str) -> bool:
+    return bool(LIST_QUERY.search(message))
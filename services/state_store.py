@@ -0,0 +1,176 @@
+# services/state_store.py
+import abc
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# "sqlite" shares state between worker processes; "memory" is per-process (tests, single worker)
+STATE_BACKEND = os.getenv("STATE_BACKEND", "sqlite")
+STATE_DB_PATH = os.getenv("STATE_DB_PATH", "data/state.sqlite3")
+
+# Unconfirmed actions expire after this long
+PENDING_TTL_SECONDS = int(os.getenv("PENDING_ACTION_TTL_SECONDS", "600"))
+
+
+class StateStore(abc.ABC):
+    """
+    Per-user conversation state (pending confirmations) with expiry.
+
+    take() is atomic: when several workers race on the same confirmation, exactly
+    one of them gets the value.
+    """
+
+    @abc.abstractmethod
+    def put(self, user_id, key, value, ttl=PENDING_TTL_SECONDS):
+        ...
+
+    @abc.abstractmethod
+    def get(self, user_id, key):
+        ...
+
+    @abc.abstractmethod
+    def take(self, user_id, key):
+        ...
+
+    def discard(self, user_id, key):
+        self.take(user_id, key)
+
+    @abc.abstractmethod
+    def keys(self, user_id) -> set:
+        """
+        Keys with live (unexpired) values for the user.
+        """
+
+    @abc.abstractmethod
+    def purge_expired(self):
+        """
+        Deletes expired entries that were never taken.
+        """
+
+
+class MemoryStateStore(StateStore):
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def _live(self, user_id, key, now):
+        entry = self._data.get((str(user_id), key))
+        if entry and entry[1] <= now:
+            del self._data[(str(user_id), key)]
+            return None
+        return entry
+
+    def put(self, user_id, key, value, ttl=PENDING_TTL_SECONDS):
+        with self._lock:
+            self._data[(str(user_id), key)] = (json.loads(json.dumps(value)), time.time() + ttl)
+
+    def get(self, user_id, key):
+        with self._lock:
+            entry = self._live(user_id, key, time.time())
+            return entry[0] if entry else None
+
+    def take(self, user_id, key):
+        with self._lock:
+            entry = self._live(user_id, key, time.time())
+            if entry:
+                del self._data[(str(user_id), key)]
+                return entry[0]
+            return None
+
+    def keys(self, user_id) -> set:
+        now = time.time()
+        with self._lock:
+            return {k for (u, k) in list(self._data) if u == str(user_id) and self._live(u, k, now)}
+
+    def purge_expired(self):
+        now = time.time()
+        with self._lock:
+            for user_id, key in list(self._data):
+                self._live(user_id, key, now)
+
+
+class SQLiteStateStore(StateStore):
+    def __init__(self, path=STATE_DB_PATH):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+        self._purged = 0.0
+
+    def _db(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Autocommit mode; take() manages its own transaction
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=5)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS state ("
+                " user_id TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, expires REAL NOT NULL,"
+                " PRIMARY KEY (user_id, key))"
+            )
+        return self._conn
+
+    def put(self, user_id, key, value, ttl=PENDING_TTL_SECONDS):
+        with self._lock:
+            self._db().execute(
+                "INSERT OR REPLACE INTO state (user_id, key, value, expires) VALUES (?, ?, ?, ?)",
+                (str(user_id), key, json.dumps(value), time.time() + ttl)
+            )
+        # Unanswered confirmations are never taken; clear them out every TTL or so
+        if time.time() - self._purged > PENDING_TTL_SECONDS:
+            self.purge_expired()
+
+    def get(self, user_id, key):
+        with self._lock:
+            row = self._db().execute(
+                "SELECT value FROM state WHERE user_id = ? AND key = ? AND expires > ?",
+                (str(user_id), key, time.time())
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def take(self, user_id, key):
+        with self._lock:
+            db = self._db()
+            # IMMEDIATE takes the write lock up front, so no other process can take the same row
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                row = db.execute(
+                    "SELECT value, expires FROM state WHERE user_id = ? AND key = ?",
+                    (str(user_id), key)
+                ).fetchone()
+                if row:
+                    db.execute("DELETE FROM state WHERE user_id = ? AND key = ?", (str(user_id), key))
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+        if row and row[1] > time.time():
+            return json.loads(row[0])
+        return None
+
+    def keys(self, user_id) -> set:
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT key FROM state WHERE user_id = ? AND expires > ?",
+                (str(user_id), time.time())
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def purge_expired(self):
+        with self._lock:
+            self._purged = time.time()
+            self._db().execute("DELETE FROM state WHERE expires <= ?", (self._purged,))
+
+
+def create_store(backend=STATE_BACKEND) -> StateStore:
+    if backend == "memory":
+        return MemoryStateStore()
+    if backend == "sqlite":
+        return SQLiteStateStore()
+    raise ValueError(f"Unknown STATE_BACKEND: {backend}")
+
+
+state = create_store()
@@ -0,0 +1,144 @@
+# services/temporal.py
+import os
+import re
+from datetime import date, datetime, time, timedelta
+import pytz
+import dateparser
+
+LOCAL_TZ = pytz.timezone(os.getenv("TIMEZONE", "UTC"))
+
+WEEKDAYS = {
+    "monday": 0, "mon": 0, "tuesday": 1, "tue": 1, "tues": 1, "wednesday": 2, "wed": 2,
+    "thursday": 3, "thu": 3, "thur": 3, "thurs": 3, "friday": 4, "fri": 4,
+    "saturday": 5, "sat": 5, "sunday": 6, "sun": 6,
+}
+MONTHS = r"(jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\.?"
+
+_WEEKDAY = r"(" + "|".join(sorted(WEEKDAYS, key=len, reverse=True)) + r")"
+
+# One day, relative to today
+RELATIVE_DAYS = [
+    (re.compile(r"\bday after tomorrow\b"), 2),
+    (re.compile(r"\b(today|tonight|this (morning|afternoon|evening))\b"), 0),
+    (re.compile(r"\b(tomorrow|tmrw|tmr)\b"), 1),
+    (re.compile(r"\byesterday\b"), -1),
+]
+IN_DAYS = re.compile(r"\bin (\d{1,3}) days?\b")
+WEEKDAY = re.compile(r"\b(this |next |on |coming )?" + _WEEKDAY + r"\b")
+ISO_DATE = re.compile(r"\b\d{4}-\d{2}-\d{2}\b")
+MONTH_DAY = re.compile(r"\b" + MONTHS + r" \d{1,2}(st|nd|rd|th)?(,? \d{4})?\b")
+DAY_MONTH = re.compile(r"\b\d{1,2}(st|nd|rd|th)? (of )?" + MONTHS + r"( \d{4})?\b")
+
+# Numeric dates like 7/5 read differently in the US and Europe
+NUMERIC_DATE = re.compile(r"\b\d{1,2}[/.]\d{1,2}([/.]\d{2,4})?\b")
+
+SPAN = re.compile(r"\b(?:from|between) (.+?) (?:to|and|until|till|through|thru) (.+)$")
+NEXT_N_DAYS = re.compile(r"\b(?:next|coming) (\d{1,3}) days\b")
+
+
+def today_local() -> date:
+    return datetime.now(LOCAL_TZ).date()
+
+
+def local_bounds(start: date, end: date):
+    """
+    Timezone-aware [start of `start`, start of the day after `end`) in local time.
+    """
+    return (
+        LOCAL_TZ.localize(datetime.combine(start, time.min)),
+        LOCAL_TZ.localize(datetime.combine(end + timedelta(days=1), time.min)),
+    )
+
+
+def _absolute(fragment: str, today: date):
+    parsed = dateparser.parse(
+        fragment,
+        settings={
+            "PREFER_DATES_FROM": "future",
+            "RELATIVE_BASE": datetime.combine(today, time.min),
+        }
+    )
+    return parsed.date() if parsed else None
+
+
+def _days(text: str, today: date) -> list:
+    """
+    Every single-day expression in the text, resolved, in order of appearance.
+    """
+    found = []
+    for pattern, offset in RELATIVE_DAYS:
+        for match in pattern.finditer(text):
+            found.append((match.start(), today + timedelta(days=offset)))
+        # "day after tomorrow" must not also count as "tomorrow"
+        text = pattern.sub(lambda m: " " * len(m.group(0)), text)
+    for match in IN_DAYS.finditer(text):
+        found.append((match.start(), today + timedelta(days=int(match.group(1)))))
+    for match in WEEKDAY.finditer(text):
+        ahead = (WEEKDAYS[match.group(2)] - today.weekday()) % 7
+        # "next friday" means the next one after today, as the LLM prompts have always said
+        if ahead == 0 and (match.group(1) or "").strip() in ("next", "coming"):
+            ahead = 7
+        found.append((match.start(), today + timedelta(days=ahead)))
+    for pattern in (ISO_DATE, MONTH_DAY, DAY_MONTH):
+        for match in pattern.finditer(text):
+            day = _absolute(match.group(0), today)
+            if day is None:
+                return None
+            found.append((match.start(), day))
+    return [day for _, day in sorted(found)]
+
+
+def _week_range(text: str, today: date):
+    monday = today - timedelta(days=today.weekday())
+    if re.search(r"\b(this week|rest of (the|this) week)\b", text):
+        return today, monday + timedelta(days=6)
+    if re.search(r"\bnext week\b", text):
+        return monday + timedelta(days=7), monday + timedelta(days=13)
+    if re.search(r"\bnext weekend\b", text):
+        saturday = monday + timedelta(days=12)
+        return saturday, saturday + timedelta(days=1)
+    if re.search(r"\b(this )?weekend\b", text):
+        saturday = monday + timedelta(days=5)
+        return max(today, saturday), saturday + timedelta(days=1)
+    if re.search(r"\bthis month\b", text):
+        next_month = (today.replace(day=28) + timedelta(days=4)).replace(day=1)
+        return today, next_month - timedelta(days=1)
+    if re.search(r"\bnext month\b", text):
+        start = (today.replace(day=28) + timedelta(days=4)).replace(day=1)
+        end = (start.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+        return start, end
+    match = NEXT_N_DAYS.search(text)
+    if match:
+        return today, today + timedelta(days=max(int(match.group(1)), 1) - 1)
+    return None
+
+
+def resolve(message: str, today: date = None):
+    """
+    The inclusive (start, end) local dates the message refers to, or None when it names
+    no date or the reading is ambiguous (numeric dates, several unrelated days, ...).
+    """
+    today = today or today_local()
+    text = re.sub(r"[?!,;]", " ", message.lower())
+    text = re.sub(r"'s\b", "", text)
+    text = re.sub(r"\s+", " ", text).strip()
+
+    if NUMERIC_DATE.search(text):
+        return None
+
+    span = SPAN.search(text)
+    if span:
+        first, last = _days(span.group(1), today), _days(span.group(2), today)
+        if first and last and len(first) == 1 and len(last) == 1 and first[0] <= last[0]:
+            return first[0], last[0]
+        return None
+
+    week = _week_range(text, today)
+    days = _days(text, today)
+    if days is None:
+        return None
+    if week:
+        return week if not days else None
+    if len(set(days)) == 1:
+        return days[0], days[0]
+    return None
@@ -0,0 +1,63 @@
+# services/usage.py
+import contextvars
+import threading
+from collections import Counter, defaultdict
+from services import metrics
+
+# Users with the most prompt tokens shown in stats
+TOP_USERS = 10
+
+current_user = contextvars.ContextVar("usage_user", default="system")
+current_intent = contextvars.ContextVar("usage_intent", default="none")
+
+_totals = {"call": defaultdict(Counter), "intent": defaultdict(Counter), "user": defaultdict(Counter)}
+_lock = threading.Lock()
+
+
+def set_user(user_id):
+    current_user.set(str(user_id))
+
+
+def set_intent(intent):
+    current_intent.set(intent or "general_chat")
+
+
+def _add(call, fields):
+    with _lock:
+        for kind, key in (("call", call or "unnamed"), ("intent", current_intent.get()), ("user", current_user.get())):
+            _totals[kind][key].update(fields)
+
+
+def record(call, estimated_tokens=0, prompt_tokens=0, completion_tokens=0, cached=False):
+    """
+    Adds one LLM call to the per-call, per-intent and per-user totals.
+
+    prompt_tokens/completion_tokens come from the API's usage field; cached calls cost nothing.
+    """
+    _add(call, {
+        "calls": 1,
+        "cache_hits": int(cached),
+        "estimated_prompt_tokens": estimated_tokens,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+    })
+
+
+def record_trim(call):
+    _add(call, {"trimmed_prompts": 1})
+
+
+def totals(kind) -> dict:
+    with _lock:
+        return {key: dict(counter) for key, counter in _totals[kind].items()}
+
+
+def top_users(n=TOP_USERS) -> dict:
+    users = totals("user")
+    ranked = sorted(users.items(), key=lambda item: item[1].get("prompt_tokens", 0), reverse=True)
+    return dict(ranked[:n])
+
+
+metrics.register("llm_usage_by_call", lambda: totals("call"))
+metrics.register("llm_usage_by_intent", lambda: totals("intent"))
+metrics.register("llm_usage_by_user", top_users)
